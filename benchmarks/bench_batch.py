@@ -0,0 +1,56 @@
+"""
+Benchmark: mensagem com vários links, consultas sequenciais vs. consulta GraphQL em lote
+
+Uso: python -m benchmarks.bench_batch [--links 10] [--latency 0.05] [--rounds 5]
+"""
+import argparse
+import asyncio
+import os
+import statistics
+import tempfile
+import time
+
+os.environ.setdefault('SHOPEE_PARTNER_ID', 'bench')
+os.environ.setdefault('SHOPEE_API_KEY', 'bench')
+os.environ.setdefault('SHORT_LINKS_DB', ':memory:')
+os.environ.setdefault('DATA_DIR', tempfile.mkdtemp())
+
+from benchmarks.stub_server import ShopeeStub, disable_api_rate_limit
+import services.shopee_api as shopee_api
+from services import http_client
+
+async def sequential(urls: list) -> list:
+    return [await shopee_api.get_product_details(url) for url in urls]
+
+async def main(links: int, latency: float, rounds: int) -> None:
+    stub = await ShopeeStub(latency=latency).start()
+    shopee_api.API_URL = stub.graphql_url
+    disable_api_rate_limit(shopee_api)
+    results = {"sequencial": [], "lote": []}
+    calls = {"sequencial": 0, "lote": 0}
+    try:
+        for round_number in range(rounds):
+            urls = [f"https://shopee.com.br/product/{round_number}/{i}" for i in range(links)]
+            for label, fetch in (("sequencial", sequential), ("lote", shopee_api.get_products_details)):
+                shopee_api.product_cache.clear()
+                stub.graphql_calls = 0
+                start = time.perf_counter()
+                products = await fetch(urls)
+                results[label].append(time.perf_counter() - start)
+                calls[label] = stub.graphql_calls
+                assert all(p is not None for p in products)
+    finally:
+        await http_client.close_http_session()
+        await stub.stop()
+
+    print(f"{links} links por mensagem, latência do stub {latency * 1000:.0f}ms, {rounds} rodadas")
+    for label, samples in results.items():
+        print(f"{label:<11} {statistics.median(samples) * 1000:8.1f}ms (mediana), {calls[label]} chamada(s) à API")
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser()
+    parser.add_argument('--links', type=int, default=10)
+    parser.add_argument('--latency', type=float, default=0.05)
+    parser.add_argument('--rounds', type=int, default=5)
+    args = parser.parse_args()
+    asyncio.run(main(args.links, args.latency, args.rounds))
@@ -0,0 +1,146 @@
+"""
+Benchmark: divulgação para muitos grupos (services/broadcast.py)
+
+Um FakeBot aplica os limites do Telegram e responde RetryAfter quando eles são
+ultrapassados: 30 msg/s no total, 20 msg/min e 1 msg/s por chat. O tempo é acelerado
+por --speedup (janelas, latência e ritmo do Broadcaster divididos pelo fator).
+
+1. laço ingênuo (send_message em sequência, dormindo quando recebe RetryAfter)
+2. Broadcaster com fila de prioridade e ritmo global/por chat
+3. mensagem de alta prioridade enviada no meio de uma divulgação grande
+
+Uso: python -m benchmarks.bench_broadcast [--groups 300] [--rounds 3] [--speedup 5]
+"""
+import argparse
+import asyncio
+import math
+import time
+from collections import defaultdict, deque
+
+from telegram.error import Forbidden, RetryAfter
+
+from services.broadcast import Broadcaster, PRIORITY_HIGH, PRIORITY_LOW
+
+class FakeBot:
+    """Bot falso com os limites de flood do Telegram"""
+
+    def __init__(self, speedup: float, latency: float = 0.03, global_limit: int = 30,
+                 chat_limit: int = 20, blocked=()):
+        self.speedup = speedup
+        self.latency = latency / speedup
+        self.global_limit = global_limit
+        self.chat_limit = chat_limit
+        self.blocked = set(blocked)
+        self._global = deque()
+        self._chats = defaultdict(deque)
+        self.sent = []
+        self.retry_after = 0
+
+    def _flood(self, window: deque, limit: int, period: float, now: float):
+        while window and window[0] <= now - period:
+            window.popleft()
+        if len(window) >= limit:
+            return window[0] + period - now
+        return None
+
+    async def send_message(self, chat_id, text, **kwargs):
+        await asyncio.sleep(self.latency)
+        if chat_id in self.blocked:
+            raise Forbidden("Forbidden: bot was kicked from the group chat")
+
+        now = time.monotonic()
+        chat = self._chats[chat_id]
+        waits = [
+            self._flood(self._global, self.global_limit, 1.0 / self.speedup, now),
+            self._flood(chat, self.chat_limit, 60.0 / self.speedup, now),
+            self._flood(deque(list(chat)[-1:]), 1, 1.0 / self.speedup, now),
+        ]
+        waits = [wait for wait in waits if wait is not None]
+        if waits:
+            self.retry_after += 1
+            # O Telegram informa a espera em segundos inteiros
+            raise RetryAfter(math.ceil(max(waits) * self.speedup) / self.speedup)
+
+        self._global.append(now)
+        chat.append(now)
+        self.sent.append((chat_id, text))
+
+async def naive(bot: FakeBot, groups: list, rounds: int) -> float:
+    start = time.perf_counter()
+    for round_ in range(rounds):
+        for chat_id in groups:
+            while True:
+                try:
+                    await bot.send_message(chat_id=chat_id, text=f"Oferta {round_}")
+                    break
+                except RetryAfter as e:
+                    await asyncio.sleep(e.retry_after)
+                except Forbidden:
+                    break
+    return time.perf_counter() - start
+
+async def paced(bot: FakeBot, groups: list, rounds: int, speedup: float):
+    broadcaster = Broadcaster(global_rate=25 * speedup, per_chat_interval=3.1 / speedup, max_concurrency=10)
+    await broadcaster.start(bot)
+    updates = []
+    start = time.perf_counter()
+    broadcasts = [
+        broadcaster.submit(groups, text=f"Oferta {round_}", on_progress=lambda b: updates.append(b.sent))
+        for round_ in range(rounds)
+    ]
+    await asyncio.gather(*(broadcast.wait() for broadcast in broadcasts))
+    elapsed = time.perf_counter() - start
+    await broadcaster.stop()
+    return elapsed, broadcasts, updates
+
+async def priority(bot: FakeBot, groups: list, speedup: float) -> float:
+    broadcaster = Broadcaster(global_rate=25 * speedup, per_chat_interval=3.1 / speedup, max_concurrency=10)
+    await broadcaster.start(bot)
+    bulk = broadcaster.submit(groups, priority=PRIORITY_LOW, text="Divulgação em massa")
+    await asyncio.sleep(0.2 / speedup)
+    start = time.perf_counter()
+    urgent = await broadcaster.submit([-1], priority=PRIORITY_HIGH, text="Agendada").wait()
+    latency = time.perf_counter() - start
+    assert urgent.sent == 1 and not bulk.done
+    await bulk.wait()
+    await broadcaster.stop()
+    return latency
+
+async def main(groups_count: int, rounds: int, speedup: float) -> None:
+    groups = [-1000000000000 - n for n in range(groups_count)]
+    blocked = groups[:5]
+    total = groups_count * rounds
+    print(f"{groups_count} grupos x {rounds} mensagens = {total} envios (tempo acelerado {speedup:.0f}x)")
+
+    # 1. Laço ingênuo
+    bot = FakeBot(speedup, blocked=blocked)
+    elapsed = await naive(bot, groups, rounds) * speedup
+    print(f"Laço ingênuo: {elapsed:.1f}s em tempo real, {len(bot.sent) / elapsed:.1f} msg/s, "
+          f"{bot.retry_after} RetryAfter")
+
+    # 2. Broadcaster
+    bot = FakeBot(speedup, blocked=blocked)
+    elapsed, broadcasts, updates = await paced(bot, groups, rounds, speedup)
+    elapsed *= speedup
+    sent = sum(b.sent for b in broadcasts)
+    failed = sum(b.failed for b in broadcasts)
+    assert sent == len(bot.sent) == total - len(blocked) * rounds, (sent, len(bot.sent))
+    assert failed == len(blocked) * rounds and all(set(b.errors) == set(blocked) for b in broadcasts)
+    assert len(updates) == total
+    # A mensagem foi montada uma vez: todos os envios de uma rodada usam o mesmo objeto
+    assert all(len({id(text) for chat_id, text in bot.sent if text == b.kwargs["text"]}) == 1 for b in broadcasts)
+    print(f"Broadcaster: {elapsed:.1f}s em tempo real, {sent / elapsed:.1f} msg/s, "
+          f"{bot.retry_after} RetryAfter, {failed} falhas (grupos que removeram o bot)")
+
+    # 3. Prioridade
+    bot = FakeBot(speedup)
+    latency = await priority(bot, groups, speedup) * speedup
+    print(f"Mensagem de alta prioridade no meio de {groups_count} envios: entregue em {latency * 1000:.0f}ms (tempo real)")
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser()
+    parser.add_argument('--groups', type=int, default=300)
+    parser.add_argument('--rounds', type=int, default=3)
+    parser.add_argument('--speedup', type=float, default=5)
+    args = parser.parse_args()
+    asyncio.run(main(args.groups, args.rounds, args.speedup))
@@ -0,0 +1,97 @@
+"""
+Benchmark/verificação: cache de produtos com TTL, despejo LRU e stale-while-revalidate
+
+1. TTLCache isolado: despejo do menos usado ao passar de maxsize, entrada vencida servida
+   como "stale" e descartada depois de stale_ttl
+2. get_product_details contra o stub local: com a entrada vencida, consultas simultâneas
+   respondem na hora (sem esperar a latência da API) e disparam exatamente uma
+   atualização em segundo plano, que deixa a entrada nova de novo
+
+Uso: python -m benchmarks.bench_cache [--concurrency 200] [--latency 0.2] [--ttl 0.2]
+"""
+import argparse
+import asyncio
+import os
+import tempfile
+import time
+
+os.environ.setdefault('SHOPEE_PARTNER_ID', 'bench')
+os.environ.setdefault('SHOPEE_API_KEY', 'bench')
+os.environ.setdefault('SHORT_LINKS_DB', ':memory:')
+os.environ.setdefault('DATA_DIR', tempfile.mkdtemp())
+
+from benchmarks.stub_server import ShopeeStub, disable_api_rate_limit
+from services.cache import TTLCache, FRESH, STALE
+import services.shopee_api as shopee_api
+from services import http_client
+
+async def check_ttl_cache(ttl: float) -> None:
+    cache = TTLCache(maxsize=3, ttl=ttl, stale_ttl=ttl * 3)
+    for key in "abc":
+        cache.set(key, key.upper())
+    # "a" usado por último: "b" é o menos usado e sai quando "d" entra
+    assert cache.get("a") == ("A", FRESH)
+    cache.set("d", "D")
+    assert len(cache) == 3 and cache.evictions == 1
+    assert cache.get("b") == (None, None)
+    assert cache.get("c") == ("C", FRESH) and cache.get("d") == ("D", FRESH)
+    print(f"LRU: maxsize=3, 4 inserções -> {cache.evictions} despejo (o menos usado)")
+
+    await asyncio.sleep(ttl * 1.5)
+    assert cache.get("a") == ("A", STALE), cache.get("a")
+    await asyncio.sleep(ttl * 2)
+    assert cache.get("a") == (None, None)
+    assert "a" not in cache._data
+    print(f"TTL: vencida após {ttl * 1000:.0f}ms servida como stale, descartada após {ttl * 3000:.0f}ms")
+
+async def check_stale_while_revalidate(stub: ShopeeStub, concurrency: int, latency: float, ttl: float) -> None:
+    url = "https://shopee.com.br/product/10/20"
+    shopee_api.product_cache.clear()
+    shopee_api.product_cache.ttl = ttl
+    shopee_api.product_cache.stale_ttl = 3600
+    stub.graphql_calls = 0
+
+    started = time.perf_counter()
+    assert (await shopee_api.get_product_details(url)) is not None
+    miss = time.perf_counter() - started
+    assert stub.graphql_calls == 1
+
+    await asyncio.sleep(ttl * 1.5)
+    refreshes = shopee_api.get_cache_stats()["refreshes"]
+    started = time.perf_counter()
+    results = await asyncio.gather(*(shopee_api.get_product_details(url) for _ in range(concurrency)))
+    stale = time.perf_counter() - started
+    assert all(result is not None and result.id == 20 for result in results)
+    # Respondidas do cache, antes da atualização terminar
+    assert stale < latency / 2, stale
+    assert shopee_api.get_cache_stats()["refreshes"] - refreshes == 1
+    assert stub.graphql_calls == 1
+
+    # A atualização roda em segundo plano e deixa a entrada nova
+    await asyncio.sleep(latency * 2)
+    assert stub.graphql_calls == 2, stub.graphql_calls
+    assert shopee_api.product_cache.get((10, 20))[1] == FRESH
+    print(f"stale-while-revalidate: {concurrency} consultas vencidas em {stale * 1000:.1f}ms "
+          f"(miss: {miss * 1000:.0f}ms), 1 atualização em segundo plano")
+
+async def main(concurrency: int, latency: float, ttl: float) -> None:
+    await check_ttl_cache(ttl)
+
+    stub = await ShopeeStub(latency=latency).start()
+    shopee_api.API_URL = stub.graphql_url
+    shopee_api.api_retry_policy.max_retries = 0
+    disable_api_rate_limit(shopee_api)
+    try:
+        await check_stale_while_revalidate(stub, concurrency, latency, ttl)
+        print(shopee_api.get_cache_stats())
+    finally:
+        await http_client.close_http_session()
+        await stub.stop()
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser()
+    parser.add_argument('--concurrency', type=int, default=200)
+    parser.add_argument('--latency', type=float, default=0.2)
+    parser.add_argument('--ttl', type=float, default=0.2, help="TTL usado nas verificações (s)")
+    args = parser.parse_args()
+    asyncio.run(main(args.concurrency, args.latency, args.ttl))
@@ -0,0 +1,264 @@
+"""
+Teste de carga de ponta a ponta, sem rede: o Application montado por main.build_application
+(persistência, fila, processamento por chat, handlers, post_init/post_shutdown) com a Bot API
+falsa (telegram_stub.StubRequest) e o stub da API da Shopee (stub_server).
+
+N chats simultâneos mandam, cada um, uma sequência de ações (texto qualquer, link, link curto,
+/start, clique em menu, Favoritar) e esperam a resposta antes de "pensar" e mandar a próxima.
+A latência de cada update vai da entrada (fila do Application ou getUpdates) até o fim do
+processamento. O resultado (vazão, p50/p95/p99 por tipo de update, memória, contadores) é
+acrescentado em --output e comparado com a última execução de mesma configuração.
+
+Uso: python -m benchmarks.bench_e2e [--chats 200] [--actions 10] [--think 0.2] [--latency 0.05]
+     [--error-rate 0] [--rate-limit N] [--ingress queue|polling] [--output arquivo.jsonl]
+"""
+import argparse
+import asyncio
+import json
+import logging
+import os
+import random
+import resource
+import statistics
+import subprocess
+import tempfile
+import time
+
+os.environ.setdefault('TELEGRAM_TOKEN', '123456:bench')
+os.environ.setdefault('SHOPEE_PARTNER_ID', 'bench')
+os.environ.setdefault('SHOPEE_API_KEY', 'bench')
+os.environ.setdefault('DATA_DIR', tempfile.mkdtemp())
+
+from telegram import Update
+from telegram.ext import Application
+
+from benchmarks.stub_server import ShopeeStub, disable_api_rate_limit
+from benchmarks.telegram_stub import TelegramStub, StubRequest
+import services.shopee_api as shopee_api
+import services.product_images as product_images
+import main as bot_main
+
+# Tipo de ação -> peso no sorteio
+ACTIONS = {
+    "texto": 25,
+    "link": 25,
+    "link_curto": 10,
+    "start": 15,
+    "menu": 15,
+    "favoritar": 10,
+}
+MENUS = ["menu_principal", "menu_favoritos", "menu_config", "menu_agendamentos"]
+TEXTS = ["bom dia", "alguém tem cupom?", "obrigado!", "qual o preço do frete?", "kkkk"]
+SHOP_ID = 1
+DEFAULT_OUTPUT = os.path.join(os.path.dirname(__file__), "results", "bench_e2e.jsonl")
+
+class TimedApplication(Application):
+    """Application que avisa quando cada update injetado termina de ser processado"""
+
+    async def process_update(self, update: object) -> None:
+        try:
+            await super().process_update(update)
+        finally:
+            if isinstance(update, Update):
+                waiter = self.pending.pop(update.update_id, None)
+                if waiter is not None and not waiter.done():
+                    waiter.set_result(time.perf_counter())
+
+class LogCounter(logging.Handler):
+    """Conta os avisos e erros logados (falhas e novas tentativas na API, erros nos handlers)"""
+
+    def __init__(self):
+        super().__init__(logging.WARNING)
+        self.counts = {}
+
+    def emit(self, record: logging.LogRecord) -> None:
+        self.counts[record.levelname] = self.counts.get(record.levelname, 0) + 1
+
+def rss_mb() -> float:
+    with open("/proc/self/statm") as statm:
+        return int(statm.read().split()[1]) * os.sysconf("SC_PAGE_SIZE") / 1e6
+
+def percentile(values, p: float) -> float:
+    return values[min(len(values) - 1, int(len(values) * p))]
+
+def make_update(kind: str, chat_id: int, telegram: TelegramStub, shopee: ShopeeStub, items: int) -> dict:
+    item_id = random.randint(1, items)
+    if kind == "texto":
+        return telegram.message_update(chat_id, random.choice(TEXTS))
+    if kind == "link":
+        return telegram.message_update(chat_id, f"olha essa https://shopee.com.br/product/{SHOP_ID}/{item_id}")
+    if kind == "link_curto":
+        return telegram.message_update(chat_id, shopee.message_short_url(f"{SHOP_ID}-{item_id}"))
+    if kind == "start":
+        return telegram.message_update(chat_id, "/start")
+    if kind == "menu":
+        return telegram.callback_update(chat_id, random.choice(MENUS))
+    return telegram.callback_update(chat_id, f"fav_{SHOP_ID}_{item_id}")
+
+def git_revision() -> str:
+    try:
+        return subprocess.run(["git", "rev-parse", "--short", "HEAD"], capture_output=True,
+                              text=True, check=True).stdout.strip()
+    except Exception:
+        return "?"
+
+async def run(args) -> dict:
+    random.seed(args.seed)
+    shopee = await ShopeeStub(latency=args.latency).start()
+    shopee.error_rate = args.error_rate
+    shopee.rate_limit = args.rate_limit
+    shopee_api.API_URL = shopee.graphql_url
+    product_images.IMAGE_URL = shopee.image_url
+    if not args.keep_rate_limit:
+        disable_api_rate_limit(shopee_api)
+    telegram = TelegramStub()
+
+    builder = (
+        Application.builder()
+        .token(os.environ['TELEGRAM_TOKEN'])
+        .application_class(TimedApplication)
+        .request(StubRequest(telegram))
+        .get_updates_request(StubRequest(telegram))
+    )
+    application = bot_main.build_application(builder)
+    application.pending = {}
+    logs = LogCounter()
+    logging.getLogger().addHandler(logs)
+
+    rss_before = rss_mb()
+    startup = time.perf_counter()
+    await application.initialize()
+    await application.post_init(application)
+    if args.ingress == "polling":
+        await application.updater.start_polling(poll_interval=0, timeout=10)
+    await application.start()
+    startup = time.perf_counter() - startup
+
+    latencies = {kind: [] for kind in ACTIONS}
+    kinds, weights = zip(*ACTIONS.items())
+    loop = asyncio.get_running_loop()
+
+    async def chat(chat_id: int) -> None:
+        # Chats começam espalhados no primeiro intervalo de "pensar"
+        await asyncio.sleep(random.uniform(0, args.think))
+        for kind in random.choices(kinds, weights, k=args.actions):
+            data = make_update(kind, chat_id, telegram, shopee, args.items)
+            done = loop.create_future()
+            application.pending[data["update_id"]] = done
+            injected = time.perf_counter()
+            if args.ingress == "polling":
+                await telegram.push_update(data)
+            else:
+                await application.update_queue.put(Update.de_json(data, application.bot))
+            finished = await asyncio.wait_for(done, timeout=120)
+            latencies[kind].append((finished - injected) * 1000)
+            await asyncio.sleep(random.expovariate(1 / args.think))
+
+    started = time.perf_counter()
+    await asyncio.gather(*(chat(chat_id) for chat_id in range(1, args.chats + 1)))
+    elapsed = time.perf_counter() - started
+    rss_after = rss_mb()
+    cache = shopee_api.get_cache_stats()
+
+    if args.ingress == "polling":
+        await application.updater.stop()
+    await application.stop()
+    await application.shutdown()
+    await application.post_shutdown(application)
+    logging.getLogger().removeHandler(logs)
+    await shopee.stop()
+
+    total = sum(len(values) for values in latencies.values())
+    everything = sorted(value for values in latencies.values() for value in values)
+    result = {
+        "time": time.strftime("%Y-%m-%d %H:%M:%S"),
+        "revision": git_revision(),
+        "config": {key: getattr(args, key) for key in
+                   ("chats", "actions", "think", "latency", "items", "error_rate", "rate_limit",
+                    "keep_rate_limit", "ingress", "seed")},
+        "updates": total,
+        "elapsed_s": round(elapsed, 2),
+        "throughput": round(total / elapsed, 1),
+        "startup_ms": round(startup * 1000, 1),
+        "latency_ms": {
+            kind: {
+                "count": len(values),
+                "p50": round(statistics.median(values), 1),
+                "p95": round(percentile(values, 0.95), 1),
+                "p99": round(percentile(values, 0.99), 1),
+                "max": round(values[-1], 1),
+            }
+            for kind, values in ((kind, sorted(values)) for kind, values in latencies.items()) if values
+        },
+        "all_p99_ms": round(percentile(everything, 0.99), 1),
+        "memory_mb": {
+            "rss_before": round(rss_before, 1),
+            "rss_after": round(rss_after, 1),
+            # ru_maxrss vem em KB no Linux
+            "peak": round(resource.getrusage(resource.RUSAGE_SELF).ru_maxrss * 1024 / 1e6, 1),
+        },
+        "telegram_calls": dict(sorted(telegram.calls.items())),
+        "graphql_calls": shopee.graphql_calls,
+        "short_link_calls": shopee.redirect_calls,
+        "throttled": shopee.throttled,
+        "warnings_logged": logs.counts.get("WARNING", 0),
+        "errors_logged": logs.counts.get("ERROR", 0),
+        "cache_hits": cache.get("hits"),
+        "cache_misses": cache.get("misses"),
+    }
+    return result
+
+def report(result: dict, previous: dict = None) -> None:
+    def delta(now: float, before: float) -> str:
+        return f" ({(now - before) / before * 100:+.0f}%)" if before else ""
+
+    print(f"\n{result['updates']} updates de {result['config']['chats']} chats em {result['elapsed_s']}s: "
+          f"{result['throughput']} updates/s"
+          + (delta(result['throughput'], previous['throughput']) if previous else ""))
+    print(f"{'tipo':<12}{'n':>7}{'p50':>10}{'p95':>10}{'p99':>10}{'máx':>10}  (ms)")
+    for kind, stats in result["latency_ms"].items():
+        before = (previous or {}).get("latency_ms", {}).get(kind, {})
+        print(f"{kind:<12}{stats['count']:>7}{stats['p50']:>10.1f}{stats['p95']:>10.1f}{stats['p99']:>10.1f}"
+              f"{stats['max']:>10.1f}" + (delta(stats['p99'], before.get('p99')) if before else ""))
+    memory = result["memory_mb"]
+    print(f"memória: RSS {memory['rss_before']}MB -> {memory['rss_after']}MB, pico {memory['peak']}MB | "
+          f"inicialização {result['startup_ms']}ms")
+    print(f"GraphQL: {result['graphql_calls']} chamadas ({result['throttled']} com 429), "
+          f"links curtos: {result['short_link_calls']}, cache: {result['cache_hits']} hits / "
+          f"{result['cache_misses']} misses, log: {result['warnings_logged']} avisos / {result['errors_logged']} erros")
+    if previous:
+        print(f"comparado com {previous['revision']} de {previous['time']}")
+
+def save(result: dict, output: str) -> dict:
+    """Acrescenta o resultado em output e retorna a última execução com a mesma configuração"""
+    previous = None
+    if os.path.exists(output):
+        with open(output) as results:
+            for line in results:
+                record = json.loads(line)
+                if record.get("config") == result["config"]:
+                    previous = record
+    os.makedirs(os.path.dirname(output) or ".", exist_ok=True)
+    with open(output, "a") as results:
+        results.write(json.dumps(result, ensure_ascii=False) + "\n")
+    return previous
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser()
+    parser.add_argument('--chats', type=int, default=200)
+    parser.add_argument('--actions', type=int, default=10)
+    parser.add_argument('--think', type=float, default=0.2, help="pausa média entre ações de um chat (s)")
+    parser.add_argument('--latency', type=float, default=0.05, help="latência do stub da Shopee (s)")
+    parser.add_argument('--items', type=int, default=2000, help="produtos distintos sorteados nos links")
+    parser.add_argument('--error-rate', type=float, default=0.0)
+    parser.add_argument('--rate-limit', type=int, default=None, help="chamadas GraphQL/s aceitas pelo stub")
+    parser.add_argument('--keep-rate-limit', action='store_true', help="mantém o limitador de taxa do bot")
+    parser.add_argument('--ingress', choices=("queue", "polling"), default="queue")
+    parser.add_argument('--seed', type=int, default=1)
+    parser.add_argument('--output', default=DEFAULT_OUTPUT)
+    args = parser.parse_args()
+
+    result = asyncio.run(run(args))
+    previous = save(result, args.output)
+    report(result, previous)
+    assert result["updates"] == args.chats * args.actions
@@ -0,0 +1,77 @@
+"""
+Benchmark: latência por consulta de produto com e sem o pool HTTP compartilhado
+
+Uso: python -m benchmarks.bench_http_pool [--requests 200] [--latency 0.005]
+"""
+import argparse
+import asyncio
+import os
+import statistics
+import tempfile
+import time
+
+os.environ.setdefault('SHOPEE_PARTNER_ID', 'bench')
+os.environ.setdefault('SHOPEE_API_KEY', 'bench')
+os.environ.setdefault('SHORT_LINKS_DB', ':memory:')
+os.environ.setdefault('DATA_DIR', tempfile.mkdtemp())
+
+import aiohttp
+from benchmarks.stub_server import ShopeeStub, disable_api_rate_limit
+import services.shopee_api as shopee_api
+from services import http_client
+
+def summarize(label: str, samples: list) -> None:
+    samples = sorted(samples)
+    p95 = samples[int(len(samples) * 0.95) - 1]
+    print(
+        f"{label:<12} média={statistics.mean(samples) * 1000:7.2f}ms "
+        f"p50={statistics.median(samples) * 1000:7.2f}ms p95={p95 * 1000:7.2f}ms"
+    )
+
+async def run_lookups(n: int, shop_id: int) -> list:
+    samples = []
+    for i in range(n):
+        start = time.perf_counter()
+        # IDs distintos: cada consulta chega de fato ao stub (sem acerto de cache)
+        product = await shopee_api.get_product_details(f"https://shopee.com.br/product/{shop_id}/{i}")
+        samples.append(time.perf_counter() - start)
+        assert product is not None
+    return samples
+
+async def main(n: int, latency: float) -> None:
+    stub = await ShopeeStub(latency=latency).start()
+    shopee_api.API_URL = stub.graphql_url
+    disable_api_rate_limit(shopee_api)
+    original_get_session = shopee_api.get_http_session
+    try:
+        # Sem pool: uma sessão nova (e uma conexão nova) por consulta, como antes
+        opened = []
+        def fresh_session():
+            session = aiohttp.ClientSession(connector=aiohttp.TCPConnector(force_close=True))
+            opened.append(session)
+            return session
+        shopee_api.get_http_session = fresh_session
+        without_pool = await run_lookups(n, shop_id=1)
+        for session in opened:
+            await session.close()
+
+        # Com pool: sessão compartilhada com keep-alive
+        shopee_api.get_http_session = original_get_session
+        await http_client.init_http_session()
+        await run_lookups(5, shop_id=2)  # aquece a conexão
+        with_pool = await run_lookups(n, shop_id=3)
+        await http_client.close_http_session()
+    finally:
+        shopee_api.get_http_session = original_get_session
+        await stub.stop()
+
+    print(f"{n} consultas sequenciais, latência do stub {latency * 1000:.1f}ms")
+    summarize("sem pool", without_pool)
+    summarize("com pool", with_pool)
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser()
+    parser.add_argument('--requests', type=int, default=200)
+    parser.add_argument('--latency', type=float, default=0.0)
+    args = parser.parse_args()
+    asyncio.run(main(args.requests, args.latency))
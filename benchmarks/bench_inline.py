@@ -0,0 +1,176 @@
+"""
+Benchmark: modo inline (handlers/inline.py) com o Application do main.py, a Bot API falsa e o
+stub da Shopee
+
+1. digitação: N usuários digitam o número do produto depois de colar o começo do link, uma
+   consulta inline por tecla (cada prefixo é outro produto válido). Compara sem debounce nem
+   cancelamento, só cancelamento e debounce + cancelamento: chamadas à API, respostas
+   desperdiçadas (consultas já substituídas) e latência da resposta da última consulta
+2. cache: outros usuários colam os mesmos links com outro texto em volta; respondido pelo cache
+   local, sem chamar a API, com cache_time e is_personal=False para o Telegram guardar
+
+Uso: python -m benchmarks.bench_inline [--users 50] [--digits 6] [--typing 0.15] [--latency 0.3]
+"""
+import argparse
+import asyncio
+import os
+import random
+import statistics
+import tempfile
+import time
+
+os.environ.setdefault('TELEGRAM_TOKEN', '123456:bench')
+os.environ.setdefault('SHOPEE_PARTNER_ID', 'bench')
+os.environ.setdefault('SHOPEE_API_KEY', 'bench')
+os.environ.setdefault('SHORT_LINKS_DB', ':memory:')
+os.environ.setdefault('DATA_DIR', tempfile.mkdtemp())
+
+from telegram import Update
+from telegram.ext import Application
+
+from benchmarks.stub_server import ShopeeStub, disable_api_rate_limit
+from benchmarks.telegram_stub import TelegramStub, StubRequest
+import handlers.inline as inline
+import services.shopee_api as shopee_api
+from services import http_client
+import main as bot_main
+
+PREFIX = "https://shopee.com.br/product/1/"
+
+class NoCancel(inline.LatestQueries):
+    """Consultas substituídas seguem até o fim (sem cancelamento)"""
+
+    def begin(self, user_id: int, links: tuple) -> int:
+        self._turns += 1
+        self._latest[user_id] = (self._turns, links, None)
+        return self._turns
+
+def percentile(values, p: float) -> float:
+    return values[min(len(values) - 1, int(len(values) * p))]
+
+async def run_config(name: str, application: Application, telegram: TelegramStub, shopee: ShopeeStub,
+                     users: int, digits: int, typing: float, first_user: int) -> dict:
+    shopee_api.product_cache.clear()
+    inline.inline_results.clear()
+    calls = shopee.graphql_calls
+    answers = len(telegram.sent)
+    last_query = {}
+    typed = {}
+
+    async def user(user_id: int) -> None:
+        # Número do produto digitado tecla a tecla (primeiro dígito diferente de zero)
+        item = str(random.randint(10 ** (digits - 1), 10 ** digits - 1))
+        for n in range(1, digits + 1):
+            data = telegram.inline_query_update(user_id, PREFIX + item[:n])
+            last_query[user_id] = (data["inline_query"]["id"], time.perf_counter())
+            typed[user_id] = PREFIX + item[:n]
+            await application.update_queue.put(Update.de_json(data, application.bot))
+            await asyncio.sleep(random.uniform(0.5, 1.5) * typing)
+
+    await asyncio.gather(*(user(first_user + n) for n in range(users)))
+    final = {query_id: injected for query_id, injected in last_query.values()}
+    deadline = time.perf_counter() + 60
+    while time.perf_counter() < deadline:
+        answered = {params["inline_query_id"] for _, method, params in telegram.sent[answers:]}
+        if final.keys() <= answered:
+            break
+        await asyncio.sleep(0.05)
+    # Respostas atrasadas de consultas substituídas ainda podem chegar
+    await asyncio.sleep(1)
+
+    latencies = []
+    wasted = 0
+    for at, method, params in telegram.sent[answers:]:
+        injected = final.get(params["inline_query_id"])
+        if injected is None:
+            wasted += 1
+        else:
+            latencies.append((at - injected) * 1000)
+    assert len(latencies) == users, f"{name}: {len(latencies)}/{users} respostas"
+    latencies.sort()
+    result = {
+        "queries": users * digits,
+        "graphql": shopee.graphql_calls - calls,
+        "wasted": wasted,
+        "p50": statistics.median(latencies),
+        "p99": percentile(latencies, 0.99),
+        "links": list(typed.values()),
+    }
+    print(f"{name:<26}{result['queries']:>10}{result['graphql']:>9}{result['wasted']:>13}"
+          f"{result['p50']:>10.0f}{result['p99']:>10.0f}")
+    return result
+
+async def cached_wave(application: Application, telegram: TelegramStub, shopee: ShopeeStub,
+                      links: list, first_user: int) -> dict:
+    """Mesmos links de antes, com outro texto: respondidos pelo cache de respostas"""
+    calls = shopee.graphql_calls
+    answers = len(telegram.sent)
+    injected = {}
+    for n, link in enumerate(links):
+        data = telegram.inline_query_update(first_user + n, f"olha essa oferta {link} !")
+        injected[data["inline_query"]["id"]] = time.perf_counter()
+        await application.update_queue.put(Update.de_json(data, application.bot))
+    await telegram.wait_sent(answers + len(links), timeout=30)
+    sent = telegram.sent[answers:]
+    latencies = sorted((at - injected[params["inline_query_id"]]) * 1000 for at, _, params in sent)
+    assert all(params["cache_time"] == inline.INLINE_CACHE_TIME and not params.get("is_personal")
+               for _, _, params in sent)
+    return {"queries": len(links), "graphql": shopee.graphql_calls - calls,
+            "p50": statistics.median(latencies), "p99": percentile(latencies, 0.99)}
+
+async def main(users: int, digits: int, typing: float, latency: float) -> None:
+    random.seed(1)
+    shopee = await ShopeeStub(latency=latency).start()
+    shopee_api.API_URL = shopee.graphql_url
+    disable_api_rate_limit(shopee_api)
+    telegram = TelegramStub()
+    builder = (
+        Application.builder()
+        .token(os.environ['TELEGRAM_TOKEN'])
+        .request(StubRequest(telegram))
+        .get_updates_request(StubRequest(telegram))
+    )
+    application = bot_main.build_application(builder)
+    await application.initialize()
+    await application.start()
+
+    debounce = inline.INLINE_DEBOUNCE
+    configs = [
+        ("sem debounce/cancelamento", 0.0, NoCancel()),
+        ("só cancelamento", 0.0, inline.LatestQueries()),
+        (f"debounce {debounce * 1000:.0f}ms + cancel.", debounce, inline.LatestQueries()),
+    ]
+    print(f"{users} usuários digitando {digits} dígitos, ~{typing * 1000:.0f}ms por tecla, "
+          f"API com {latency * 1000:.0f}ms de latência")
+    print(f"{'':<26}{'consultas':>10}{'GraphQL':>9}{'desperdício':>13}{'p50 (ms)':>10}{'p99 (ms)':>10}")
+    results = {}
+    for n, (name, wait, queries) in enumerate(configs):
+        inline.INLINE_DEBOUNCE = wait
+        inline.latest_queries = queries
+        results[name] = await run_config(name, application, telegram, shopee, users, digits, typing,
+                                         first_user=(n + 1) * 10**6)
+    naive, cancel, debounced = results.values()
+    print(f"debounce + cancelamento: {naive['graphql'] / debounced['graphql']:.1f}x menos chamadas à API, "
+          f"{naive['wasted']} -> {debounced['wasted']} respostas desperdiçadas")
+    assert debounced["graphql"] < naive["graphql"] / 2 and debounced["wasted"] < naive["wasted"]
+    assert cancel["wasted"] < naive["wasted"]
+
+    cached = await cached_wave(application, telegram, shopee, debounced["links"], first_user=10**7)
+    print(f"cache: {cached['queries']} consultas com os mesmos links e outro texto, {cached['graphql']} chamadas "
+          f"à API, p50={cached['p50']:.1f}ms p99={cached['p99']:.1f}ms "
+          f"(cache_time={inline.INLINE_CACHE_TIME}s, is_personal=False)")
+    assert cached["graphql"] == 0 and cached["p99"] < debounced["p50"]
+
+    await application.stop()
+    await application.shutdown()
+    await http_client.close_http_session()
+    await shopee.stop()
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser()
+    parser.add_argument('--users', type=int, default=50)
+    parser.add_argument('--digits', type=int, default=6)
+    parser.add_argument('--typing', type=float, default=0.15, help="intervalo médio entre teclas (s)")
+    parser.add_argument('--latency', type=float, default=0.3, help="latência do stub da Shopee (s)")
+    args = parser.parse_args()
+    asyncio.run(main(args.users, args.digits, args.typing, args.latency))
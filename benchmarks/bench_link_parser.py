@@ -0,0 +1,170 @@
+"""
+Benchmark e regressão do reconhecimento de links (utils/link_parser.py)
+
+Primeiro confere que todos os formatos aceitos pelos padrões antigos continuam
+reconhecidos com o mesmo resultado; depois mede o custo por mensagem num corpus
+parecido com o tráfego dos grupos (a maioria sem link).
+
+Uso: python -m benchmarks.bench_link_parser [--messages 20000] [--link-ratio 0.05]
+"""
+import argparse
+import random
+import re
+import time
+from urllib.parse import urlparse, parse_qs, unquote
+
+from utils.link_parser import extract_shopee_url, extract_shopee_urls, extract_product_ids, has_shopee_link
+
+# Implementação anterior (handlers/shopee.py e services/shopee_api.py), sem os prints
+def legacy_extract_shopee_url(text):
+    patterns = [
+        r'https?://[^\s<>"]+?shopee\.com\.br[^\s<>"]+',
+        r'https?://shope\.ee[^\s<>"]+',
+        r'https?://s\.shopee[^\s<>"]+',
+    ]
+    for pattern in patterns:
+        match = re.search(pattern, text)
+        if match:
+            return match.group(0).split('?')[0]
+    return None
+
+def legacy_extract_product_info(url):
+    try:
+        clean_url = unquote(url.split('?')[0])
+        patterns = [
+            r"i\.(\d+)\.(\d+)",
+            r"product/(\d+)/(\d+)",
+            r"-i\.(\d+)\.(\d+)",
+            r"\.(\d+)\.(\d+)$",
+            r"(?:/|-)i\.(\d+)\.(\d+)(?:/|$)",
+            r"(?:/|-)(\d+)\.(\d+)(?:/|$)",
+        ]
+        for pattern in patterns:
+            match = re.search(pattern, clean_url)
+            if match:
+                return int(match.group(1)), int(match.group(2))
+        query_params = parse_qs(urlparse(url).query)
+        if 'shop_id' in query_params and 'item_id' in query_params:
+            return int(query_params['shop_id'][0]), int(query_params['item_id'][0])
+        parts = clean_url.split('-i.')
+        if len(parts) > 1:
+            id_parts = parts[-1].split('.')
+            if len(id_parts) >= 2:
+                try:
+                    return int(id_parts[0]), int(id_parts[1].split('?')[0])
+                except ValueError:
+                    pass
+        return None
+    except Exception:
+        return None
+
+# Mensagens com link aceitas pelos padrões antigos
+LINK_MESSAGES = [
+    "Olha essa oferta https://www.shopee.com.br/Fone-Bluetooth-i.123456.789012 corre!",
+    "https://www.shopee.com.br/Fone-Bluetooth-i.123456.789012?sp_atk=abc&xptdk=def",
+    "promo: https://www.shopee.com.br/product/123456/789012",
+    "https://m.shopee.com.br/Produto-i.1.2",
+    "link curto https://shope.ee/AbCdEf123",
+    "http://shope.ee/9xYz?lang=pt",
+    "https://s.shopee.com.br/4AbCdE",
+    "confere aqui (https://s.shopee.com.br/7XyZ) valeu",
+    "https://www.shopee.com.br/Kit%20Panelas%20Antiaderente-i.111.222",
+    "https://www.shopee.com.br/universal-link/product/333/444?utm=1",
+    "duas ofertas https://shope.ee/Aaa e https://www.shopee.com.br/X-i.5.6",
+]
+
+# URLs de produto e os IDs que os padrões antigos extraem
+PRODUCT_URLS = [
+    "https://shopee.com.br/Fone-Bluetooth-i.123456.789012",
+    "https://shopee.com.br/Fone-Bluetooth-i.123456.789012?sp_atk=abc",
+    "https://shopee.com.br/product/123456/789012",
+    "https://shopee.com.br/product/123456/789012?smtt=0.0.9",
+    "https://shopee.com.br/i.42.4242",
+    "https://shopee.com.br/Kit%20Panelas-i.111.222",
+    "https://shopee.com.br/alguma-coisa.987.654",
+    "https://shopee.com.br/loja/777.888/",
+    "https://shopee.com.br/find?shop_id=55&item_id=66",
+    "https://shopee.com.br/product/1/2-i.3.4",
+    "https://shopee.com.br/sem-ids-aqui",
+    "https://shopee.com.br/find?shop_id=abc&item_id=1",
+]
+
+CHAT_MESSAGES = [
+    "bom dia grupo!",
+    "alguém sabe se a promoção de ontem ainda tá valendo?",
+    "kkkkkk",
+    "vou passar no mercado depois, alguém precisa de algo?",
+    "olha esse vídeo https://www.youtube.com/watch?v=dQw4w9WgXcQ",
+    "comprei na shopee semana passada e chegou rápido",
+    "https://www.mercadolivre.com.br/produto-legal/p/MLB123",
+    "Lembrete: reunião às 19h 📅",
+    "obrigado pessoal 🙏",
+    "qual o cupom de hoje? o de frete grátis acabou",
+]
+
+def check_regressions() -> None:
+    for text in LINK_MESSAGES:
+        expected = legacy_extract_shopee_url(text)
+        assert expected is not None, text
+        assert extract_shopee_url(text) == expected or expected in extract_shopee_urls(text), text
+        assert has_shopee_link(text), text
+    for text in CHAT_MESSAGES:
+        assert legacy_extract_shopee_url(text) is None
+        assert not has_shopee_link(text), text
+        assert extract_shopee_urls(text) == [], text
+    for url in PRODUCT_URLS:
+        assert extract_product_ids(url) == legacy_extract_product_info(url), url
+
+    # Formatos novos: domínio sem www (os padrões antigos exigiam algo antes de "shopee.com.br")
+    assert extract_shopee_url("https://shopee.com.br/Produto-i.1.2") == "https://shopee.com.br/Produto-i.1.2"
+    assert extract_shopee_urls("a https://shope.ee/x b https://shope.ee/x c https://s.shopee.com.br/y") == [
+        "https://shope.ee/x", "https://s.shopee.com.br/y"
+    ]
+    assert len(extract_shopee_urls(" ".join(f"https://shope.ee/{n}" for n in range(50)), limit=10)) == 10
+
+def build_corpus(size: int, link_ratio: float) -> list:
+    rng = random.Random(42)
+    return [
+        rng.choice(LINK_MESSAGES) if rng.random() < link_ratio else rng.choice(CHAT_MESSAGES)
+        for _ in range(size)
+    ]
+
+def legacy_pipeline(text):
+    url = legacy_extract_shopee_url(text)
+    if url:
+        return legacy_extract_product_info(url)
+    return None
+
+def new_pipeline(text):
+    # O filtro do MessageHandler descarta a mensagem antes do handler
+    if not has_shopee_link(text):
+        return None
+    urls = extract_shopee_urls(text)
+    return extract_product_ids(urls[0]) if urls else None
+
+def measure(pipeline, corpus: list) -> float:
+    start = time.perf_counter()
+    for text in corpus:
+        pipeline(text)
+    return time.perf_counter() - start
+
+def main(messages: int, link_ratio: float) -> None:
+    check_regressions()
+    print(f"Regressão: {len(LINK_MESSAGES)} mensagens com link, {len(CHAT_MESSAGES)} sem link, "
+          f"{len(PRODUCT_URLS)} formatos de URL — OK")
+
+    corpus = build_corpus(messages, link_ratio)
+    for pipeline in (legacy_pipeline, new_pipeline):
+        measure(pipeline, corpus[:1000])  # aquece o cache de regex do módulo re
+    legacy = measure(legacy_pipeline, corpus)
+    new = measure(new_pipeline, corpus)
+    print(f"{messages} mensagens, {link_ratio:.0%} com link")
+    print(f"antigo {legacy / messages * 1e6:6.2f}µs/mensagem")
+    print(f"novo   {new / messages * 1e6:6.2f}µs/mensagem ({legacy / new:.1f}x)")
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser()
+    parser.add_argument('--messages', type=int, default=20000)
+    parser.add_argument('--link-ratio', type=float, default=0.05)
+    args = parser.parse_args()
+    main(args.messages, args.link_ratio)
@@ -0,0 +1,118 @@
+"""
+Benchmark: SQLitePersistence x PicklePersistence com 100k chats
+
+1. inicialização: o que o Application faz no initialize (get_user_data/get_chat_data/get_bot_data)
+   mais o primeiro update de um chat
+2. coleta periódica do PTB com N chats alterados (update_chat_data para cada um)
+3. confere que os dados voltam iguais após reiniciar
+
+Uso: python -m benchmarks.bench_persistence [--chats 100000] [--dirty 100]
+"""
+import argparse
+import asyncio
+import os
+import random
+import tempfile
+import time
+import tracemalloc
+from copy import deepcopy
+
+from telegram.ext import PicklePersistence
+
+from services.persistence import SQLitePersistence
+
+def chat_data(chat_id: int) -> dict:
+    return {
+        "lang": "pt",
+        "favoritos": [chat_id * 10 + n for n in range(5)],
+        "config": {"notif": True, "grupo": -1000000000000 - chat_id},
+    }
+
+async def load(persistence, chat_id: int) -> dict:
+    chats = await persistence.get_chat_data()
+    await persistence.get_user_data()
+    await persistence.get_bot_data()
+    data = deepcopy(chats.get(chat_id, {}))
+    await persistence.refresh_chat_data(chat_id, data)
+    return data
+
+async def startup(factory, chat_id: int):
+    """Mede a inicialização e o primeiro update de um chat; a memória é medida numa segunda instância"""
+    start = time.perf_counter()
+    data = await load(factory(), chat_id)
+    elapsed = time.perf_counter() - start
+    tracemalloc.start()
+    await load(factory(), chat_id)
+    memory = tracemalloc.get_traced_memory()[1]
+    tracemalloc.stop()
+    return elapsed, memory, data
+
+async def main(chats: int, dirty: int, sqlite_rounds: int) -> None:
+    with tempfile.TemporaryDirectory() as tmp:
+        pickle_path = os.path.join(tmp, "bot.pickle")
+        sqlite_path = os.path.join(tmp, "persistence.sqlite3")
+        all_data = {chat_id: chat_data(chat_id) for chat_id in range(chats)}
+
+        # Carga inicial
+        start = time.perf_counter()
+        persistence = PicklePersistence(pickle_path, on_flush=True)
+        persistence.chat_data = dict(all_data)
+        await persistence.flush()
+        print(f"PicklePersistence: {chats} chats gravados em {time.perf_counter() - start:.2f}s "
+              f"({os.path.getsize(pickle_path) / 1e6:.1f}MB)")
+
+        start = time.perf_counter()
+        persistence = SQLitePersistence(sqlite_path, write_delay=3600)
+        for chat_id, data in all_data.items():
+            await persistence.update_chat_data(chat_id, data)
+        persistence.write_pending()
+        await persistence.flush()
+        print(f"SQLitePersistence: {chats} chats gravados em {time.perf_counter() - start:.2f}s "
+              f"({os.path.getsize(sqlite_path) / 1e6:.1f}MB)")
+
+        # 1. Inicialização
+        probe = chats // 2
+        elapsed, memory, data = await startup(lambda: PicklePersistence(pickle_path), probe)
+        assert data == all_data[probe]
+        print(f"Inicialização Pickle: {elapsed * 1000:.0f}ms, pico de {memory / 1e6:.1f}MB")
+        elapsed, memory, data = await startup(lambda: SQLitePersistence(sqlite_path, write_delay=3600), probe)
+        assert data == all_data[probe]
+        print(f"Inicialização SQLite: {elapsed * 1000:.2f}ms, pico de {memory / 1e6:.2f}MB")
+
+        # 2. Coletas periódicas com alguns chats alterados
+        # O Pickle regrava o arquivo inteiro a cada chat (~1s cada): mede com poucos chats e uma coleta
+        pickle_persistence = PicklePersistence(pickle_path)
+        await pickle_persistence.get_chat_data()
+        sqlite = SQLitePersistence(sqlite_path, write_delay=3600)
+        for name, persistence, rounds, count in (("Pickle", pickle_persistence, 1, min(dirty, 5)),
+                                                  ("SQLite", sqlite, sqlite_rounds, dirty)):
+            random.seed(1)
+            timings = []
+            for round_ in range(rounds):
+                changed = random.sample(range(chats), count)
+                start = time.perf_counter()
+                for chat_id in changed:
+                    data = chat_data(chat_id)
+                    data["config"]["round"] = round_
+                    await persistence.update_chat_data(chat_id, data)
+                if persistence is sqlite:
+                    persistence.write_pending()
+                timings.append(time.perf_counter() - start)
+            print(f"Coleta com {count} chats alterados ({name}): {sum(timings) / rounds * 1000:.1f}ms "
+                  f"por coleta ({sum(timings) / rounds / count * 1e6:.0f}µs por chat)")
+        await sqlite.flush()
+
+        # 3. Os dados sobrevivem ao reinício
+        restarted = SQLitePersistence(sqlite_path)
+        data = {}
+        await restarted.refresh_chat_data(changed[0], data)
+        assert data["config"]["round"] == sqlite_rounds - 1, data
+        await restarted.flush()
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser()
+    parser.add_argument('--chats', type=int, default=100_000)
+    parser.add_argument('--dirty', type=int, default=100)
+    parser.add_argument('--rounds', type=int, default=5)
+    args = parser.parse_args()
+    asyncio.run(main(args.chats, args.dirty, args.rounds))
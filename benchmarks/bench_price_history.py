@@ -0,0 +1,185 @@
+"""
+Benchmark: histórico de preços em arquivos colunares mapeados em memória (services/price_history.py)
+
+1. grava N produtos x M amostras espalhadas em 90 dias (intercaladas, como chegam do bot)
+2. num processo novo: abre o histórico e consulta o menor preço de 30 dias e os últimos 7 dias
+   de produtos sorteados; mede a memória residente (anônima = heap do Python, arquivo = páginas
+   mapeadas, que o sistema descarta quando precisa) e compara com as mesmas amostras numa
+   lista de tuplas por produto
+3. compactação: amostras com mais de 7 dias viram menor/maior preço por dia; o menor e o maior
+   preço de cada período continuam os mesmos
+4. consultas só de preço (sem o preço "de"): mantêm o último preço "de" gravado, sem quebrar o
+   descarte de amostras repetidas
+
+Uso: python -m benchmarks.bench_price_history [--items 2000] [--samples 1000] [--queries 10000]
+"""
+import argparse
+import asyncio
+import json
+import os
+import random
+import shutil
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+import tracemalloc
+
+from services.price_history import PriceHistory
+
+DAY = 86400
+NOW = 1_750_000_000
+SPAN = 90 * DAY
+
+def memory_mb() -> dict:
+    fields = {}
+    with open("/proc/self/status") as status:
+        for line in status:
+            name, _, value = line.partition(":")
+            if name in ("RssAnon", "RssFile"):
+                fields[name] = int(value.split()[0]) / 1024
+    return fields
+
+def percentile(values, p: float) -> float:
+    return values[min(len(values) - 1, int(len(values) * p))]
+
+def populate(path: str, items: int, samples: int) -> dict:
+    history = PriceHistory(path)
+    random.seed(1)
+    prices = [random.uniform(10, 500) for _ in range(items)]
+    started = time.perf_counter()
+    step = SPAN / samples
+    for n in range(samples):
+        base = NOW - SPAN + n * step
+        for item in range(items):
+            # Passeio aleatório: metade das consultas vê o preço mudar
+            if random.random() < 0.5:
+                prices[item] = max(1.0, prices[item] * random.uniform(0.9, 1.1))
+            history.record(1, item, prices[item], prices[item] * 1.5, now=base + item * step / items)
+    elapsed = time.perf_counter() - started
+    stats = history.stats()
+    history.close()
+    return {"elapsed": elapsed, **stats}
+
+def query(path: str, items: int, queries: int) -> dict:
+    """Roda num processo novo: memória do histórico aberto e latência das consultas"""
+    before = memory_mb()
+    history = PriceHistory(path)
+    started = time.perf_counter()
+    history.stats()
+    open_ms = (time.perf_counter() - started) * 1000
+    random.seed(2)
+    lowest, recent = [], []
+    for _ in range(queries):
+        item = random.randrange(items)
+        started = time.perf_counter()
+        found = history.lowest_price(1, item, 30, now=NOW)
+        lowest.append((time.perf_counter() - started) * 1e6)
+        assert found is not None
+        started = time.perf_counter()
+        samples = history.history(1, item, NOW - 7 * DAY, NOW)
+        recent.append((time.perf_counter() - started) * 1e6)
+        assert samples
+    after = memory_mb()
+    lowest.sort()
+    recent.sort()
+    return {
+        "open_ms": open_ms,
+        "lowest_p50": statistics.median(lowest), "lowest_p99": percentile(lowest, 0.99),
+        "recent_p50": statistics.median(recent), "recent_p99": percentile(recent, 0.99),
+        "anon_mb": after["RssAnon"] - before["RssAnon"],
+        "file_mb": after["RssFile"] - before["RssFile"],
+    }
+
+def tuples_mb(items: int, samples: int) -> float:
+    """Memória das mesmas amostras como {produto: [(horário, preço, preço "de"), ...]} (estimada por amostragem)"""
+    sample_items = max(1, min(items, 200_000 // samples))
+    tracemalloc.start()
+    data = {(1, item): [(NOW + n, 100.0 + n, 150.0 + n) for n in range(samples)] for item in range(sample_items)}
+    size = tracemalloc.get_traced_memory()[0]
+    tracemalloc.stop()
+    del data
+    return size * items / sample_items / 1e6
+
+async def compaction(path: str, items: int) -> dict:
+    history = PriceHistory(path)
+    random.seed(3)
+    checked = random.sample(range(items), min(items, 200))
+    # Períodos em dias inteiros (a compactação guarda os extremos de cada dia)
+    month, first = (NOW - 30 * DAY) // DAY * DAY, (NOW - SPAN) // DAY * DAY
+    periods = [(month, NOW), (first, month - 1), (first, NOW)]
+    expected = {(item, period): history.price_range(1, item, *period)[:2] for item in checked for period in periods}
+    started = time.perf_counter()
+    result = await history.compact(now=NOW)
+    elapsed = time.perf_counter() - started
+    history.close()
+
+    # Reaberto do disco: mesmos extremos em todos os períodos
+    history = PriceHistory(path)
+    for (item, (start, end)), extremes in expected.items():
+        found = history.price_range(1, item, start, end)
+        assert found is not None and found[:2] == extremes, (item, start, end, found, extremes)
+    stats = history.stats()
+    history.close()
+    return {"elapsed": elapsed, **result, "file_bytes": stats["file_bytes"]}
+
+def unknown_original(path: str) -> None:
+    history = PriceHistory(path)
+    assert history.record(1, 99, 10.0, 15.0, now=NOW)
+    # Mesmo preço sem o preço "de", dentro do intervalo mínimo: repetida
+    assert not history.record(1, 99, 10.0, now=NOW + 60)
+    assert history.record(1, 99, 9.0, now=NOW + 120)
+    assert history.history(1, 99) == [(NOW, 10.0, 15.0), (NOW + 120, 9.0, 15.0)], history.history(1, 99)
+    # Primeira amostra do produto sem o preço "de": fica 0 (desconhecido)
+    assert history.record(1, 98, 5.0, now=NOW)
+    assert history.history(1, 98) == [(NOW, 5.0, 0.0)]
+    history.close()
+    print('consultas só de preço: preço "de" anterior mantido, repetidas descartadas')
+
+def main(items: int, samples: int, queries: int) -> None:
+    path = os.path.join(tempfile.mkdtemp(), "price_history")
+    try:
+        written = populate(path, items, samples)
+        total = written["samples"]
+        assert total == items * samples, written
+        print(f"{total:,} amostras de {items:,} produtos gravadas em {written['elapsed']:.1f}s "
+              f"({total / written['elapsed']:,.0f}/s), {written['file_bytes'] / 1e6:.1f}MB em disco "
+              f"({written['file_bytes'] / total:.1f} bytes por amostra)")
+
+        child = subprocess.run(
+            [sys.executable, "-m", "benchmarks.bench_price_history", "--query-only", path,
+             "--items", str(items), "--queries", str(queries)],
+            capture_output=True, text=True, check=True,
+        )
+        result = json.loads(child.stdout.strip().splitlines()[-1])
+        in_memory = tuples_mb(items, samples)
+        print(f"abertura: {result['open_ms']:.0f}ms | menor preço em 30 dias: p50={result['lowest_p50']:.0f}µs "
+              f"p99={result['lowest_p99']:.0f}µs | últimos 7 dias: p50={result['recent_p50']:.0f}µs "
+              f"p99={result['recent_p99']:.0f}µs")
+        print(f"memória depois de {queries:,} consultas: {result['anon_mb']:.1f}MB anônima + "
+              f"{result['file_mb']:.1f}MB de páginas mapeadas | lista de tuplas em memória: {in_memory:.0f}MB")
+        assert result["lowest_p99"] < 1000 and result["recent_p99"] < 2000
+        assert result["anon_mb"] + result["file_mb"] < in_memory / 5
+
+        compacted = asyncio.run(compaction(path, items))
+        print(f"compactação: {compacted['samples_before']:,} -> {compacted['samples_after']:,} amostras "
+              f"em {compacted['elapsed']:.1f}s, {compacted['file_bytes'] / 1e6:.1f}MB em disco; "
+              f"menor/maior preço preservados")
+        assert compacted["samples_after"] < compacted["samples_before"]
+
+        unknown_original(os.path.join(os.path.dirname(path), "unknown_original"))
+    finally:
+        shutil.rmtree(os.path.dirname(path))
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser()
+    parser.add_argument('--items', type=int, default=2000)
+    parser.add_argument('--samples', type=int, default=1000)
+    parser.add_argument('--queries', type=int, default=10000)
+    parser.add_argument('--query-only', help=argparse.SUPPRESS)
+    args = parser.parse_args()
+    if args.query_only:
+        print(json.dumps(query(args.query_only, args.items, args.queries)))
+    else:
+        main(args.items, args.samples, args.queries)
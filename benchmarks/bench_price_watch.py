@@ -0,0 +1,178 @@
+"""
+Simulação do acompanhamento de preços (services/price_watch.py)
+
+100k produtos acompanhados por 10k usuários, contra o stub local da API. O relógio é
+virtual: cada rodada avança o tempo que as consultas levariam no ritmo configurado
+(PRICE_WATCH_RATE consultas GraphQL/s), e os preços do stub mudam a cada 10 minutos
+virtuais (5% dos produtos voláteis, o resto quase parado).
+
+Confere que:
+1. produtos repetidos entre usuários são consultados uma única vez
+2. o atraso das consultas (vencimento -> consulta) não cresce ao longo da simulação
+3. alertas só disparam quando o preço cruza o alvo
+4. alertas criados sem preço (consulta falhou no botão) ganham o alvo no primeiro preço e disparam
+
+Uso: python -m benchmarks.bench_price_watch [--users 10000] [--items 100000] [--hours 3]
+"""
+import argparse
+import asyncio
+import math
+import os
+import random
+import statistics
+import tempfile
+import time
+
+os.environ.setdefault('SHOPEE_PARTNER_ID', 'bench')
+os.environ.setdefault('SHOPEE_API_KEY', 'bench')
+os.environ.setdefault('SHORT_LINKS_DB', ':memory:')
+os.environ.setdefault('DATA_DIR', tempfile.mkdtemp())
+
+from benchmarks.stub_server import ShopeeStub, disable_api_rate_limit
+import services.shopee_api as shopee_api
+from services import http_client
+from services.price_watch import PriceWatcher, ALERT, FAVORITE, alert_target
+
+BASE_PRICE = 4990000  # R$ 49,90 no formato da API
+TICK = 600.0
+
+async def check_alert_without_price(stub: ShopeeStub, path: str) -> None:
+    """Alerta criado com a API fora do ar: o alvo vem da primeira consulta que der certo"""
+    watcher = PriceWatcher(path)
+    notified = []
+
+    async def notify(user_ids, item):
+        notified.extend(user_ids)
+
+    watcher._notify = notify
+    now = time.time()
+    stub.prices = {}
+    watcher.add_watch(1, 2, 3, ALERT, price=None, now=now)
+
+    def target_of(user_id: int):
+        return watcher._connect().execute(
+            "SELECT target_price FROM watches WHERE user_id = ?", (user_id,)).fetchone()[0]
+
+    assert target_of(1) is None
+    await watcher.check_due(now=now)
+    assert target_of(1) == alert_target(BASE_PRICE / 100000), target_of(1)
+
+    # Produto já consultado: o alvo sai do último preço conhecido, mesmo sem preço no botão
+    watcher.add_watch(2, 2, 3, ALERT, price=None, now=now)
+    assert target_of(2) == target_of(1)
+
+    stub.prices = {(2, 3): int(BASE_PRICE * 0.8)}
+    await watcher.check_due(now=now + watcher.max_interval * 2)
+    assert sorted(notified) == [1, 2], notified
+    print(f"alerta criado sem preço: alvo R$ {target_of(1):.2f} definido na primeira consulta, disparado na queda")
+    await watcher.stop()
+    stub.prices = {}
+
+async def main(users: int, items: int, hours: float, rate: float, seed: int) -> None:
+    random.seed(seed)
+    stub = await ShopeeStub().start()
+    shopee_api.API_URL = stub.graphql_url
+    disable_api_rate_limit(shopee_api)
+
+    with tempfile.TemporaryDirectory() as tmp:
+        watcher = PriceWatcher(os.path.join(tmp, "price_watch.sqlite3"), rate=rate)
+        start_at = time.time()
+
+        # Cada usuário acompanha items/users produtos próprios e 2 de um grupo de produtos populares
+        per_user = items // users
+        popular = max(1, items // 100)
+        targets = {}
+        rows = []
+        for user_id in range(users):
+            own = [user_id * per_user + n for n in range(per_user)]
+            for item_id in own + random.sample(range(popular), 2):
+                kind = ALERT if (user_id + item_id) % 2 else FAVORITE
+                target = round(BASE_PRICE / 100000 * random.uniform(0.75, 0.95), 2) if kind == ALERT else None
+                if target is not None:
+                    targets[(user_id, item_id)] = target
+                rows.append((user_id, 1, item_id, kind, BASE_PRICE / 100000, target))
+        started = time.perf_counter()
+        watcher.add_watches(rows, now=start_at)
+        stored = watcher.stats()["items"]
+        print(f"{len(rows)} acompanhamentos de {users} usuários -> {stored} produtos distintos "
+              f"(gravados em {time.perf_counter() - started:.1f}s)")
+        assert stored == users * per_user
+
+        notified = []
+
+        async def notify(user_ids, item):
+            notified.extend((user_id, item) for user_id in user_ids)
+
+        watcher._notify = notify
+
+        # Preços: 5% voláteis (passeio aleatório a cada tick), o resto muda raramente
+        volatile = set(random.sample(range(items), items // 20))
+        prices = {}
+
+        def tick() -> None:
+            for item_id in volatile:
+                if random.random() < 0.5:
+                    current = prices.get(item_id, BASE_PRICE)
+                    prices[item_id] = max(1000000, int(current * random.uniform(0.85, 1.12)))
+            for item_id in random.sample(range(items), items // 500):
+                prices[item_id] = int(BASE_PRICE * random.uniform(0.7, 1.05))
+            stub.prices = {(1, item_id): price for item_id, price in prices.items()}
+
+        now = start_at
+        end_at = start_at + hours * 3600
+        next_tick = start_at
+        lags = []
+        hourly = {}
+        wall = time.perf_counter()
+        requests_before = stub.graphql_calls
+        while now < end_at:
+            if now >= next_tick:
+                tick()
+                next_tick += TICK
+            processed = await watcher.check_due(now=now)
+            if processed:
+                lags.append(watcher.last_lag)
+                hour = int((now - start_at) // 3600)
+                hourly[hour] = max(hourly.get(hour, 0.0), watcher.last_lag)
+                # Tempo que a rodada levaria no ritmo configurado
+                now += math.ceil(processed / shopee_api.GRAPHQL_BATCH_SIZE) / rate
+            if processed < watcher.cycle_size:
+                # Mesmo critério do laço do bot: espera juntar o próximo lote
+                now = max(now, min(watcher.next_wakeup(), next_tick, end_at))
+        wall = time.perf_counter() - wall
+        requests = stub.graphql_calls - requests_before
+
+        print(f"{hours:.0f}h simuladas em {wall:.1f}s: {watcher.checks} consultas de produto em {requests} "
+              f"chamadas GraphQL (ritmo {rate:.0f}/s), {watcher.changes} mudanças de preço")
+        lags.sort()
+        print(f"Atraso das consultas: p50={statistics.median(lags):.1f}s p99={lags[int(len(lags) * 0.99) - 1]:.1f}s "
+              f"máx={lags[-1]:.1f}s; máximo por hora: " + " / ".join(f"{lag:.1f}s" for lag in hourly.values()))
+        assert lags[-1] < watcher.min_interval, "o laço ficou para trás"
+
+        intervals = [row[0] for row in watcher._connect().execute("SELECT interval FROM items")]
+        volatile_intervals = [row[0] for row in watcher._connect().execute(
+            "SELECT interval FROM items WHERE item_id IN (%s)" % ",".join(map(str, list(volatile)[:500]))
+        )]
+        print(f"Intervalo médio: todos {statistics.mean(intervals) / 60:.0f}min, "
+              f"voláteis {statistics.mean(volatile_intervals) / 60:.0f}min")
+
+        for user_id, item in notified:
+            target = targets[(user_id, item["item_id"])]
+            assert item["price"] <= target < item["old_price"], (target, item)
+        print(f"{len(notified)} alertas disparados, todos em cruzamentos do preço alvo")
+        print(f"Tempo de CPU por 1000 consultas (SQLite + parse + stub): {wall / watcher.checks * 1000 * 1000:.0f}ms")
+
+        await watcher.stop()
+        await check_alert_without_price(stub, os.path.join(tmp, "price_watch_alerts.sqlite3"))
+    await http_client.close_http_session()
+    await stub.stop()
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser()
+    parser.add_argument('--users', type=int, default=10_000)
+    parser.add_argument('--items', type=int, default=100_000)
+    parser.add_argument('--hours', type=float, default=3)
+    parser.add_argument('--rate', type=float, default=3)
+    parser.add_argument('--seed', type=int, default=1)
+    args = parser.parse_args()
+    asyncio.run(main(args.users, args.items, args.hours, args.rate, args.seed))
@@ -0,0 +1,147 @@
+"""
+Benchmark: cartões com foto reaproveitando o file_id do Telegram (services/product_images.py)
+
+P produtos enviados para G chats cada (como uma divulgação, com até --concurrency envios ao
+mesmo tempo), com o stub do CDN da Shopee e a Bot API falsa com banda de upload limitada:
+
+1. ingênuo: cada envio baixa a imagem e a envia por upload
+2. frio: file_ids vazios; o primeiro envio de cada imagem baixa e sobe, os outros esperam o file_id
+3. quente: o bot "reiniciado" (file_ids lidos do SQLite): nenhum download nem upload
+
+Mede a latência por envio e os bytes baixados/enviados. Confere também que downloads
+simultâneos da mesma imagem viram um e que no máximo IMAGE_DOWNLOAD_CONCURRENCY rodam juntos.
+
+Uso: python -m benchmarks.bench_product_images [--products 20] [--chats 50] [--concurrency 10]
+     [--image-size 80000] [--latency 0.05]
+"""
+import argparse
+import asyncio
+import os
+import statistics
+import tempfile
+import time
+
+os.environ.setdefault('TELEGRAM_TOKEN', '123456:bench')
+os.environ.setdefault('SHOPEE_PARTNER_ID', 'bench')
+os.environ.setdefault('SHOPEE_API_KEY', 'bench')
+os.environ.setdefault('SHORT_LINKS_DB', ':memory:')
+os.environ.setdefault('DATA_DIR', tempfile.mkdtemp())
+
+from telegram import Bot
+
+from benchmarks.stub_server import ShopeeStub
+from benchmarks.telegram_stub import TelegramStub, StubRequest
+import services.product_images as product_images
+from services.product_images import ProductImages, FileIdStore
+from services import http_client
+
+CAPTION = "📦 *Produto*\n\n💰 R$ 49.90\n\n🔗 [Ver na Shopee](https://shopee.com.br/product/1/1)"
+
+def percentile(values, p: float) -> float:
+    return values[min(len(values) - 1, int(len(values) * p))]
+
+async def naive_send(bot: Bot, chat_id: int, image: str):
+    """Antes do cache: baixa e sobe a imagem a cada envio"""
+    async with http_client.get_http_session().get(ProductImages.image_url(image)) as response:
+        data = await response.read()
+    return await bot.send_photo(chat_id=chat_id, photo=data, caption=CAPTION, parse_mode='Markdown')
+
+async def run_config(name: str, send, shopee: ShopeeStub, telegram: TelegramStub,
+                     products: int, chats: int, concurrency: int) -> dict:
+    downloaded, uploaded = shopee.image_bytes, telegram.bytes_uploaded
+    downloads, uploads = shopee.image_calls, telegram.uploads
+    semaphore = asyncio.Semaphore(concurrency)
+    latencies = []
+
+    async def one(chat_id: int, image: str) -> None:
+        async with semaphore:
+            started = time.perf_counter()
+            message = await send(chat_id, image)
+            latencies.append((time.perf_counter() - started) * 1000)
+            assert message.photo
+
+    started = time.perf_counter()
+    # Cada chat recebe todos os produtos; o mesmo produto vai para vários chats ao mesmo tempo
+    await asyncio.gather(*(one(chat_id, f"img_{n}") for chat_id in range(1, chats + 1) for n in range(products)))
+    total = time.perf_counter() - started
+    latencies.sort()
+    sends = products * chats
+    result = {
+        "sends": sends,
+        "total": total,
+        "p50": statistics.median(latencies),
+        "p99": percentile(latencies, 0.99),
+        "downloads": shopee.image_calls - downloads,
+        "uploads": telegram.uploads - uploads,
+        "downloaded": shopee.image_bytes - downloaded,
+        "uploaded": telegram.bytes_uploaded - uploaded,
+    }
+    print(f"{name:<10}{sends:>8}{result['total']:>9.1f}s{result['p50']:>10.0f}{result['p99']:>10.0f}"
+          f"{result['downloads']:>11}{result['uploads']:>9}"
+          f"{(result['downloaded'] + result['uploaded']) / sends / 1000:>14.1f}")
+    return result
+
+async def check_downloads(shopee: ShopeeStub, images: int, repeats: int) -> None:
+    """Downloads simultâneos: um por imagem, no máximo IMAGE_DOWNLOAD_CONCURRENCY de cada vez"""
+    pool = ProductImages(FileIdStore(':memory:'))
+    calls = shopee.image_calls
+    shopee.max_images_in_flight = 0
+    results = await asyncio.gather(*(pool.download(f"dl_{n}") for _ in range(repeats) for n in range(images)))
+    assert all(len(data) == shopee.image_size for data in results)
+    assert shopee.image_calls - calls == images, shopee.image_calls - calls
+    assert shopee.max_images_in_flight <= product_images.IMAGE_DOWNLOAD_CONCURRENCY
+    print(f"downloads: {images * repeats} pedidos de {images} imagens -> {shopee.image_calls - calls} downloads, "
+          f"no máximo {shopee.max_images_in_flight} simultâneos "
+          f"(IMAGE_DOWNLOAD_CONCURRENCY={product_images.IMAGE_DOWNLOAD_CONCURRENCY})")
+
+async def main(products: int, chats: int, concurrency: int, image_size: int, latency: float) -> None:
+    # CDN a ~2MB/s, upload para o Telegram a ~1MB/s (conexão de um Repl)
+    shopee = await ShopeeStub(latency=latency).start()
+    shopee.image_size = image_size
+    shopee.image_rate = 2_000_000
+    product_images.IMAGE_URL = shopee.image_url
+    telegram = TelegramStub(latency=latency, upload_rate=1_000_000)
+    bot = Bot(os.environ['TELEGRAM_TOKEN'], request=StubRequest(telegram), get_updates_request=StubRequest(telegram))
+    await bot.initialize()
+    path = os.path.join(tempfile.mkdtemp(), "product_images.sqlite3")
+
+    print(f"{products} produtos x {chats} chats, {concurrency} envios simultâneos, imagens de "
+          f"{image_size / 1000:.0f}kB, {latency * 1000:.0f}ms de latência")
+    print(f"{'':<10}{'envios':>8}{'total':>10}{'p50 (ms)':>10}{'p99 (ms)':>10}"
+          f"{'downloads':>11}{'uploads':>9}{'kB por envio':>14}")
+    naive = await run_config("ingênuo", lambda chat_id, image: naive_send(bot, chat_id, image),
+                             shopee, telegram, products, chats, concurrency)
+
+    cold_pool = ProductImages(FileIdStore(path))
+    cold = await run_config("frio", lambda chat_id, image: cold_pool.send_photo(
+        bot, chat_id, image, caption=CAPTION, parse_mode='Markdown'), shopee, telegram, products, chats, concurrency)
+    cold_pool.close()
+
+    # Reinício: os file_ids vêm do SQLite
+    warm_pool = ProductImages(FileIdStore(path))
+    warm = await run_config("quente", lambda chat_id, image: warm_pool.send_photo(
+        bot, chat_id, image, caption=CAPTION, parse_mode='Markdown'), shopee, telegram, products, chats, concurrency)
+    warm_pool.close()
+
+    assert naive["downloads"] == naive["uploads"] == naive["sends"]
+    assert cold["downloads"] == cold["uploads"] == products, cold
+    assert warm["downloads"] == warm["uploads"] == 0, warm
+    assert warm["p99"] < cold["p99"] and cold["total"] < naive["total"]
+    print(f"frio: {naive['downloaded'] / cold['downloaded']:.0f}x menos bytes que o ingênuo | quente: p50 "
+          f"{naive['p50'] / warm['p50']:.1f}x menor que o ingênuo, nenhum byte de imagem")
+
+    await check_downloads(shopee, images=40, repeats=5)
+
+    await bot.shutdown()
+    await http_client.close_http_session()
+    await shopee.stop()
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser()
+    parser.add_argument('--products', type=int, default=20)
+    parser.add_argument('--chats', type=int, default=50)
+    parser.add_argument('--concurrency', type=int, default=10)
+    parser.add_argument('--image-size', type=int, default=80_000)
+    parser.add_argument('--latency', type=float, default=0.05)
+    args = parser.parse_args()
+    asyncio.run(main(args.products, args.chats, args.concurrency, args.image_size, args.latency))
@@ -0,0 +1,139 @@
+"""
+Benchmark: perfis de campos do GraphQL, respostas compactadas e decodificação (services/shopee_api.py)
+
+1. bytes recebidos por consulta (1 item e lote de 10) em cada perfil, sem e com gzip; o perfil
+   "full" pede os mesmos campos da consulta antiga
+2. tempo de decodificação: antes (texto -> json.loads -> dicionário, resposta completa) x
+   agora (bytes -> json_loads -> Product, perfil do cartão)
+3. memória por produto: dicionário x Product com __slots__
+
+Uso: python -m benchmarks.bench_profiles [--rounds 2000] [--products 10000]
+"""
+import argparse
+import asyncio
+import json
+import os
+import tempfile
+import time
+import tracemalloc
+
+os.environ.setdefault('SHOPEE_PARTNER_ID', 'bench')
+os.environ.setdefault('SHOPEE_API_KEY', 'bench')
+os.environ.setdefault('SHORT_LINKS_DB', ':memory:')
+os.environ.setdefault('DATA_DIR', tempfile.mkdtemp())
+
+from benchmarks.stub_server import ShopeeStub, disable_api_rate_limit, fake_item, item_selection, project
+import services.shopee_api as shopee_api
+from services import http_client
+
+BATCH = 10
+
+def legacy_parse_item(item: dict, shop_id: int, item_id: int, url: str) -> dict:
+    """parse_item de antes: um dicionário por produto"""
+    return {
+        'id': item_id,
+        'shop_id': shop_id,
+        'name': item.get('name', ''),
+        'price': float(item.get('price', 0)) / 100000,
+        'original_price': float(item.get('price_before_discount', 0)) / 100000,
+        'discount': item.get('raw_discount', 0),
+        'stock': item.get('stock', 0),
+        'description': item.get('description', ''),
+        'sales': item.get('historical_sold', 0),
+        'rating': item.get('rating_star', 0),
+        'rating_count': sum(rc.get('count', 0) for rc in item.get('rating_count', [])),
+        'shop_name': item.get('shop_name', ''),
+        'shop_rating': 5.0,
+        'link': url,
+    }
+
+def batch_body(profile: str) -> bytes:
+    """Resposta de um lote de BATCH itens, como o stub a monta"""
+    selection = item_selection(shopee_api.build_batch_query(BATCH, profile))
+    data = {f"item{n}": {"item": project(fake_item(1, n), selection)} for n in range(BATCH)}
+    return json.dumps({"data": data}).encode()
+
+def decode_legacy(body: bytes) -> list:
+    data = json.loads(body.decode())["data"]
+    return [legacy_parse_item(data[f"item{n}"]["item"], 1, n, "") for n in range(BATCH)]
+
+def decode_new(body: bytes) -> list:
+    data = shopee_api.json_loads(body)["data"]
+    return [shopee_api.parse_item(data[f"item{n}"]["item"], 1, n, "") for n in range(BATCH)]
+
+def time_per_call(function, argument, rounds: int) -> float:
+    best = float("inf")
+    for _ in range(3):
+        started = time.perf_counter()
+        for _ in range(rounds):
+            function(argument)
+        best = min(best, (time.perf_counter() - started) / rounds)
+    return best
+
+def bytes_per_object(factory, count: int) -> float:
+    tracemalloc.start()
+    before = tracemalloc.get_traced_memory()[0]
+    objects = [factory(n) for n in range(count)]
+    size = tracemalloc.get_traced_memory()[0] - before
+    tracemalloc.stop()
+    del objects
+    return size / count
+
+async def payload_sizes() -> dict:
+    stub = await ShopeeStub().start()
+    shopee_api.API_URL = stub.graphql_url
+    disable_api_rate_limit(shopee_api)
+    sizes = {}
+    try:
+        for profile in (shopee_api.PROFILE_FULL, shopee_api.PROFILE_CARD, shopee_api.PROFILE_PRICE):
+            for compress in (False, True):
+                stub.compress = compress
+                stub.bytes_sent = 0
+                product = await shopee_api.fetch_item_details(1, 1, "", profile)
+                single = stub.bytes_sent
+                stub.bytes_sent = 0
+                products = await shopee_api.fetch_items_details([(1, n) for n in range(BATCH)], profile)
+                assert product is not None and len(products) == BATCH and product.price == 49.9
+                sizes[profile, compress] = (single, stub.bytes_sent)
+    finally:
+        await http_client.close_http_session()
+        await stub.stop()
+    return sizes
+
+def main(rounds: int, count: int) -> None:
+    print(f"backend JSON: {'orjson' if shopee_api.json_loads is not json.loads else 'json (orjson não instalado)'}")
+
+    sizes = asyncio.run(payload_sizes())
+    print(f"\n{'perfil':<8}{'1 item':>10}{'gzip':>10}{'lote de ' + str(BATCH):>14}{'gzip':>10}  (bytes)")
+    for profile in (shopee_api.PROFILE_FULL, shopee_api.PROFILE_CARD, shopee_api.PROFILE_PRICE):
+        (single, batch), (single_gzip, batch_gzip) = sizes[profile, False], sizes[profile, True]
+        print(f"{profile:<8}{single:>10}{single_gzip:>10}{batch:>14}{batch_gzip:>10}")
+    full, card = sizes[shopee_api.PROFILE_FULL, False][1], sizes[shopee_api.PROFILE_CARD, True][1]
+    print(f"cartão com gzip x consulta antiga sem gzip: {full / card:.0f}x menos bytes no lote")
+    # O cartão ainda traz a descrição (o grosso do item falso); imagens e atributos saem
+    assert sizes[shopee_api.PROFILE_CARD, False][1] < full * 0.75
+    assert sizes[shopee_api.PROFILE_PRICE, False][1] < sizes[shopee_api.PROFILE_CARD, False][1] / 2
+    assert all(sizes[profile, True][1] < sizes[profile, False][1] for profile in shopee_api.ITEM_PROFILES)
+
+    legacy_body = batch_body(shopee_api.PROFILE_FULL)
+    card_body = batch_body(shopee_api.PROFILE_CARD)
+    assert [p['price'] for p in decode_legacy(legacy_body)] == [p.price for p in decode_new(card_body)]
+    legacy = time_per_call(decode_legacy, legacy_body, rounds)
+    full_new = time_per_call(decode_new, legacy_body, rounds)
+    new = time_per_call(decode_new, card_body, rounds)
+    print(f"\ndecodificação de um lote de {BATCH}: antes {legacy * 1e6:.0f}µs | bytes + Product, resposta "
+          f"completa {full_new * 1e6:.0f}µs | perfil do cartão {new * 1e6:.0f}µs ({legacy / new:.1f}x)")
+    assert new < legacy / 1.5
+
+    item = project(fake_item(1, 1), item_selection(shopee_api.ITEM_QUERIES[shopee_api.PROFILE_CARD]))
+    as_dict = bytes_per_object(lambda n: legacy_parse_item(item, 1, n, ""), count)
+    as_product = bytes_per_object(lambda n: shopee_api.parse_item(item, 1, n, ""), count)
+    print(f"memória por produto: dicionário {as_dict:.0f} bytes, Product {as_product:.0f} bytes")
+    assert as_product < as_dict
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser()
+    parser.add_argument('--rounds', type=int, default=2000)
+    parser.add_argument('--products', type=int, default=10000)
+    args = parser.parse_args()
+    main(args.rounds, args.products)
@@ -0,0 +1,94 @@
+"""
+Benchmark: limitador de taxa, novas tentativas e circuit breaker da API da Shopee
+
+Cenários contra o stub local com injeção de falhas:
+1. rajada de consultas distintas respeitando o limite configurado
+2. 429 transitórios com Retry-After, resolvidos por novas tentativas
+3. API fora do ar: o circuito abre, as chamadas falham na hora e o circuito fecha quando a API volta
+
+Uso: python -m benchmarks.bench_resilience [--rate 20] [--burst 5] [--lookups 60]
+"""
+import argparse
+import asyncio
+import os
+import tempfile
+import time
+
+os.environ.setdefault('SHOPEE_PARTNER_ID', 'bench')
+os.environ.setdefault('SHOPEE_API_KEY', 'bench')
+os.environ.setdefault('SHORT_LINKS_DB', ':memory:')
+os.environ.setdefault('DATA_DIR', tempfile.mkdtemp())
+
+from benchmarks.stub_server import ShopeeStub
+import services.shopee_api as shopee_api
+from services import http_client
+
+def url(shop_id: int, item_id: int) -> str:
+    return f"https://shopee.com.br/product/{shop_id}/{item_id}"
+
+async def main(rate: float, burst: float, lookups: int) -> None:
+    stub = await ShopeeStub().start()
+    shopee_api.API_URL = stub.graphql_url
+    limiter = shopee_api.api_rate_limiter
+    limiter.rate, limiter.capacity, limiter.tokens = rate, burst, burst
+    policy = shopee_api.api_retry_policy
+    policy.base_delay, policy.max_delay = 0.01, 0.05
+    breaker = shopee_api.api_circuit_breaker
+    breaker.failure_threshold, breaker.reset_timeout = 3, 0.5
+    try:
+        # 1. Rajada limitada pelo token bucket
+        start = time.perf_counter()
+        results = await asyncio.gather(*(shopee_api.get_product_details(url(1, n)) for n in range(lookups)))
+        elapsed = time.perf_counter() - start
+        assert all(results)
+        expected = (lookups - burst) / rate
+        print(f"1) {lookups} consultas com limite {rate:.0f}/s (rajada {burst:.0f}): "
+              f"{elapsed:.2f}s (mínimo teórico {expected:.2f}s), {stub.graphql_calls / elapsed:.1f} chamadas/s")
+
+        # 2. 429 transitório com Retry-After
+        limiter.rate = limiter.capacity = limiter.tokens = 1000
+        stub.fail_status, stub.fail_count, stub.retry_after = 429, 2, 0.05
+        retries_before = policy.retries
+        start = time.perf_counter()
+        product = await shopee_api.get_product_details(url(2, 1))
+        assert product is not None
+        print(f"2) 2 respostas 429 seguidas: produto obtido após {policy.retries - retries_before} novas tentativas "
+              f"em {(time.perf_counter() - start) * 1000:.0f}ms")
+
+        # 3. API fora do ar
+        stub.fail_status, stub.fail_count, stub.retry_after = 503, None, None
+        failures = 0
+        while breaker.state != breaker.OPEN:
+            try:
+                await shopee_api.get_product_details(url(3, failures))
+            except shopee_api.ShopeeAPIUnavailable:
+                failures += 1
+        calls_before = stub.graphql_calls
+        start = time.perf_counter()
+        for n in range(100):
+            try:
+                await shopee_api.get_product_details(url(4, n))
+            except shopee_api.ShopeeAPIUnavailable:
+                pass
+        fast_fail = (time.perf_counter() - start) / 100
+        assert stub.graphql_calls == calls_before
+        print(f"3) circuito aberto após {failures} consultas com falha; "
+              f"chamadas seguintes falham em {fast_fail * 1e6:.0f}µs sem tocar a API")
+
+        stub.fail_status = None
+        await asyncio.sleep(breaker.reset_timeout)
+        assert await shopee_api.get_product_details(url(5, 1)) is not None
+        assert breaker.state == breaker.CLOSED
+        print("   API de volta: chamada de teste bem-sucedida, circuito fechado")
+        print(shopee_api.get_api_status())
+    finally:
+        await http_client.close_http_session()
+        await stub.stop()
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser()
+    parser.add_argument('--rate', type=float, default=20)
+    parser.add_argument('--burst', type=float, default=5)
+    parser.add_argument('--lookups', type=int, default=60)
+    args = parser.parse_args()
+    asyncio.run(main(args.rate, args.burst, args.lookups))
@@ -0,0 +1,118 @@
+"""
+Benchmark do agendador persistente (services/scheduler.py)
+
+1. grava 100k agendamentos no SQLite
+2. mede a recarga na inicialização (banco -> heap)
+3. mede o atraso de disparo (jitter) de jobs que vencem durante o teste
+4. confere que o menu "📅 Ver Agendados" pagina pelo índice
+5. cancela a maior parte dos jobs distantes: o heap é compactado e stats()["pending"] segue exato
+
+Uso: python -m benchmarks.bench_scheduler [--jobs 100000] [--due 2000]
+"""
+import argparse
+import asyncio
+import os
+import statistics
+import tempfile
+import time
+from datetime import datetime, timedelta
+
+import pytz
+
+import handlers.scheduler as scheduler_handlers
+from services.scheduler import MessageScheduler
+
+class FakeQuery:
+    """CallbackQuery mínimo: guarda o texto e os botões editados"""
+
+    def __init__(self):
+        self.text = None
+        self.reply_markup = None
+
+    async def edit_message_text(self, text, reply_markup=None, **kwargs):
+        self.text = text
+        self.reply_markup = reply_markup
+
+async def main(total_jobs: int, due_jobs: int, users: int) -> None:
+    with tempfile.TemporaryDirectory() as tmp:
+        path = os.path.join(tmp, "scheduler.sqlite3")
+        now = datetime.now(pytz.utc)
+
+        # 1. Carga: agendamentos espalhados pelos próximos 30 dias
+        writer = MessageScheduler(path)
+        start = time.perf_counter()
+        batch = []
+        for n in range(total_jobs):
+            run_at = now + timedelta(seconds=3600 + (n * 2_592_000) // total_jobs)
+            batch.append((run_at, -1000000000000 - n % 500, f"Promoção {n}", n % users))
+            if len(batch) == 10_000:
+                writer.add_jobs(batch)
+                batch = []
+        if batch:
+            writer.add_jobs(batch)
+        insert_elapsed = time.perf_counter() - start
+        await writer.stop()
+        print(f"{total_jobs} agendamentos gravados em {insert_elapsed:.2f}s")
+
+        # 2. Reinício: recarga do heap a partir do índice de pendentes
+        scheduler = MessageScheduler(path)
+        start = time.perf_counter()
+        loaded = scheduler.load()
+        print(f"Recarga na inicialização: {loaded} pendentes em {(time.perf_counter() - start) * 1000:.0f}ms")
+
+        # 3. Jitter de disparo com o heap cheio
+        delays = []
+
+        async def send(chat_id: int, text: str):
+            delays.append(time.time() - float(text))
+
+        await scheduler.start(send)
+        base = time.time() + 0.5
+        jobs = []
+        for n in range(due_jobs):
+            run_at = base + 2.0 * n / due_jobs
+            jobs.append((datetime.fromtimestamp(run_at, pytz.utc), -100, repr(run_at), 0))
+        scheduler.add_jobs(jobs)
+        await asyncio.sleep(3.0)
+        delays.sort()
+        print(f"Disparo de {len(delays)}/{due_jobs} jobs: atraso p50={statistics.median(delays) * 1000:.2f}ms "
+              f"p99={delays[int(len(delays) * 0.99) - 1] * 1000:.2f}ms max={delays[-1] * 1000:.2f}ms")
+
+        # 4. Menu paginado pelo índice (created_by, status, run_at)
+        plan = scheduler._connect().execute(
+            "EXPLAIN QUERY PLAN SELECT id FROM jobs WHERE created_by = ? AND status = ? ORDER BY run_at LIMIT 5 OFFSET 0",
+            (1, "pending")
+        ).fetchall()
+        assert any("jobs_by_user" in row[-1] for row in plan), plan
+
+        scheduler_handlers.message_scheduler = scheduler
+        query = FakeQuery()
+        pages = []
+        for page in (0, 10, 50):
+            start = time.perf_counter()
+            await scheduler_handlers.show_scheduled_jobs(query, 1, page)
+            pages.append((time.perf_counter() - start) * 1000)
+            assert query.text.count("#") == scheduler_handlers.JOBS_PER_PAGE, query.text
+        print(f"Menu Ver Agendados (usuário com {total_jobs // users} jobs): páginas 1/11/51 em "
+              + " / ".join(f"{elapsed:.2f}ms" for elapsed in pages))
+
+        # 5. Cancelamentos de jobs distantes (nunca chegam ao topo do heap)
+        cancelled = total_jobs * 3 // 5
+        start = time.perf_counter()
+        for job_id in range(1, cancelled + 1):
+            assert scheduler.cancel_job(job_id)
+        elapsed = time.perf_counter() - start
+        pending = total_jobs - cancelled
+        assert scheduler.stats()["pending"] == len(scheduler) == pending, (scheduler.stats(), len(scheduler))
+        assert len(scheduler._heap) < pending * 2, len(scheduler._heap)
+        print(f"{cancelled} cancelamentos em {elapsed:.2f}s: {pending} pendentes, "
+              f"{len(scheduler._heap)} entradas no heap")
+        await scheduler.stop()
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser()
+    parser.add_argument('--jobs', type=int, default=100_000)
+    parser.add_argument('--due', type=int, default=2000)
+    parser.add_argument('--users', type=int, default=100)
+    args = parser.parse_args()
+    asyncio.run(main(args.jobs, args.due, args.users))
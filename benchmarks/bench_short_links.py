@@ -0,0 +1,80 @@
+"""
+Benchmark: resolução de links curtos
+
+Compara o resolvedor antigo (GET seguindo redirecionamentos até a página do produto)
+com o novo (lê só o Location de cada salto) e com o mapeamento persistente já aquecido.
+
+Uso: python -m benchmarks.bench_short_links [--links 200] [--latency 0.002]
+"""
+import argparse
+import asyncio
+import os
+import tempfile
+import time
+
+os.environ.setdefault('SHOPEE_PARTNER_ID', 'bench')
+os.environ.setdefault('SHOPEE_API_KEY', 'bench')
+os.environ.setdefault('SHORT_LINKS_DB', ':memory:')
+os.environ.setdefault('DATA_DIR', tempfile.mkdtemp())
+
+from benchmarks.stub_server import ShopeeStub
+import services.shopee_api as shopee_api
+from services import http_client
+
+async def old_resolve(url: str) -> tuple:
+    """Resolvedor anterior: segue os redirecionamentos e baixa a página final"""
+    session = http_client.get_http_session()
+    async with session.get(url, allow_redirects=True) as response:
+        body = await response.read()
+        return shopee_api.extract_product_info(str(response.url)), len(body)
+
+async def main(links: int, latency: float) -> None:
+    stub = await ShopeeStub(latency=latency).start()
+    urls = [stub.short_url(f"{i}-{i + 1000}") for i in range(links)]
+    try:
+        start = time.perf_counter()
+        downloaded = 0
+        for url in urls:
+            ids, size = await old_resolve(url)
+            assert ids is not None
+            downloaded += size
+        old_elapsed = time.perf_counter() - start
+
+        stub.page_calls = 0
+        start = time.perf_counter()
+        for url in urls:
+            assert await shopee_api.resolve_short_url_ids(url) is not None
+        cold_elapsed = time.perf_counter() - start
+        assert stub.page_calls == 0
+
+        redirects_before = stub.redirect_calls
+        start = time.perf_counter()
+        for url in urls:
+            assert await shopee_api.resolve_short_url_ids(url) is not None
+        warm_elapsed = time.perf_counter() - start
+        assert stub.redirect_calls == redirects_before
+
+        # Vários links diferentes resolvidos em paralelo
+        shopee_api.short_link_store._memory.clear()
+        shopee_api.short_link_store.close()
+        parallel_urls = [stub.short_url(f"{i}-{i + 5000}") for i in range(links)]
+        start = time.perf_counter()
+        results = await shopee_api.resolve_short_urls(parallel_urls)
+        parallel_elapsed = time.perf_counter() - start
+        assert all(results.values())
+    finally:
+        await http_client.close_http_session()
+        await stub.stop()
+
+    print(f"{links} links curtos, latência do stub {latency * 1000:.1f}ms por salto")
+    print(f"antigo (GET completo)   {old_elapsed / links * 1000:7.2f}ms/link, {downloaded / links / 1024:.0f}KiB baixados/link")
+    print(f"novo, frio (Location)   {cold_elapsed / links * 1000:7.2f}ms/link, 0KiB de página")
+    print(f"novo, mapeamento quente {warm_elapsed / links * 1000:7.3f}ms/link, sem rede")
+    print(f"novo, {links} em paralelo  {parallel_elapsed * 1000:7.1f}ms no total")
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser()
+    parser.add_argument('--links', type=int, default=200)
+    parser.add_argument('--latency', type=float, default=0.002)
+    args = parser.parse_args()
+    asyncio.run(main(args.links, args.latency))
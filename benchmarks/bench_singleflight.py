@@ -0,0 +1,82 @@
+"""
+Benchmark/verificação: consultas concorrentes idênticas geram uma única chamada à API
+
+Dispara centenas de consultas simultâneas do mesmo produto (e do mesmo link curto)
+contra o stub local e confere quantas chamadas chegaram ao upstream.
+
+Uso: python -m benchmarks.bench_singleflight [--concurrency 500] [--latency 0.05]
+"""
+import argparse
+import asyncio
+import os
+import tempfile
+import time
+
+os.environ.setdefault('SHOPEE_PARTNER_ID', 'bench')
+os.environ.setdefault('SHOPEE_API_KEY', 'bench')
+os.environ.setdefault('SHORT_LINKS_DB', ':memory:')
+os.environ.setdefault('DATA_DIR', tempfile.mkdtemp())
+
+from benchmarks.stub_server import ShopeeStub, disable_api_rate_limit
+import services.shopee_api as shopee_api
+from services import http_client
+
+async def fire(urls: list) -> tuple:
+    start = time.perf_counter()
+    results = await asyncio.gather(
+        *(shopee_api.get_product_details(url) for url in urls), return_exceptions=True
+    )
+    return results, time.perf_counter() - start
+
+async def main(concurrency: int, latency: float) -> None:
+    stub = await ShopeeStub(latency=latency).start()
+    shopee_api.API_URL = stub.graphql_url
+    # Sem novas tentativas: cada consulta agrupada corresponde a exatamente uma chamada
+    shopee_api.api_retry_policy.max_retries = 0
+    disable_api_rate_limit(shopee_api)
+    try:
+        # Mesmo produto, links com formatos diferentes
+        urls = [
+            "https://shopee.com.br/product/10/20" if i % 2 else "https://shopee.com.br/Produto-i.10.20"
+            for i in range(concurrency)
+        ]
+        results, elapsed = await fire(urls)
+        assert all(r is not None and r.id == 20 for r in results)
+        assert stub.graphql_calls == 1, stub.graphql_calls
+        print(f"{concurrency} consultas idênticas: {stub.graphql_calls} chamada(s) ao upstream em {elapsed * 1000:.1f}ms")
+
+        # Falhas chegam a todos os chamadores e não são guardadas no cache
+        shopee_api.product_cache.clear()
+        stub.graphql_calls = 0
+        stub.fail_status = 500
+        results, _ = await fire(["https://shopee.com.br/product/10/21"] * concurrency)
+        assert all(isinstance(r, shopee_api.ShopeeAPIUnavailable) for r in results)
+        assert stub.graphql_calls == 1, stub.graphql_calls
+        assert shopee_api.product_cache.get((10, 21))[0] is None
+        stub.fail_status = None
+        results, _ = await fire(["https://shopee.com.br/product/10/21"] * concurrency)
+        assert all(r is not None for r in results)
+        assert stub.graphql_calls == 2, stub.graphql_calls
+        print(f"{concurrency} consultas com falha: 1 chamada, ShopeeAPIUnavailable repassado a todos, nada em cache")
+
+        # Mesmo link curto: uma única resolução de redirecionamento
+        shopee_api.product_cache.clear()
+        stub.graphql_calls = 0
+        # O parâmetro faz o link do stub ser reconhecido como link curto
+        short = stub.short_url("30-40") + "?ref=shope.ee"
+        results, elapsed = await fire([short] * concurrency)
+        assert all(r is not None and r.id == 40 for r in results)
+        assert stub.redirect_calls == 1, stub.redirect_calls
+        assert stub.graphql_calls == 1, stub.graphql_calls
+        print(f"{concurrency} links curtos idênticos: {stub.redirect_calls} resolução, {stub.graphql_calls} chamada em {elapsed * 1000:.1f}ms")
+        print(shopee_api.get_cache_stats())
+    finally:
+        await http_client.close_http_session()
+        await stub.stop()
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser()
+    parser.add_argument('--concurrency', type=int, default=500)
+    parser.add_argument('--latency', type=float, default=0.05)
+    args = parser.parse_args()
+    asyncio.run(main(args.concurrency, args.latency))
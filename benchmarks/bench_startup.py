@@ -0,0 +1,194 @@
+"""
+Benchmark: inicialização a frio do bot (python main.py num processo novo)
+
+Cada rodada cria um processo com DATA_DIR vazio, a Bot API falsa (TELEGRAM_API_URL) com
+latência de rede e o stub da Shopee (SHOPEE_API_URL, SHOPEE_IMAGE_URL). Assim que o bot faz o
+primeiro getUpdates, o stub entrega um /start e, respondido, um link:
+
+- primeiro update: do início do processo até a resposta do /start
+- primeiro link: da entrega do link até o cartão do produto
+- importações do main.py e demais fases, do relatório que o bot registra (STARTUP_PROFILE=1)
+
+Compara FAST_START=1 (aquecimento junto com o início do polling) com FAST_START=0 (tudo
+pronto antes do polling). O resultado é acrescentado em --output e comparado com a última
+execução de mesma configuração, para acompanhar a inicialização entre mudanças.
+
+Uso: python -m benchmarks.bench_startup [--runs 5] [--latency 0.1] [--output arquivo.jsonl] [--verbose]
+"""
+import argparse
+import asyncio
+import json
+import os
+import re
+import shutil
+import signal
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+
+from benchmarks.stub_server import ShopeeStub
+from benchmarks.telegram_stub import TelegramStub
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+DEFAULT_OUTPUT = os.path.join(os.path.dirname(__file__), "results", "bench_startup.jsonl")
+REPORT_LINE = re.compile(r"^\s+(\d+)ms \+\s*(\d+)ms  (.+)$")
+
+def git_revision() -> str:
+    try:
+        return subprocess.run(["git", "rev-parse", "--short", "HEAD"], capture_output=True,
+                              text=True, check=True, cwd=ROOT).stdout.strip()
+    except Exception:
+        return "?"
+
+def parse_report(output: str) -> dict:
+    """Fases (início, duração em ms) do relatório de inicialização do bot"""
+    lines = output.splitlines()
+    for n, line in enumerate(lines):
+        if "Inicialização: primeiro update" in line:
+            phases = {}
+            for phase_line in lines[n + 1:]:
+                match = REPORT_LINE.match(phase_line)
+                if match is None:
+                    if not phase_line.startswith("  "):
+                        break
+                    continue
+                phases[match.group(3)] = (int(match.group(1)), int(match.group(2)))
+            return {"text": "\n".join(lines[n:n + 1 + len(phases) + 20]), "phases": phases}
+    return {"text": "", "phases": {}}
+
+async def wait_for(condition, timeout: float) -> None:
+    deadline = time.perf_counter() + timeout
+    while not condition():
+        if time.perf_counter() > deadline:
+            raise TimeoutError("o bot não respondeu a tempo")
+        await asyncio.sleep(0.002)
+
+async def cold_start(telegram: TelegramStub, shopee: ShopeeStub, fast_start: bool, item_id: int) -> dict:
+    data_dir = tempfile.mkdtemp()
+    env = dict(
+        os.environ,
+        TELEGRAM_TOKEN="123456:bench",
+        TELEGRAM_API_URL=telegram.base_url,
+        SHOPEE_PARTNER_ID="bench",
+        SHOPEE_API_KEY="bench",
+        SHOPEE_API_URL=shopee.graphql_url,
+        SHOPEE_IMAGE_URL=shopee.image_url,
+        DATA_DIR=data_dir,
+        FAST_START="1" if fast_start else "0",
+        STARTUP_PROFILE="1",
+        PYTHONUNBUFFERED="1",
+    )
+    telegram.calls.clear()
+    telegram.sent.clear()
+    telegram.updates.clear()
+    output = tempfile.TemporaryFile()
+    started = time.perf_counter()
+    # Subprocesso do asyncio: os stubs seguem atendendo enquanto o bot encerra
+    process = await asyncio.create_subprocess_exec(sys.executable, "main.py", cwd=ROOT, env=env,
+                                                   stdout=output, stderr=subprocess.STDOUT)
+    try:
+        # O update chega quando o bot começa a buscar updates
+        await wait_for(lambda: telegram.calls.get("getUpdates"), timeout=60)
+        polling = time.perf_counter()
+        await telegram.push_update(telegram.message_update(1, "/start"))
+        await telegram.wait_sent(1, timeout=60)
+        first_update = telegram.sent[0][0]
+
+        link_at = time.perf_counter()
+        await telegram.push_update(telegram.message_update(2, f"https://shopee.com.br/product/1/{item_id}"))
+        # "Buscando..." e o cartão (foto ou texto editado)
+        await telegram.wait_sent(3, timeout=60)
+        first_link = telegram.sent[2][0]
+    finally:
+        process.send_signal(signal.SIGINT)
+        try:
+            await asyncio.wait_for(process.wait(), timeout=30)
+        except asyncio.TimeoutError:
+            process.kill()
+            await process.wait()
+        output.seek(0)
+        text = output.read().decode(errors="replace")
+        output.close()
+        shutil.rmtree(data_dir, ignore_errors=True)
+    report = parse_report(text)
+    return {
+        "polling_ms": (polling - started) * 1000,
+        "first_update_ms": (first_update - started) * 1000,
+        "first_link_ms": (first_link - link_at) * 1000,
+        "imports_ms": report["phases"].get("importações", (0, 0))[1],
+        "report": report["text"],
+    }
+
+def summarize(runs: list) -> dict:
+    keys = ("polling_ms", "first_update_ms", "first_link_ms", "imports_ms")
+    return {key: round(statistics.median(run[key] for run in runs), 1) for key in keys}
+
+def save(result: dict, output: str) -> dict:
+    """Acrescenta o resultado em output e retorna a última execução com a mesma configuração"""
+    previous = None
+    if os.path.exists(output):
+        with open(output) as results:
+            for line in results:
+                record = json.loads(line)
+                if record.get("config") == result["config"]:
+                    previous = record
+    os.makedirs(os.path.dirname(output) or ".", exist_ok=True)
+    with open(output, "a") as results:
+        results.write(json.dumps(result, ensure_ascii=False) + "\n")
+    return previous
+
+async def main(args) -> dict:
+    telegram = await TelegramStub(latency=args.latency).start()
+    shopee = await ShopeeStub(latency=args.latency).start()
+    modes = {"FAST_START=1": True, "FAST_START=0": False}
+    runs = {name: [] for name in modes}
+    try:
+        for n in range(args.runs):
+            # Modos alternados: variações da máquina afetam os dois igualmente
+            for name, fast_start in modes.items():
+                run = await cold_start(telegram, shopee, fast_start, item_id=len(modes) * n + len(runs[name]) + 1)
+                runs[name].append(run)
+    finally:
+        await telegram.stop()
+        await shopee.stop()
+
+    if args.verbose:
+        for name in modes:
+            print(f"relatório do bot ({name}, última rodada):\n{runs[name][-1]['report']}\n")
+    return {
+        "revision": git_revision(),
+        "time": time.strftime("%Y-%m-%d %H:%M:%S"),
+        "config": {"runs": args.runs, "latency": args.latency},
+        "modes": {name: summarize(mode_runs) for name, mode_runs in runs.items()},
+    }
+
+def report(result: dict, previous: dict = None) -> None:
+    def delta(now: float, before: float) -> str:
+        return f" ({(now - before) / before * 100:+.0f}%)" if before else ""
+
+    config = result["config"]
+    print(f"{config['runs']} inicializações a frio por modo, {config['latency'] * 1000:.0f}ms de latência "
+          f"na Bot API e na Shopee (medianas, ms)")
+    print(f"{'':<14}{'importações':>13}{'1º getUpdates':>15}{'1º update':>11}{'1º link':>9}")
+    for name, stats in result["modes"].items():
+        before = (previous or {}).get("modes", {}).get(name, {})
+        print(f"{name:<14}{stats['imports_ms']:>13.0f}{stats['polling_ms']:>15.0f}{stats['first_update_ms']:>11.0f}"
+              f"{stats['first_link_ms']:>9.0f}" + delta(stats['first_update_ms'], before.get('first_update_ms')))
+    if previous:
+        print(f"comparado com {previous['revision']} de {previous['time']}")
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser()
+    parser.add_argument('--runs', type=int, default=5)
+    parser.add_argument('--latency', type=float, default=0.1, help="latência da Bot API e da Shopee (s)")
+    parser.add_argument('--output', default=DEFAULT_OUTPUT)
+    parser.add_argument('--verbose', action='store_true', help="mostra o relatório de inicialização do bot")
+    args = parser.parse_args()
+
+    result = asyncio.run(main(args))
+    previous = save(result, args.output)
+    report(result, previous)
+    fast, eager = result["modes"]["FAST_START=1"], result["modes"]["FAST_START=0"]
+    assert fast["first_update_ms"] < eager["first_update_ms"], "o aquecimento em paralelo não adiantou o 1º update"
@@ -0,0 +1,159 @@
+"""
+Benchmark: latência dos menus sob carga de buscas de links (services/update_processor.py)
+
+Compara o processamento padrão do PTB (um update por vez), concurrent_updates(32)
+(SimpleUpdateProcessor: mesmo limite de concorrência, sem ordem nem prioridade) e o
+ChatUpdateProcessor(32), com os handlers do main.py. Chats de "links" mandam links seguidos
+(busca lenta no stub da Shopee) em quantidade suficiente para ocupar todas as vagas; outros
+chats clicam em menus (menu_handler) enquanto isso. A latência do menu vai da entrada do
+update na fila até o stub do Telegram receber o editMessageText.
+
+Confere que, com o ChatUpdateProcessor:
+1. a busca de um link só começa depois da anterior do mesmo chat terminar
+2. os menus não esperam atrás das buscas: p99 bem abaixo dos outros dois (o que sobra é
+   disputa de CPU no loop, que aqui também roda os dois stubs); a comparação com o
+   concurrent_updates só vale com mais links que vagas (--link-chats x --links > 32)
+
+Uso: python -m benchmarks.bench_update_processor [--link-chats 60] [--links 2] [--menus 200] [--latency 0.5]
+"""
+import argparse
+import asyncio
+import gc
+import os
+import statistics
+import tempfile
+import time
+
+os.environ.setdefault('TELEGRAM_TOKEN', '123456:bench')
+os.environ.setdefault('SHOPEE_PARTNER_ID', 'bench')
+os.environ.setdefault('SHOPEE_API_KEY', 'bench')
+os.environ.setdefault('SHORT_LINKS_DB', ':memory:')
+os.environ.setdefault('DATA_DIR', tempfile.mkdtemp())
+
+from telegram import Update
+from telegram.ext import Application, SimpleUpdateProcessor
+
+from benchmarks.stub_server import ShopeeStub, disable_api_rate_limit
+from benchmarks.telegram_stub import TelegramStub
+import services.shopee_api as shopee_api
+import services.product_images as product_images
+from services import http_client
+from services.update_processor import ChatUpdateProcessor, UpdateQueue
+import main as bot_main
+
+MENU_CHAT = 10**6
+
+def percentile(values, p: float) -> float:
+    return values[min(len(values) - 1, int(len(values) * p))]
+
+async def run_config(name, processor, telegram: TelegramStub, link_chats: int, links: int,
+                     menus: int, duration: float, first_item: int) -> dict:
+    builder = Application.builder().token(os.environ['TELEGRAM_TOKEN']).base_url(telegram.base_url)
+    builder = builder.update_queue(UpdateQueue())
+    if processor is not None:
+        builder = builder.concurrent_updates(processor)
+    application = builder.build()
+    bot_main.register_handlers(application)
+    await application.initialize()
+    await application.start()
+    telegram.sent.clear()
+
+    # Links: cada chat manda os seus em sequência, todos no começo; menus espalhados no período
+    events = []
+    item_id = first_item
+    for n in range(links):
+        for chat_id in range(1, link_chats + 1):
+            events.append((n * 0.05, telegram.message_update(chat_id, f"https://shopee.com.br/product/1/{item_id}")))
+            item_id += 1
+    for n in range(menus):
+        events.append((duration * n / menus, telegram.callback_update(MENU_CHAT + n, "menu_config")))
+    events.sort(key=lambda event: event[0])
+
+    injected = {}
+    started = time.perf_counter()
+    for at, data in events:
+        await asyncio.sleep(max(0.0, started + at - time.perf_counter()))
+        if "callback_query" in data:
+            injected[data["callback_query"]["message"]["chat"]["id"]] = time.perf_counter()
+        await application.update_queue.put(Update.de_json(data, application.bot))
+    # Cada link gera sendMessage + cartão (sendPhoto, ou editMessageText sem foto); cada menu um editMessageText
+    await telegram.wait_sent(2 * link_chats * links + menus, timeout=600)
+    total = time.perf_counter() - started
+
+    menu_done = {}
+    searches = {}
+    for at, method, params in telegram.sent:
+        chat_id = int(params["chat_id"])
+        if chat_id >= MENU_CHAT:
+            menu_done[chat_id] = at
+        else:
+            # sendMessage "Buscando..." abre a busca, o cartão (sendPhoto ou editMessageText) fecha
+            searches.setdefault(chat_id, []).append(method)
+    latencies = sorted((menu_done[chat_id] - at) * 1000 for chat_id, at in injected.items())
+    # Buscas sobrepostas no mesmo chat: um "Buscando..." antes do cartão anterior
+    overlaps = sum(
+        1 for methods in searches.values()
+        for n in range(0, len(methods) - 1, 2)
+        if methods[n] != "sendMessage" or methods[n + 1] not in ("sendPhoto", "editMessageText")
+    )
+    result = {
+        "p50": statistics.median(latencies),
+        "p99": percentile(latencies, 0.99),
+        "total": total,
+        "overlaps": overlaps,
+    }
+    print(f"{name:<28} menus p50={result['p50']:7.1f}ms p99={result['p99']:7.1f}ms | "
+          f"{link_chats * links} links em {total:5.1f}s | chats com buscas sobrepostas: {overlaps}")
+    await application.stop()
+    await application.shutdown()
+    return result
+
+async def main(link_chats: int, links: int, menus: int, latency: float) -> None:
+    shopee = await ShopeeStub(latency=latency).start()
+    shopee_api.API_URL = shopee.graphql_url
+    product_images.IMAGE_URL = shopee.image_url
+    disable_api_rate_limit(shopee_api)
+    telegram = await TelegramStub().start()
+    concurrency = 32
+    # Período em que as buscas ocupam todas as vagas de mensagens
+    duration = link_chats * links / (concurrency - 4) * latency
+
+    configs = [
+        ("padrão (um por vez)", lambda: None),
+        (f"concurrent_updates({concurrency})", lambda: SimpleUpdateProcessor(concurrency)),
+        ("ChatUpdateProcessor", lambda: ChatUpdateProcessor(concurrency, 4)),
+    ]
+    results = {}
+    for n, (name, factory) in enumerate(configs):
+        # Começa cada configuração sem lixo da anterior; itens diferentes: nada sai do cache
+        gc.collect()
+        await asyncio.sleep(1)
+        results[name] = await run_config(name, factory(), telegram, link_chats, links, menus,
+                                         duration, first_item=(n + 1) * 10**6)
+
+    chat = results["ChatUpdateProcessor"]
+    assert chat["overlaps"] == 0, "buscas do mesmo chat rodaram em paralelo"
+    sequential = results["padrão (um por vez)"]
+    unordered = results[f"concurrent_updates({concurrency})"]
+    assert chat["p99"] < sequential["p99"] / 10, "menus esperaram atrás das buscas"
+    print(f"p99 dos menus: {sequential['p99'] / chat['p99']:.0f}x menor que o padrão, "
+          f"{unordered['p99'] / chat['p99']:.1f}x menor que concurrent_updates({concurrency})")
+    # A prioridade só faz diferença quando as buscas ocupam todas as vagas: com menos links
+    # que o limite de concorrência, os menus do concurrent_updates também não esperam
+    if link_chats * links > concurrency:
+        assert chat["p99"] < unordered["p99"] / 2, "callback queries não passaram na frente"
+    else:
+        print(f"{link_chats * links} links para {concurrency} vagas: sem fila, prioridade não verificada")
+
+    await http_client.close_http_session()
+    await telegram.stop()
+    await shopee.stop()
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser()
+    parser.add_argument('--link-chats', type=int, default=60)
+    parser.add_argument('--links', type=int, default=2)
+    parser.add_argument('--menus', type=int, default=200)
+    parser.add_argument('--latency', type=float, default=0.5)
+    args = parser.parse_args()
+    asyncio.run(main(args.link_chats, args.links, args.menus, args.latency))
@@ -0,0 +1,190 @@
+"""
+Benchmark: webhook (services/webhook.py) x polling, com o Application e os handlers do main.py
+
+Os updates são /start de chats distintos; a latência vai da injeção do update (POST no
+webhook ou entrada na fila do getUpdates do stub) até o stub receber o sendMessage da resposta.
+
+1. latência com updates espaçados e vazão com uma rajada, nos dois modos
+2. webhook: secret token errado recebe 403
+3. webhook: fila cheia responde 503 e o que foi aceito é processado
+4. webhook: encerramento processa a fila inteira antes do shutdown
+
+Uso: python -m benchmarks.bench_webhook [--updates 2000] [--rate 200]
+"""
+import argparse
+import asyncio
+import os
+import socket
+import statistics
+import tempfile
+import time
+
+os.environ.setdefault('TELEGRAM_TOKEN', '123456:bench')
+os.environ.setdefault('SHOPEE_PARTNER_ID', 'bench')
+os.environ.setdefault('SHOPEE_API_KEY', 'bench')
+os.environ.setdefault('SHORT_LINKS_DB', ':memory:')
+os.environ.setdefault('DATA_DIR', tempfile.mkdtemp())
+
+import aiohttp
+from telegram.ext import Application
+
+from benchmarks.telegram_stub import TelegramStub
+from services.webhook import WebhookServer, serve_webhook, SECRET_HEADER
+import main as bot_main
+
+SECRET = "bench-secret"
+
+def build_application(stub: TelegramStub, queue_size: int) -> Application:
+    application = (
+        Application.builder()
+        .token(os.environ['TELEGRAM_TOKEN'])
+        .base_url(stub.base_url)
+        .update_queue(asyncio.Queue(maxsize=queue_size))
+        .build()
+    )
+    bot_main.register_handlers(application)
+    return application
+
+def free_port() -> int:
+    with socket.socket() as sock:
+        sock.bind(("127.0.0.1", 0))
+        return sock.getsockname()[1]
+
+def percentile(values, p: float) -> float:
+    return values[min(len(values) - 1, int(len(values) * p))]
+
+def report(name: str, injected: dict, stub: TelegramStub, started: float) -> dict:
+    replies = {int(params["chat_id"]): at for at, method, params in stub.sent if int(params["chat_id"]) in injected}
+    assert len(replies) == len(injected), f"{name}: {len(replies)}/{len(injected)} respostas"
+    latencies = sorted((replies[chat_id] - at) * 1000 for chat_id, at in injected.items())
+    elapsed = max(replies.values()) - started
+    result = {
+        "p50": statistics.median(latencies),
+        "p95": percentile(latencies, 0.95),
+        "p99": percentile(latencies, 0.99),
+        "rate": len(injected) / elapsed,
+    }
+    print(f"{name:<26} p50={result['p50']:6.1f}ms p95={result['p95']:6.1f}ms p99={result['p99']:6.1f}ms "
+          f"vazão={result['rate']:6.0f} updates/s")
+    return result
+
+async def inject(send, stub: TelegramStub, count: int, rate: float, first_chat: int) -> tuple:
+    """Injeta count updates /start (rate=0: rajada) e espera todas as respostas"""
+    injected = {}
+    expected = len(stub.sent) + count
+    started = time.perf_counter()
+    tasks = []
+    for n in range(count):
+        chat_id = first_chat + n
+        update = stub.message_update(chat_id, "/start")
+        if rate:
+            await asyncio.sleep(max(0.0, started + n / rate - time.perf_counter()))
+        injected[chat_id] = time.perf_counter()
+        tasks.append(asyncio.ensure_future(send(update)))
+    await asyncio.gather(*tasks)
+    await stub.wait_sent(expected, timeout=120)
+    return injected, started
+
+async def bench_polling(count: int, rate: float) -> dict:
+    stub = await TelegramStub().start()
+    application = build_application(stub, queue_size=1000)
+    await application.initialize()
+    await application.updater.start_polling(poll_interval=0, timeout=10)
+    await application.start()
+
+    results = {}
+    injected, started = await inject(stub.push_update, stub, count, rate, first_chat=1)
+    results["paced"] = report(f"polling ({rate:.0f}/s)", injected, stub, started)
+    injected, started = await inject(stub.push_update, stub, count, 0, first_chat=10**6)
+    results["burst"] = report("polling (rajada)", injected, stub, started)
+
+    await application.updater.stop()
+    await application.stop()
+    await application.shutdown()
+    await stub.stop()
+    return results
+
+async def bench_webhook(count: int, rate: float) -> dict:
+    stub = await TelegramStub().start()
+    application = build_application(stub, queue_size=1000)
+    port = free_port()
+    stop_event = asyncio.Event()
+    serving = asyncio.create_task(serve_webhook(
+        application, "https://bench.invalid", secret=SECRET, stop_event=stop_event,
+        host="127.0.0.1", port=port,
+    ))
+    while not application.running:
+        await asyncio.sleep(0.01)
+    assert stub.webhook["url"] == "https://bench.invalid/telegram" and stub.webhook["secret_token"] == SECRET
+    url = f"http://127.0.0.1:{port}/telegram"
+
+    results = {}
+    # Como o Telegram: no máximo WEBHOOK_MAX_CONNECTIONS POSTs simultâneos
+    connector = aiohttp.TCPConnector(limit=40)
+    async with aiohttp.ClientSession(connector=connector) as session:
+        async def post(update, secret=SECRET):
+            async with session.post(url, json=update, headers={SECRET_HEADER: secret}) as response:
+                return response.status
+
+        injected, started = await inject(post, stub, count, rate, first_chat=1)
+        results["paced"] = report(f"webhook ({rate:.0f}/s)", injected, stub, started)
+        injected, started = await inject(post, stub, count, 0, first_chat=10**6)
+        results["burst"] = report("webhook (rajada)", injected, stub, started)
+
+        # 2. Secret token errado
+        assert await post(stub.message_update(1, "/start"), secret="errado") == 403
+        print("secret token inválido: 403")
+
+        # 4. Encerramento com fila cheia: tudo o que recebeu 200 é respondido antes do shutdown
+        stub.latency = 0.002
+        before = len(stub.sent)
+        statuses = await asyncio.gather(*(post(stub.message_update(2 * 10**6 + n, "/start")) for n in range(500)))
+        accepted = statuses.count(200)
+        queued = application.update_queue.qsize()
+        stop_event.set()
+        await serving
+        assert accepted == 500 and len(stub.sent) - before == accepted, (accepted, len(stub.sent) - before)
+        print(f"encerramento: {queued} updates na fila ao parar, {accepted}/{accepted} respondidos antes do shutdown")
+
+    await stub.stop()
+    return results
+
+async def bench_backpressure() -> None:
+    """3. Fila pequena e handler lento: o excesso recebe 503 e nada aceito se perde"""
+    stub = await TelegramStub(latency=0.02).start()
+    application = build_application(stub, queue_size=10)
+    server = WebhookServer(application, SECRET, host="127.0.0.1", port=0, enqueue_timeout=0.05)
+    await application.initialize()
+    await server.start()
+    await application.start()
+    url = f"http://127.0.0.1:{server.port}{server.path}"
+
+    async with aiohttp.ClientSession() as session:
+        async def post(update):
+            async with session.post(url, json=update, headers={SECRET_HEADER: SECRET}) as response:
+                return response.status
+
+        statuses = await asyncio.gather(*(post(stub.message_update(chat_id, "/start")) for chat_id in range(1, 201)))
+    accepted = statuses.count(200)
+    assert statuses.count(503) == 200 - accepted > 0 and application.update_queue.qsize() <= 10
+    await server.stop()
+    await application.stop()
+    await application.shutdown()
+    assert len(stub.sent) == accepted
+    print(f"contrapressão (fila de 10, handler de 20ms): {accepted} aceitos, {200 - accepted} com 503, "
+          f"{len(stub.sent)} respondidos")
+    await stub.stop()
+
+async def run(count: int, rate: float) -> None:
+    polling = await bench_polling(count, rate)
+    webhook = await bench_webhook(count, rate)
+    await bench_backpressure()
+    print(f"webhook x polling: p50 {polling['paced']['p50'] / webhook['paced']['p50']:.1f}x menor, "
+          f"vazão em rajada {webhook['burst']['rate'] / polling['burst']['rate']:.1f}x")
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser()
+    parser.add_argument('--updates', type=int, default=2000)
+    parser.add_argument('--rate', type=float, default=200)
+    args = parser.parse_args()
+    asyncio.run(run(args.updates, args.rate))
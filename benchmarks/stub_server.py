@@ -0,0 +1,246 @@
+"""
+Servidor local que imita a API GraphQL de afiliados da Shopee, o redirecionador de links curtos
+e o CDN de imagens
+Usado pelos benchmarks para medir o bot sem depender da rede
+"""
+import asyncio
+import gzip
+import json
+import random
+import re
+import time
+from functools import lru_cache
+from typing import Dict, Optional
+from aiohttp import web
+
+def fake_item(shop_id: int, item_id: int) -> dict:
+    """Monta um item no formato retornado por getItemDetail"""
+    return {
+        "itemid": item_id,
+        "shopid": shop_id,
+        "name": f"Produto {item_id}",
+        "image": f"img_{item_id}",
+        "images": [f"img_{item_id}_{n}" for n in range(8)],
+        "currency": "BRL",
+        "stock": 100,
+        "status": 1,
+        "ctime": 1700000000,
+        "sold": 50,
+        "historical_sold": 1234,
+        "liked_count": 99,
+        "price": 4990000,
+        "price_min": 4990000,
+        "price_max": 4990000,
+        "price_before_discount": 9990000,
+        "show_discount": 50,
+        "raw_discount": 50,
+        "discount": "50%",
+        "shop_name": f"Loja {shop_id}",
+        "brand": "Marca",
+        "item_status": "normal",
+        "price_min_before_discount": 9990000,
+        "price_max_before_discount": 9990000,
+        "has_lowest_price_guarantee": False,
+        "show_free_shipping": True,
+        "description": "Descrição longa do produto. " * 40,
+        "attributes": [{"name": f"attr{n}", "value": f"valor{n}"} for n in range(10)],
+        "rating_star": 4.8,
+        "rating_count": [{"rating": n, "count": n * 10} for n in range(6)],
+    }
+
+@lru_cache(maxsize=None)
+def item_selection(query: str) -> Optional[Dict[str, Optional[dict]]]:
+    """
+    Campos pedidos dentro do primeiro `item { ... }` da consulta, como a API real responde
+    Campos com subcampos viram {campo: {subcampo: None, ...}}; None se a consulta não tiver item
+    """
+    start = query.find("item {")
+    if start < 0:
+        return None
+    root = {}
+    stack = []
+    current = root
+    last = None
+    for token in re.findall(r"[{}]|\w+", query[start + len("item {"):]):
+        if token == "{":
+            current[last] = {}
+            stack.append(current)
+            current = current[last]
+        elif token == "}":
+            if not stack:
+                break
+            current = stack.pop()
+        else:
+            current[token] = None
+            last = token
+    return root
+
+def project(value, selection: Optional[dict]):
+    """Só os campos pedidos de value (listas de objetos são projetadas item a item)"""
+    if selection is None:
+        return value
+    if isinstance(value, list):
+        return [project(entry, selection) for entry in value]
+    return {field: project(value[field], sub) for field, sub in selection.items() if field in value}
+
+class ShopeeStub:
+    """Stub HTTP com latência configurável e contadores de chamadas"""
+
+    def __init__(self, latency: float = 0.0, host: str = "127.0.0.1", port: int = 0):
+        self.latency = latency
+        # Injeção de falhas: /graphql responde fail_status nas próximas fail_count
+        # chamadas (todas, se fail_count for None), com Retry-After opcional
+        self.fail_status = None
+        self.fail_count = None
+        self.retry_after = None
+        # Fração das chamadas /graphql que falham com 500, sorteadas
+        self.error_rate = 0.0
+        # Limite de chamadas /graphql por segundo; acima dele responde 429 com Retry-After
+        self.rate_limit = None
+        self._window = (0, 0)
+        self.throttled = 0
+        # Preços sobrescritos por (shop_id, item_id), em centavos x 1000 como na API
+        self.prices = {}
+        self.host = host
+        self.port = port
+        self.graphql_calls = 0
+        self.redirect_calls = 0
+        self.page_calls = 0
+        # Compacta as respostas do /graphql com gzip quando o cliente aceita (as pequenas não)
+        self.compress = True
+        self.compress_min_size = 256
+        self.bytes_sent = 0
+        # Imagens do CDN (/file/{image}): tamanho, banda de download simulada (bytes/s) e contadores
+        self.image_size = 80_000
+        self.image_rate = None
+        self.image_calls = 0
+        self.image_bytes = 0
+        self.images_in_flight = 0
+        self.max_images_in_flight = 0
+        self._runner = None
+
+    @property
+    def base_url(self) -> str:
+        return f"http://{self.host}:{self.port}"
+
+    @property
+    def graphql_url(self) -> str:
+        return f"{self.base_url}/graphql"
+
+    @property
+    def image_url(self) -> str:
+        """Modelo para product_images.IMAGE_URL"""
+        return f"{self.base_url}/file/{{image}}"
+
+    def short_url(self, code: str) -> str:
+        return f"{self.base_url}/s/{code}"
+
+    def message_short_url(self, code: str) -> str:
+        """Link curto para mensagens: o link_parser o reconhece (contém s.shopee.com.br) e ele aponta para o stub"""
+        return f"{self.base_url}/s.shopee.com.br/{code}"
+
+    def item(self, shop_id: int, item_id: int) -> dict:
+        item = fake_item(shop_id, item_id)
+        price = self.prices.get((shop_id, item_id))
+        if price is not None:
+            item["price"] = item["price_min"] = item["price_max"] = price
+        return item
+
+    async def handle_graphql(self, request: web.Request) -> web.Response:
+        self.graphql_calls += 1
+        payload = await request.json()
+        if self.latency:
+            await asyncio.sleep(self.latency)
+        if self.fail_status and (self.fail_count is None or self.fail_count > 0):
+            if self.fail_count is not None:
+                self.fail_count -= 1
+            headers = {"Retry-After": str(self.retry_after)} if self.retry_after is not None else None
+            return web.json_response({"error": "falha injetada"}, status=self.fail_status, headers=headers)
+        if self.error_rate and random.random() < self.error_rate:
+            return web.json_response({"error": "falha sorteada"}, status=500)
+        if self.rate_limit is not None:
+            second = int(time.monotonic())
+            window, calls = self._window
+            calls = calls + 1 if window == second else 1
+            self._window = (second, calls)
+            if calls > self.rate_limit:
+                self.throttled += 1
+                return web.json_response({"error": "limite de taxa"}, status=429, headers={"Retry-After": "1"})
+        variables = payload.get("variables", {})
+        # Como a API real, responde só os campos pedidos na consulta
+        selection = item_selection(payload.get("query", ""))
+        if "shopId" in variables:
+            item = project(self.item(int(variables["shopId"]), int(variables["itemId"])), selection)
+            return self.graphql_response(request, {"data": {"getItemDetail": {"item": item}}})
+
+        # Consulta em lote: campos apelidados item0, item1, ... com variáveis s0/i0, s1/i1, ...
+        data = {}
+        n = 0
+        while f"s{n}" in variables:
+            item = self.item(int(variables[f"s{n}"]), int(variables[f"i{n}"]))
+            data[f"item{n}"] = {"item": project(item, selection)}
+            n += 1
+        return self.graphql_response(request, {"data": data})
+
+    def graphql_response(self, request: web.Request, result: dict) -> web.Response:
+        """Resposta JSON, compactada se o cliente mandou Accept-Encoding: gzip"""
+        body = json.dumps(result).encode()
+        headers = {}
+        if self.compress and len(body) >= self.compress_min_size and "gzip" in request.headers.get("Accept-Encoding", ""):
+            body = gzip.compress(body, compresslevel=6)
+            headers["Content-Encoding"] = "gzip"
+        self.bytes_sent += len(body)
+        return web.Response(body=body, content_type="application/json", headers=headers)
+
+    async def handle_short(self, request: web.Request) -> web.Response:
+        """Links curtos do tipo /s/SHOP_ID-ITEM_ID redirecionam para a página do produto"""
+        self.redirect_calls += 1
+        if self.latency:
+            await asyncio.sleep(self.latency)
+        shop_id, item_id = request.match_info["code"].split("-")
+        raise web.HTTPFound(f"/product/{shop_id}/{item_id}")
+
+    async def handle_product_page(self, request: web.Request) -> web.Response:
+        # Página de produto pesada, como a da Shopee real
+        self.page_calls += 1
+        return web.Response(text="<html>" + "x" * 300_000 + "</html>", content_type="text/html")
+
+    async def handle_image(self, request: web.Request) -> web.Response:
+        """Imagem do produto (bytes que não comprimem, como um JPEG)"""
+        self.image_calls += 1
+        self.images_in_flight += 1
+        self.max_images_in_flight = max(self.max_images_in_flight, self.images_in_flight)
+        try:
+            if self.latency:
+                await asyncio.sleep(self.latency)
+            if self.image_rate:
+                await asyncio.sleep(self.image_size / self.image_rate)
+        finally:
+            self.images_in_flight -= 1
+        body = random.Random(request.match_info["image"]).randbytes(self.image_size)
+        self.image_bytes += len(body)
+        return web.Response(body=body, content_type="image/jpeg")
+
+    async def start(self) -> "ShopeeStub":
+        app = web.Application()
+        app.router.add_post("/graphql", self.handle_graphql)
+        app.router.add_get("/s/{code}", self.handle_short)
+        app.router.add_get("/s.shopee.com.br/{code}", self.handle_short)
+        app.router.add_get("/product/{shop_id}/{item_id}", self.handle_product_page)
+        app.router.add_get("/file/{image}", self.handle_image)
+        self._runner = web.AppRunner(app, access_log=None)
+        await self._runner.setup()
+        site = web.TCPSite(self._runner, self.host, self.port)
+        await site.start()
+        self.port = self._runner.addresses[0][1]
+        return self
+
+    async def stop(self) -> None:
+        if self._runner is not None:
+            await self._runner.cleanup()
+            self._runner = None
+
+def disable_api_rate_limit(shopee_api) -> None:
+    """Remove o limite de taxa da API (os benchmarks medem o cliente, não o limitador)"""
+    limiter = shopee_api.api_rate_limiter
+    limiter.rate = limiter.capacity = limiter.tokens = 1_000_000
@@ -0,0 +1,239 @@
+"""
+Bot API do Telegram falsa, para rodar o Application de verdade (polling ou webhook) sem rede
+
+TelegramStub atende por HTTP local (base_url) ou direto no processo, pelo StubRequest
+(camada de request do PTB que chama o stub sem passar por HTTP).
+"""
+import asyncio
+import itertools
+import json
+import time
+from typing import Optional, Tuple
+from aiohttp import web
+from telegram.request import BaseRequest, RequestData
+
+BOT_USER = {"id": 123456, "is_bot": True, "first_name": "Divulgador", "username": "divulgador_bot"}
+
+class TelegramStub:
+    """
+    Bot API falsa: getUpdates com long polling, setWebhook/deleteWebhook e métodos de envio
+    Cada chamada de envio fica registrada em sent como (horário, método, parâmetros)
+    """
+
+    def __init__(self, latency: float = 0.0, host: str = "127.0.0.1", port: int = 0,
+                 upload_rate: Optional[float] = None):
+        self.latency = latency
+        # Banda de upload (bytes/s) simulada nos arquivos enviados; None = sem custo
+        self.upload_rate = upload_rate
+        self.uploads = 0
+        self.bytes_uploaded = 0
+        self._file_ids = itertools.count(1)
+        self.host = host
+        self.port = port
+        self.updates = []
+        self.sent = []
+        self.calls = {}
+        self.webhook = None
+        self._update_ids = itertools.count(1)
+        self._message_ids = itertools.count(1)
+        self._new_update = asyncio.Condition()
+        self._sent_event = asyncio.Event()
+        self._runner = None
+
+    @property
+    def base_url(self) -> str:
+        """Valor para Application.builder().base_url(...)"""
+        return f"http://{self.host}:{self.port}/bot"
+
+    # Updates sintéticos
+
+    def message_update(self, chat_id: int, text: str, user_id: int = None) -> dict:
+        user = {"id": user_id or chat_id, "is_bot": False, "first_name": f"Usuário {chat_id}"}
+        message = {
+            "message_id": next(self._message_ids),
+            "date": int(time.time()),
+            "chat": {"id": chat_id, "type": "private" if chat_id > 0 else "supergroup"},
+            "from": user,
+            "text": text,
+        }
+        if text.startswith("/"):
+            command = text.split()[0]
+            message["entities"] = [{"type": "bot_command", "offset": 0, "length": len(command)}]
+        return {"update_id": next(self._update_ids), "message": message}
+
+    def callback_update(self, chat_id: int, data: str, user_id: int = None) -> dict:
+        user = {"id": user_id or chat_id, "is_bot": False, "first_name": f"Usuário {chat_id}"}
+        return {
+            "update_id": next(self._update_ids),
+            "callback_query": {
+                "id": str(next(self._message_ids)),
+                "from": user,
+                "chat_instance": str(chat_id),
+                "data": data,
+                "message": {
+                    "message_id": next(self._message_ids),
+                    "date": int(time.time()),
+                    "chat": {"id": chat_id, "type": "private"},
+                    "from": BOT_USER,
+                    "text": "menu",
+                },
+            },
+        }
+
+    def inline_query_update(self, user_id: int, query: str) -> dict:
+        user = {"id": user_id, "is_bot": False, "first_name": f"Usuário {user_id}"}
+        return {
+            "update_id": next(self._update_ids),
+            "inline_query": {"id": str(next(self._message_ids)), "from": user, "query": query, "offset": ""},
+        }
+
+    async def push_update(self, update: dict) -> None:
+        """Entrega um update a quem estiver no getUpdates"""
+        async with self._new_update:
+            self.updates.append(update)
+            self._new_update.notify_all()
+
+    async def wait_sent(self, count: int, timeout: float = 30.0) -> None:
+        """Espera até haver count chamadas de envio registradas"""
+        async def wait():
+            while len(self.sent) < count:
+                self._sent_event.clear()
+                await self._sent_event.wait()
+        await asyncio.wait_for(wait(), timeout)
+
+    # Bot API
+
+    async def _params(self, request: web.Request) -> Tuple[dict, int]:
+        """Parâmetros da chamada e bytes de arquivos enviados (multipart)"""
+        if request.content_type == "application/json":
+            return await request.json(), 0
+        params = dict(await request.post())
+        uploaded = 0
+        for key, value in list(params.items()):
+            if isinstance(value, web.FileField):
+                uploaded += len(value.file.read())
+                del params[key]
+            elif isinstance(value, str) and value[:1] in "[{":
+                try:
+                    params[key] = json.loads(value)
+                except ValueError:
+                    pass
+        return params, uploaded
+
+    def _message(self, chat_id, text: str = "") -> dict:
+        return {
+            "message_id": next(self._message_ids),
+            "date": int(time.time()),
+            "chat": {"id": int(chat_id), "type": "private" if int(chat_id) > 0 else "supergroup"},
+            "from": BOT_USER,
+            "text": text,
+        }
+
+    def _photo(self, params: dict, uploaded: int) -> dict:
+        """Mensagem com foto: file_id novo para upload, o mesmo para file_id reenviado"""
+        file_id = params.get("photo") if not uploaded else f"photo{next(self._file_ids)}"
+        message = self._message(params.get("chat_id", 1))
+        del message["text"]
+        message["caption"] = params.get("caption", "")
+        message["photo"] = [
+            {"file_id": f"{file_id}_s", "file_unique_id": f"{file_id}_s", "width": 90, "height": 90},
+            {"file_id": file_id, "file_unique_id": file_id, "width": 800, "height": 800},
+        ]
+        return message
+
+    async def handle(self, request: web.Request) -> web.Response:
+        params, uploaded = await self._params(request)
+        result = await self.call(request.match_info["method"], params, uploaded)
+        return web.json_response({"ok": True, "result": result})
+
+    async def call(self, method: str, params: dict, uploaded: int = 0):
+        """Executa um método da Bot API e retorna o campo result da resposta"""
+        self.calls[method] = self.calls.get(method, 0) + 1
+        if method == "getUpdates":
+            return await self._get_updates(params)
+        if self.latency:
+            await asyncio.sleep(self.latency)
+        if uploaded:
+            self.uploads += 1
+            self.bytes_uploaded += uploaded
+            if self.upload_rate:
+                await asyncio.sleep(uploaded / self.upload_rate)
+        if method == "getMe":
+            result = BOT_USER
+        elif method == "setWebhook":
+            self.webhook = params
+            result = True
+        elif method == "deleteWebhook":
+            self.webhook = None
+            result = True
+        elif method in ("answerCallbackQuery", "setMyCommands", "deleteMessage"):
+            result = True
+        elif method == "answerInlineQuery":
+            self.sent.append((time.perf_counter(), method, params))
+            self._sent_event.set()
+            result = True
+        elif method == "sendPhoto":
+            self.sent.append((time.perf_counter(), method, params))
+            self._sent_event.set()
+            result = self._photo(params, uploaded)
+        else:
+            # sendMessage, editMessageText, copyMessage...
+            self.sent.append((time.perf_counter(), method, params))
+            self._sent_event.set()
+            result = self._message(params.get("chat_id", 1), params.get("text", ""))
+        return result
+
+    async def _get_updates(self, params: dict) -> list:
+        offset = int(params.get("offset") or 0)
+        timeout = float(params.get("timeout") or 0)
+        limit = int(params.get("limit") or 100)
+        # Confirmados pelo offset saem da fila, como na API real
+        self.updates = [update for update in self.updates if update["update_id"] >= offset]
+        if not self.updates and timeout:
+            async with self._new_update:
+                try:
+                    await asyncio.wait_for(self._new_update.wait(), timeout)
+                except asyncio.TimeoutError:
+                    pass
+        return self.updates[:limit]
+
+    async def start(self) -> "TelegramStub":
+        app = web.Application()
+        app.router.add_route("*", "/bot{token}/{method}", self.handle)
+        self._runner = web.AppRunner(app, access_log=None)
+        await self._runner.setup()
+        site = web.TCPSite(self._runner, self.host, self.port)
+        await site.start()
+        self.port = self._runner.addresses[0][1]
+        return self
+
+    async def stop(self) -> None:
+        if self._runner is not None:
+            await self._runner.cleanup()
+            self._runner = None
+
+class StubRequest(BaseRequest):
+    """Camada de request do PTB que entrega as chamadas ao TelegramStub no mesmo processo"""
+
+    def __init__(self, stub: TelegramStub):
+        self.stub = stub
+
+    @property
+    def read_timeout(self) -> Optional[float]:
+        return None
+
+    async def initialize(self) -> None:
+        pass
+
+    async def shutdown(self) -> None:
+        pass
+
+    async def do_request(self, url: str, method: str, request_data: Optional[RequestData] = None,
+                         read_timeout=None, write_timeout=None, connect_timeout=None,
+                         pool_timeout=None) -> Tuple[int, bytes]:
+        params = request_data.parameters if request_data else {}
+        uploaded = 0
+        if request_data is not None and request_data.contains_files:
+            uploaded = sum(len(part[1]) for part in request_data.multipart_data.values())
+        result = await self.stub.call(url.rsplit("/", 1)[1], params, uploaded)
+        return 200, json.dumps({"ok": True, "result": result}).encode()
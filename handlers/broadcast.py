@@ -0,0 +1,141 @@
+from telegram import Update, InlineKeyboardButton, InlineKeyboardMarkup, ChatMember
+from telegram.ext import ContextTypes
+import asyncio
+import logging
+from services.broadcast import broadcaster, Broadcast, PRIORITY_NORMAL
+from services.shopee_api import get_product_details, ShopeeAPIUnavailable
+from handlers.shopee import format_product_message, send_product_card, API_UNAVAILABLE_MESSAGE
+from utils.link_parser import extract_shopee_url
+from utils.permissions import is_bot_admin
+
+logger = logging.getLogger(__name__)
+
+# Intervalo entre atualizações da mensagem de progresso
+PROGRESS_INTERVAL = 5.0
+
+USAGE_TEXT = (
+    "Para divulgar nos grupos, use:\n"
+    "/divulgar link-da-shopee — envia o cartão do produto\n"
+    "/divulgar mensagem — envia o texto\n"
+    "ou responda a uma mensagem com /divulgar para encaminhá-la"
+)
+
+def get_groups(context: ContextTypes.DEFAULT_TYPE) -> dict:
+    """Grupos em que o bot está (chat_id -> título)"""
+    return context.bot_data.setdefault("groups", {})
+
+async def track_groups(update: Update, context: ContextTypes.DEFAULT_TYPE):
+    """Mantém a lista de grupos atualizada quando o bot entra ou sai de um grupo"""
+    change = update.my_chat_member
+    chat = change.chat
+    if chat.type not in (chat.GROUP, chat.SUPERGROUP, chat.CHANNEL):
+        return
+
+    groups = get_groups(context)
+    status = change.new_chat_member.status
+    if status in (ChatMember.MEMBER, ChatMember.ADMINISTRATOR, ChatMember.OWNER):
+        groups[chat.id] = chat.title or str(chat.id)
+        logger.info("Bot adicionado ao grupo %s", chat.id)
+    else:
+        groups.pop(chat.id, None)
+        logger.info("Bot removido do grupo %s", chat.id)
+
+def format_progress(broadcast: Broadcast) -> str:
+    """Texto da mensagem de progresso de uma divulgação"""
+    progress = broadcast.progress()
+    title = "✅ Divulgação concluída" if broadcast.done else "📣 Divulgando..."
+    text = (
+        f"{title}\n\n"
+        f"Enviadas: {progress['sent']}/{progress['total']}\n"
+        f"Falhas: {progress['failed']}\n"
+        f"Tempo: {progress['elapsed']:.0f}s ({progress['rate']:.1f} msg/s)"
+    )
+    return text
+
+async def report_progress(status_message, broadcast: Broadcast):
+    """Atualiza a mensagem de status até o fim do envio"""
+    last_text = None
+    while True:
+        try:
+            await asyncio.wait_for(broadcast.wait(), timeout=PROGRESS_INTERVAL)
+        except asyncio.TimeoutError:
+            pass
+        text = format_progress(broadcast)
+        if text != last_text:
+            try:
+                await status_message.edit_text(text)
+                last_text = text
+            except Exception as e:
+                logger.warning("Erro ao atualizar progresso da divulgação %s: %s", broadcast.id, e)
+        if broadcast.done:
+            return
+
+async def broadcast_command(update: Update, context: ContextTypes.DEFAULT_TYPE):
+    """Handler do comando /divulgar: envia a mesma mensagem para todos os grupos"""
+    if not is_bot_admin(update.effective_user.id):
+        await update.message.reply_text("🚫 Você não tem permissão para divulgar.")
+        return
+
+    groups = list(get_groups(context))
+    if not groups:
+        await update.message.reply_text(
+            "👥 Nenhum grupo cadastrado.\n"
+            "Adicione o bot aos grupos onde quer divulgar."
+        )
+        return
+
+    message = update.message
+    # A mensagem é montada uma vez e reaproveitada para todos os grupos
+    if message.reply_to_message:
+        method, kwargs = "copy_message", {
+            "from_chat_id": message.chat_id,
+            "message_id": message.reply_to_message.message_id,
+        }
+    elif context.args:
+        text = message.text.split(maxsplit=1)[1]
+        url = extract_shopee_url(text)
+        if url and text.strip() == url:
+            try:
+                product = await get_product_details(url)
+            except ShopeeAPIUnavailable as e:
+                logger.warning("API indisponível: %s", e)
+                await message.reply_text(API_UNAVAILABLE_MESSAGE)
+                return
+            if not product:
+                await message.reply_text("❌ Não foi possível encontrar o produto. Verifique se o link está correto.")
+                return
+            # Foto enviada uma vez: os outros grupos recebem pelo file_id
+            method, kwargs = send_product_card, {
+                "product": product,
+                "text": await format_product_message(product),
+            }
+        else:
+            method, kwargs = "send_message", {"text": text}
+    else:
+        await message.reply_text(USAGE_TEXT)
+        return
+
+    broadcast = broadcaster.submit(groups, method=method, priority=PRIORITY_NORMAL, **kwargs)
+    status_message = await message.reply_text(format_progress(broadcast))
+    # O envio pode levar minutos: o progresso é acompanhado fora do handler
+    context.application.create_task(report_progress(status_message, broadcast), update=update)
+
+async def show_groups(query, context: ContextTypes.DEFAULT_TYPE):
+    """Menu 👥 Grupos: grupos cadastrados e como divulgar"""
+    groups = get_groups(context)
+    if groups:
+        names = sorted(groups.values())
+        lines = [f"👥 Grupos ({len(groups)})\n"]
+        lines += [f"• {name}" for name in names[:20]]
+        if len(names) > 20:
+            lines.append(f"... e mais {len(names) - 20}")
+        text = "\n".join(lines)
+    else:
+        text = "👥 Grupos\n\nO bot ainda não está em nenhum grupo."
+
+    await query.edit_message_text(
+        text + "\n\n" + USAGE_TEXT,
+        reply_markup=InlineKeyboardMarkup([[
+            InlineKeyboardButton("🔙 Voltar", callback_data="menu_config")
+        ]])
+    )
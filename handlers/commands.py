@@ -1,21 +1,67 @@
 from telegram import Update, InlineKeyboardButton, InlineKeyboardMarkup
 from telegram.ext import ContextTypes, CallbackQueryHandler
+from handlers.scheduler import scheduler_menu_handler
+from handlers.broadcast import show_groups
+from handlers.price_watch import watch_menu_handler
 
-def get_main_menu_keyboard():
-    keyboard = [
-        [
-            InlineKeyboardButton("🔍 Buscar Produto", callback_data="menu_buscar"),
-            InlineKeyboardButton("⭐ Favoritos", callback_data="menu_favoritos")
-        ],
-        [
-            InlineKeyboardButton("⏰ Agendamentos", callback_data="menu_agendamentos"),
-            InlineKeyboardButton("⚙️ Configurações", callback_data="menu_config")
-        ],
-        [
-            InlineKeyboardButton("❓ Ajuda", callback_data="menu_ajuda")
-        ]
+# Menus fixos montados uma vez, na importação (feita no aquecimento do main.py)
+MAIN_MENU_KEYBOARD = InlineKeyboardMarkup([
+    [
+        InlineKeyboardButton("🔍 Buscar Produto", callback_data="menu_buscar"),
+        InlineKeyboardButton("⭐ Favoritos", callback_data="menu_favoritos")
+    ],
+    [
+        InlineKeyboardButton("⏰ Agendamentos", callback_data="menu_agendamentos"),
+        InlineKeyboardButton("⚙️ Configurações", callback_data="menu_config")
+    ],
+    [
+        InlineKeyboardButton("❓ Ajuda", callback_data="menu_ajuda")
     ]
-    return InlineKeyboardMarkup(keyboard)
+])
+
+BACK_KEYBOARD = InlineKeyboardMarkup([[
+    InlineKeyboardButton("🔙 Voltar", callback_data="menu_principal")
+]])
+
+FAVORITES_KEYBOARD = InlineKeyboardMarkup([
+    [
+        InlineKeyboardButton("❤️ Ver Favoritos", callback_data="favoritos_ver"),
+        InlineKeyboardButton("🔔 Alertas", callback_data="favoritos_alertas")
+    ],
+    [
+        InlineKeyboardButton("🔙 Voltar", callback_data="menu_principal")
+    ]
+])
+
+SCHEDULE_KEYBOARD = InlineKeyboardMarkup([
+    [
+        InlineKeyboardButton("📅 Ver Agendados", callback_data="agenda_ver"),
+        InlineKeyboardButton("➕ Novo", callback_data="agenda_novo")
+    ],
+    [
+        InlineKeyboardButton("🔙 Voltar", callback_data="menu_principal")
+    ]
+])
+
+CONFIG_KEYBOARD = InlineKeyboardMarkup([
+    [
+        InlineKeyboardButton("🔔 Notificações", callback_data="config_notif"),
+        InlineKeyboardButton("👥 Grupos", callback_data="config_grupos")
+    ],
+    [
+        InlineKeyboardButton("🎨 Voltar", callback_data="menu_principal")
+    ]
+])
+
+HELP_KEYBOARD = InlineKeyboardMarkup([
+    [
+        InlineKeyboardButton("📖 Guia Completo", callback_data="help_guia"),
+        InlineKeyboardButton("❓ FAQ", callback_data="help_faq")
+    ],
+    [
+        InlineKeyboardButton("🔙 Voltar", callback_data="menu_principal")
+    ]
+])
 
 async def start(update: Update, context: ContextTypes.DEFAULT_TYPE):
     text = (
@@ -26,12 +72,12 @@ async def start(update: Update, context: ContextTypes.DEFAULT_TYPE):
     if update.callback_query:
         await update.callback_query.message.edit_text(
             text=text,
-            reply_markup=get_main_menu_keyboard()
+            reply_markup=MAIN_MENU_KEYBOARD
         )
     else:
         await update.message.reply_text(
             text=text,
-            reply_markup=get_main_menu_keyboard()
+            reply_markup=MAIN_MENU_KEYBOARD
         )
 
 async def menu_handler(update: Update, context: ContextTypes.DEFAULT_TYPE):
@@ -47,84 +93,50 @@ async def menu_handler(update: Update, context: ContextTypes.DEFAULT_TYPE):
             "Exemplo:\n"
             "`/buscar https://shopee.com.br/produto...`\n\n"
             "Vou te retornar todas as informações do produto! 😊",
-            reply_markup=InlineKeyboardMarkup([[
-                InlineKeyboardButton("🔙 Voltar", callback_data="menu_principal")
-            ]]),
+            reply_markup=BACK_KEYBOARD,
             parse_mode='Markdown'
         )
     
     elif query.data == "menu_favoritos":
-        keyboard = [
-            [
-                InlineKeyboardButton("❤️ Ver Favoritos", callback_data="favoritos_ver"),
-                InlineKeyboardButton("🔔 Alertas", callback_data="favoritos_alertas")
-            ],
-            [
-                InlineKeyboardButton("🔙 Voltar", callback_data="menu_principal")
-            ]
-        ]
-        reply_markup = InlineKeyboardMarkup(keyboard)
         await query.edit_message_text(
             "⭐ *Seus Favoritos*\n\n"
             "Gerencie seus produtos favoritos:",
-            reply_markup=reply_markup,
+            reply_markup=FAVORITES_KEYBOARD,
             parse_mode='Markdown'
         )
     
     elif query.data == "menu_agendamentos":
-        keyboard = [
-            [
-                InlineKeyboardButton("📅 Ver Agendados", callback_data="agenda_ver"),
-                InlineKeyboardButton("➕ Novo", callback_data="agenda_novo")
-            ],
-            [
-                InlineKeyboardButton("🔙 Voltar", callback_data="menu_principal")
-            ]
-        ]
-        reply_markup = InlineKeyboardMarkup(keyboard)
         await query.edit_message_text(
             "⏰ *Agendamentos*\n\n"
             "Gerencie suas mensagens agendadas:",
-            reply_markup=reply_markup,
+            reply_markup=SCHEDULE_KEYBOARD,
             parse_mode='Markdown'
         )
     
     elif query.data == "menu_config":
-        keyboard = [
-            [
-                InlineKeyboardButton("🔔 Notificações", callback_data="config_notif"),
-                InlineKeyboardButton("👥 Grupos", callback_data="config_grupos")
-            ],
-            [
-                InlineKeyboardButton("🎨 Voltar", callback_data="menu_principal")
-            ]
-        ]
-        reply_markup = InlineKeyboardMarkup(keyboard)
         await query.edit_message_text(
             "⚙️ *Configurações*\n\n"
             "Personalize seu bot:",
-            reply_markup=reply_markup,
+            reply_markup=CONFIG_KEYBOARD,
             parse_mode='Markdown'
         )
     
+    elif query.data.startswith("favoritos_"):
+        await watch_menu_handler(update, context)
+
+    elif query.data == "config_grupos":
+        await show_groups(query, context)
+
+    elif query.data.startswith("agenda_"):
+        await scheduler_menu_handler(update, context)
+
     elif query.data == "menu_principal":
         await start(update, context)
 
 async def help_command(update: Update, context: ContextTypes.DEFAULT_TYPE):
-    keyboard = [
-        [
-            InlineKeyboardButton("📖 Guia Completo", callback_data="help_guia"),
-            InlineKeyboardButton("❓ FAQ", callback_data="help_faq")
-        ],
-        [
-            InlineKeyboardButton("🔙 Voltar", callback_data="menu_principal")
-        ]
-    ]
-    reply_markup = InlineKeyboardMarkup(keyboard)
-    
     await update.message.reply_text(
         "❓ *Central de Ajuda*\n\n"
         "Como posso te ajudar?",
-        reply_markup=reply_markup,
+        reply_markup=HELP_KEYBOARD,
         parse_mode='Markdown'
     ) 
\ No newline at end of file
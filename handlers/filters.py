@@ -0,0 +1,16 @@
+"""
+Filtros usados no registro dos handlers
+
+Ficam fora dos módulos dos handlers para o main.py registrar tudo sem importar o cliente da
+Shopee e o aiohttp (importados depois, no aquecimento)
+"""
+from telegram.ext import filters
+from utils.link_parser import has_shopee_link
+
+class ShopeeLinkFilter(filters.MessageFilter):
+    """Deixa passar apenas mensagens com link da Shopee (as demais nem chegam ao handler)"""
+
+    def filter(self, message) -> bool:
+        return has_shopee_link(message.text)
+
+SHOPEE_LINK = ShopeeLinkFilter(name="ShopeeLink")
@@ -0,0 +1,155 @@
+"""
+Modo inline: "@bot <link da Shopee>" em qualquer conversa mostra o cartão do produto
+
+A resposta é reaproveitada em dois níveis: o Telegram guarda a resposta de cada texto
+consultado por INLINE_CACHE_TIME segundos (is_personal=False: vale para todos os usuários),
+e o bot guarda as respostas prontas por links, para textos diferentes com os mesmos links.
+O Telegram manda uma consulta a cada tecla: cada consulta espera INLINE_DEBOUNCE segundos
+e só busca o produto se ainda for a última do usuário; uma busca em andamento é cancelada
+quando chega uma consulta com outros links.
+O modo inline precisa ser ativado no @BotFather (/setinline).
+"""
+import asyncio
+import logging
+import os
+from typing import Dict, List, Optional, Tuple
+from utils.env import load_env
+from telegram import (
+    Update, InlineQueryResultArticle, InlineQueryResultsButton, InputTextMessageContent
+)
+from telegram.ext import ContextTypes
+from handlers.shopee import format_price, format_product_message, product_keyboard
+from services.cache import TTLCache, FRESH
+from services.product_images import product_images
+from services.shopee_api import get_products_details, Product, ShopeeAPIUnavailable
+from utils.link_parser import extract_shopee_urls
+
+# Carrega variáveis de ambiente
+load_env()
+
+logger = logging.getLogger(__name__)
+
+# Tempo que o Telegram (e o cache local) guardam uma resposta
+INLINE_CACHE_TIME = int(os.getenv('INLINE_CACHE_TIME', '300'))
+INLINE_CACHE_SIZE = int(os.getenv('INLINE_CACHE_SIZE', '1000'))
+# Espera depois da última tecla antes de buscar
+INLINE_DEBOUNCE = float(os.getenv('INLINE_DEBOUNCE', '0.4'))
+# Links considerados por consulta
+INLINE_MAX_LINKS = int(os.getenv('INLINE_MAX_LINKS', '5'))
+
+HELP_BUTTON = InlineQueryResultsButton(text="🔍 Cole um link da Shopee depois do @ do bot", start_parameter="inline")
+NOT_FOUND_BUTTON = InlineQueryResultsButton(text="❌ Produto não encontrado", start_parameter="inline")
+UNAVAILABLE_BUTTON = InlineQueryResultsButton(text="⏳ A Shopee está instável, tente de novo", start_parameter="inline")
+
+# Respostas prontas por links da consulta
+inline_results = TTLCache(maxsize=INLINE_CACHE_SIZE, ttl=INLINE_CACHE_TIME, stale_ttl=INLINE_CACHE_TIME)
+
+class LatestQueries:
+    """Última consulta inline de cada usuário e a busca dela, para descartar as substituídas"""
+
+    def __init__(self):
+        # user_id -> (vez, links, busca em andamento)
+        self._latest: Dict[int, Tuple[int, tuple, Optional[asyncio.Task]]] = {}
+        self._turns = 0
+        self.superseded = 0
+        self.cancelled = 0
+
+    def begin(self, user_id: int, links: tuple) -> int:
+        """Registra a consulta como a última do usuário e cancela a busca anterior (outros links)"""
+        previous = self._latest.get(user_id)
+        if previous is not None:
+            _, previous_links, lookup = previous
+            if lookup is not None and not lookup.done() and previous_links != links:
+                self.cancelled += 1
+                lookup.cancel()
+        self._turns += 1
+        self._latest[user_id] = (self._turns, links, None)
+        return self._turns
+
+    def is_latest(self, user_id: int, turn: int) -> bool:
+        latest = self._latest.get(user_id)
+        return latest is not None and latest[0] == turn
+
+    def track(self, user_id: int, turn: int, lookup: asyncio.Task) -> None:
+        if self.is_latest(user_id, turn):
+            self._latest[user_id] = (turn, self._latest[user_id][1], lookup)
+
+    def finish(self, user_id: int, turn: int) -> None:
+        if self.is_latest(user_id, turn):
+            del self._latest[user_id]
+
+    def stats(self) -> Dict[str, int]:
+        return {"pending": len(self._latest), "superseded": self.superseded, "cancelled": self.cancelled}
+
+latest_queries = LatestQueries()
+
+async def build_results(products: List[Optional[Product]]) -> list:
+    """Um artigo por produto encontrado, com o mesmo cartão e botões das mensagens"""
+    results = {}
+    for product in products:
+        if product is None:
+            continue
+        result_id = f"{product.shop_id}_{product.id}"
+        if result_id in results:
+            continue
+        results[result_id] = InlineQueryResultArticle(
+            id=result_id,
+            title=product.name[:100] or f"Produto {product.id}",
+            description=format_price(product.price, product.original_price, product.discount),
+            input_message_content=InputTextMessageContent(
+                await format_product_message(product), parse_mode='Markdown', disable_web_page_preview=True
+            ),
+            reply_markup=product_keyboard(product),
+            thumbnail_url=product_images.image_url(product.image) if product.image else None,
+        )
+    return list(results.values())
+
+async def inline_query(update: Update, context: ContextTypes.DEFAULT_TYPE):
+    """Responde "@bot <link>" com o cartão de cada produto da consulta"""
+    query = update.inline_query
+    links = tuple(extract_shopee_urls(query.query, INLINE_MAX_LINKS))
+    if not links:
+        await query.answer([], cache_time=INLINE_CACHE_TIME, button=HELP_BUTTON)
+        return
+
+    results, state = inline_results.get(links)
+    if state == FRESH:
+        await query.answer(results, cache_time=INLINE_CACHE_TIME, is_personal=False)
+        return
+
+    user_id = query.from_user.id
+    turn = latest_queries.begin(user_id, links)
+    try:
+        # Usuário ainda digitando: a próxima consulta substitui esta antes de buscar
+        await asyncio.sleep(INLINE_DEBOUNCE)
+        if not latest_queries.is_latest(user_id, turn):
+            latest_queries.superseded += 1
+            return
+
+        lookup = asyncio.ensure_future(get_products_details(list(links)))
+        latest_queries.track(user_id, turn, lookup)
+        try:
+            products = await lookup
+        except asyncio.CancelledError:
+            # Cancelada por uma consulta mais nova (senão é o encerramento do bot)
+            if latest_queries.is_latest(user_id, turn):
+                raise
+            return
+
+        results = await build_results(products)
+        if not results:
+            await query.answer([], cache_time=0, button=NOT_FOUND_BUTTON)
+            return
+        inline_results.set(links, results)
+        await query.answer(results, cache_time=INLINE_CACHE_TIME, is_personal=False)
+    except ShopeeAPIUnavailable as e:
+        logger.warning("API indisponível: %s", e)
+        await query.answer([], cache_time=0, button=UNAVAILABLE_BUTTON)
+    finally:
+        latest_queries.finish(user_id, turn)
+
+def get_inline_stats() -> Dict[str, int]:
+    """Cache de respostas e consultas descartadas (para /metrics)"""
+    stats = {f"cache_{name}": value for name, value in inline_results.stats().items()}
+    stats.update(latest_queries.stats())
+    return stats
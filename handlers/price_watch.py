@@ -0,0 +1,130 @@
+from telegram import Update, InlineKeyboardButton, InlineKeyboardMarkup
+from telegram.ext import ContextTypes
+import logging
+from services.price_watch import price_watcher, FAVORITE, ALERT, PRICE_ALERT_DROP, WatchLimitExceeded, alert_target
+from services.shopee_api import get_product_details, ShopeeAPIUnavailable, PRODUCT_URL
+
+logger = logging.getLogger(__name__)
+
+# Produtos por página nos menus (mantém o menu dentro do limite de 8 botões)
+WATCHES_PER_PAGE = 5
+
+def format_price_alert(item: dict) -> str:
+    """Mensagem enviada quando o preço cruza o alvo do alerta"""
+    url = PRODUCT_URL.format(shop_id=item['shop_id'], item_id=item['item_id'])
+    return (
+        f"🔔 Baixou o preço!\n\n"
+        f"📦 {item['name']}\n"
+        f"💰 De R$ {item['old_price']:.2f} por R$ {item['price']:.2f}\n\n"
+        f"🔗 {url}"
+    )
+
+async def watch_button(update: Update, context: ContextTypes.DEFAULT_TYPE):
+    """Botões ⭐ Favoritar e 🔔 Alertar Preço do cartão do produto (liga/desliga)"""
+    query = update.callback_query
+    user_id = update.effective_user.id
+    kind, shop_id, item_id = query.data.split("_")
+    kind = FAVORITE if kind == "fav" else ALERT
+    shop_id, item_id = int(shop_id), int(item_id)
+
+    if price_watcher.has_watch(user_id, shop_id, item_id, kind):
+        price_watcher.remove_watch(user_id, shop_id, item_id, kind)
+        await query.answer("Removido dos favoritos." if kind == FAVORITE else "🔕 Alerta removido.")
+        return
+
+    # Preço atual (normalmente já está no cache, pois o cartão acabou de ser mostrado)
+    try:
+        product = await get_product_details(PRODUCT_URL.format(shop_id=shop_id, item_id=item_id))
+    except ShopeeAPIUnavailable:
+        product = None
+
+    try:
+        price_watcher.add_watch(
+            user_id, shop_id, item_id, kind,
+            price=product.price if product else None,
+            name=product.name if product else ''
+        )
+    except WatchLimitExceeded:
+        await query.answer("⚠️ Você atingiu o limite de produtos acompanhados.", show_alert=True)
+        return
+
+    if kind == FAVORITE:
+        await query.answer("⭐ Adicionado aos favoritos!")
+    elif product:
+        await query.answer(f"🔔 Vou avisar quando ficar abaixo de R$ {alert_target(product.price):.2f}.")
+    else:
+        # O alvo é definido quando o preço do produto for consultado
+        await query.answer(f"🔔 Alerta criado! Não consegui ver o preço agora; vou avisar quando cair "
+                           f"{PRICE_ALERT_DROP:.0%} a partir da próxima consulta.")
+
+async def legacy_watch_button(update: Update, context: ContextTypes.DEFAULT_TYPE):
+    """Botões de cartões antigos (fav_{id} / alert_{id}, sem a loja): não dá para identificar o produto"""
+    await update.callback_query.answer(
+        "⚠️ Este cartão é de uma versão anterior do bot. Envie o link novamente para favoritar "
+        "ou criar um alerta.",
+        show_alert=True
+    )
+
+def format_watch_line(watch: dict) -> str:
+    """Linha resumida de um produto acompanhado"""
+    name = watch['name'] or f"Produto {watch['item_id']}"
+    if len(name) > 40:
+        name = name[:40] + "..."
+    line = f"• {name}"
+    if watch['price'] is not None:
+        line += f"\n   💰 R$ {watch['price']:.2f}"
+    if watch['target_price'] is not None:
+        line += f" • alvo R$ {watch['target_price']:.2f}"
+    return line
+
+async def show_watches(query, user_id: int, kind: str, page: int = 0):
+    """Lista uma página dos favoritos ou alertas do usuário"""
+    menu = "ver" if kind == FAVORITE else "alertas"
+    watches, total = price_watcher.list_watches(user_id, kind, page, WATCHES_PER_PAGE)
+    pages = max(1, (total + WATCHES_PER_PAGE - 1) // WATCHES_PER_PAGE)
+    if page >= pages:
+        page = pages - 1
+        watches, total = price_watcher.list_watches(user_id, kind, page, WATCHES_PER_PAGE)
+
+    title = "❤️ Favoritos" if kind == FAVORITE else "🔔 Alertas de preço"
+    if total == 0:
+        hint = "⭐ Favoritar" if kind == FAVORITE else "🔔 Alertar Preço"
+        text = f"{title}\n\nNada por aqui ainda. Use o botão {hint} no cartão de um produto."
+    else:
+        lines = [f"{title} ({total}) — página {page + 1}/{pages}\n"]
+        lines += [format_watch_line(watch) for watch in watches]
+        text = "\n".join(lines)
+
+    keyboard = [
+        [InlineKeyboardButton(
+            f"❌ Remover {(watch['name'] or str(watch['item_id']))[:20]}",
+            callback_data=f"favoritos_rm_{kind}_{watch['shop_id']}_{watch['item_id']}_{page}"
+        )]
+        for watch in watches
+    ]
+    navigation = []
+    if page > 0:
+        navigation.append(InlineKeyboardButton("◀️ Anterior", callback_data=f"favoritos_{menu}_{page - 1}"))
+    if page + 1 < pages:
+        navigation.append(InlineKeyboardButton("Próxima ▶️", callback_data=f"favoritos_{menu}_{page + 1}"))
+    if navigation:
+        keyboard.append(navigation)
+    keyboard.append([InlineKeyboardButton("🔙 Voltar", callback_data="menu_favoritos")])
+
+    await query.edit_message_text(text, reply_markup=InlineKeyboardMarkup(keyboard))
+
+async def watch_menu_handler(update: Update, context: ContextTypes.DEFAULT_TYPE):
+    """Botões do menu de favoritos (favoritos_*)"""
+    query = update.callback_query
+    user_id = update.effective_user.id
+
+    if query.data.startswith("favoritos_rm_"):
+        _, _, kind, shop_id, item_id, page = query.data.split("_")
+        price_watcher.remove_watch(user_id, int(shop_id), int(item_id), kind)
+        await show_watches(query, user_id, kind, int(page))
+
+    elif query.data.startswith("favoritos_ver") or query.data.startswith("favoritos_alertas"):
+        kind = FAVORITE if query.data.startswith("favoritos_ver") else ALERT
+        parts = query.data.split("_")
+        page = int(parts[2]) if len(parts) > 2 else 0
+        await show_watches(query, user_id, kind, page)
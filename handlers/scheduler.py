@@ -1,12 +1,121 @@
-from telegram import Update
+from telegram import Update, InlineKeyboardButton, InlineKeyboardMarkup
 from telegram.ext import ContextTypes
-from datetime import datetime
 import pytz
+import re
+from services.scheduler import message_scheduler, next_run_at, BOT_TIMEZONE
+from utils.permissions import is_bot_admin, is_chat_admin
+
+# Agendamentos por página no menu (mantém o menu dentro do limite de 8 botões)
+JOBS_PER_PAGE = 5
+
+TIME_PATTERN = re.compile(r"^([01]?\d|2[0-3]):([0-5]\d)$")
+
+USAGE_TEXT = (
+    "Para agendar uma mensagem, use o formato:\n"
+    "/agendar HH:MM grupo_id mensagem\n"
+    "Exemplo: /agendar 14:30 -1001234567890 Promoção ativa!"
+)
 
 async def schedule_message(update: Update, context: ContextTypes.DEFAULT_TYPE):
-    # Implementação básica do agendamento
+    """Handler do comando /agendar HH:MM grupo_id mensagem"""
+    if not is_bot_admin(update.effective_user.id):
+        await update.message.reply_text("🚫 Você não tem permissão para agendar mensagens.")
+        return
+
+    args = context.args or []
+    if len(args) < 3:
+        await update.message.reply_text(USAGE_TEXT)
+        return
+
+    match = TIME_PATTERN.match(args[0])
+    if not match:
+        await update.message.reply_text("❌ Horário inválido. Use HH:MM (ex: 14:30).\n\n" + USAGE_TEXT)
+        return
+
+    try:
+        chat_id = int(args[1])
+    except ValueError:
+        await update.message.reply_text("❌ ID do grupo inválido. Use o ID numérico (ex: -1001234567890).")
+        return
+
+    # Só agenda em chats que o próprio usuário administra
+    if not await is_chat_admin(context.bot, chat_id, update.effective_user.id):
+        await update.message.reply_text(
+            "🚫 Você precisa ser administrador do grupo para agendar mensagens nele.\n"
+            "Confira o ID do grupo e se o bot faz parte dele."
+        )
+        return
+
+    # Mantém a mensagem exatamente como digitada (quebras de linha inclusive)
+    text = update.message.text.split(maxsplit=3)[3]
+
+    run_at = next_run_at(int(match.group(1)), int(match.group(2)))
+    message_scheduler.add_job(run_at, chat_id, text, update.effective_user.id)
+
+    local = run_at.astimezone(pytz.timezone(BOT_TIMEZONE))
     await update.message.reply_text(
-        "Para agendar uma mensagem, use o formato:\n"
-        "/agendar HH:MM grupo_id mensagem\n"
-        "Exemplo: /agendar 14:30 -1001234567890 Promoção ativa!"
-    ) 
\ No newline at end of file
+        f"✅ Mensagem agendada para {local:%d/%m às %H:%M} no grupo {chat_id}.",
+        reply_markup=InlineKeyboardMarkup([[
+            InlineKeyboardButton("📅 Ver Agendados", callback_data="agenda_ver_0")
+        ]])
+    )
+
+def format_job_line(job) -> str:
+    """Linha resumida de um agendamento"""
+    preview = job.text.replace("\n", " ")
+    if len(preview) > 40:
+        preview = preview[:40] + "..."
+    return f"#{job.id} • {job.local_time():%d/%m %H:%M} → {job.chat_id}\n   {preview}"
+
+async def show_scheduled_jobs(query, user_id: int, page: int = 0):
+    """Lista uma página dos agendamentos pendentes do usuário"""
+    jobs, total = message_scheduler.list_jobs(user_id, page, JOBS_PER_PAGE)
+    pages = max(1, (total + JOBS_PER_PAGE - 1) // JOBS_PER_PAGE)
+    if page >= pages:
+        # A página ficou vazia (ex: último agendamento dela cancelado)
+        page = pages - 1
+        jobs, total = message_scheduler.list_jobs(user_id, page, JOBS_PER_PAGE)
+
+    if total == 0:
+        text = "📅 Agendamentos\n\nVocê não tem mensagens agendadas."
+    else:
+        lines = [f"📅 Agendamentos ({total}) — página {page + 1}/{pages}\n"]
+        lines += [format_job_line(job) for job in jobs]
+        text = "\n".join(lines)
+
+    keyboard = [
+        [InlineKeyboardButton(f"❌ Cancelar #{job.id}", callback_data=f"agenda_cancelar_{job.id}_{page}")]
+        for job in jobs
+    ]
+    navigation = []
+    if page > 0:
+        navigation.append(InlineKeyboardButton("◀️ Anterior", callback_data=f"agenda_ver_{page - 1}"))
+    if page + 1 < pages:
+        navigation.append(InlineKeyboardButton("Próxima ▶️", callback_data=f"agenda_ver_{page + 1}"))
+    if navigation:
+        keyboard.append(navigation)
+    keyboard.append([InlineKeyboardButton("🔙 Voltar", callback_data="menu_agendamentos")])
+
+    await query.edit_message_text(text, reply_markup=InlineKeyboardMarkup(keyboard))
+
+async def scheduler_menu_handler(update: Update, context: ContextTypes.DEFAULT_TYPE):
+    """Botões do menu de agendamentos (agenda_*)"""
+    query = update.callback_query
+    user_id = update.effective_user.id
+
+    if query.data == "agenda_novo":
+        await query.edit_message_text(
+            "➕ Novo agendamento\n\n" + USAGE_TEXT,
+            reply_markup=InlineKeyboardMarkup([[
+                InlineKeyboardButton("🔙 Voltar", callback_data="menu_agendamentos")
+            ]])
+        )
+
+    elif query.data.startswith("agenda_cancelar_"):
+        _, _, job_id, page = query.data.split("_")
+        message_scheduler.cancel_job(int(job_id), user_id)
+        await show_scheduled_jobs(query, user_id, int(page))
+
+    elif query.data.startswith("agenda_ver"):
+        page = int(query.data.rsplit("_", 1)[1]) if query.data.startswith("agenda_ver_") else 0
+        await show_scheduled_jobs(query, user_id, page)
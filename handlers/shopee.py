@@ -1,7 +1,24 @@
-from telegram import Update, InlineKeyboardButton, InlineKeyboardMarkup
+from typing import Optional
+from telegram import Update, InlineKeyboardButton, InlineKeyboardMarkup, Message
+from telegram.constants import MessageLimit
 from telegram.ext import ContextTypes
-from services.shopee_api import get_product_details, extract_product_info
-import re
+from services.shopee_api import get_product_details, get_products_details, ShopeeAPIUnavailable, Product
+from services.product_images import product_images, ImageUnavailable, PRODUCT_PHOTOS
+from utils.link_parser import extract_shopee_urls
+from services.price_history import price_history
+from utils.metrics import metrics
+import logging
+import time
+
+logger = logging.getLogger(__name__)
+
+# Máximo de links processados por mensagem
+MAX_LINKS_PER_MESSAGE = 10
+
+API_UNAVAILABLE_MESSAGE = (
+    "⏳ A Shopee está instável no momento.\n"
+    "Por favor, tente novamente em alguns instantes."
+)
 
 def format_price(price: float, original_price: float = 0, discount: int = 0) -> str:
     """Formata o preço com desconto se houver"""
@@ -14,49 +31,96 @@ def format_rating(rating: float, count: int) -> str:
     stars = "⭐" * int(rating)
     return f"{stars} ({count} avaliações)"
 
-async def format_product_message(product: dict) -> str:
+def format_lowest_price(product: Product, days: int = 30) -> str:
+    """Linha com o menor preço dos últimos dias (vazia com menos de um dia de histórico)"""
+    now = time.time()
+    lowest = price_history.lowest_price(product.shop_id, product.id, days, now)
+    if lowest is None or now - lowest[1] < 86400:
+        return ""
+    if lowest[0] < product.price - 0.005:
+        return f"📉 Menor preço em {days} dias: R$ {lowest[0]:.2f}"
+    return f"📉 Menor preço dos últimos {days} dias!"
+
+async def format_product_message(product: Product) -> str:
     """Formata a mensagem do produto no estilo do Divulgador Inteligente"""
     message = [
-        f"📦 *{product['name']}*\n",
-        format_price(product['price'], product.get('original_price', 0), product.get('discount', 0)),
-        f"📊 Vendidos: {product['sales']}",
-        format_rating(product['rating'], product.get('rating_count', 0)),
-        f"\n🏪 Loja: {product['shop_name']}",
-        f"⭐ Avaliação da Loja: {product['shop_rating']:.1f}",
-        f"\n📝 Descrição: {product['description'][:200]}..." if len(product['description']) > 200 else f"\n📝 Descrição: {product['description']}",
-        f"\n🔗 [Ver na Shopee]({product['link']})"
+        f"📦 *{product.name}*\n",
+        format_price(product.price, product.original_price, product.discount),
+    ]
+    lowest = format_lowest_price(product)
+    if lowest:
+        message.append(lowest)
+    message += [
+        f"📊 Vendidos: {product.sales}",
+        format_rating(product.rating, product.rating_count),
+        f"\n🏪 Loja: {product.shop_name}",
+        f"⭐ Avaliação da Loja: {product.shop_rating:.1f}",
+        f"\n📝 Descrição: {product.description[:200]}..." if len(product.description) > 200 else f"\n📝 Descrição: {product.description}",
+        f"\n🔗 [Ver na Shopee]({product.link})"
     ]
     return "\n".join(message)
 
-def extract_shopee_url(text: str) -> str:
-    """Extrai URL da Shopee do texto"""
-    # Padrões de URL da Shopee
-    patterns = [
-        r'https?://[^\s<>"]+?shopee\.com\.br[^\s<>"]+',
-        r'https?://shope\.ee[^\s<>"]+',
-        r'https?://s\.shopee[^\s<>"]+',
-    ]
-    
-    for pattern in patterns:
-        match = re.search(pattern, text)
-        if match:
-            url = match.group(0)
-            # Remove parâmetros desnecessários da URL
-            clean_url = url.split('?')[0]
-            return clean_url
-    return None
+async def format_products_message(products: list, not_found: int = 0) -> str:
+    """Formata vários produtos numa única mensagem compacta"""
+    message = [f"🛍️ *{len(products)} ofertas encontradas*"]
+    for position, product in enumerate(products, start=1):
+        message.append(
+            f"\n{position}. *{product.name}*\n"
+            f"{format_price(product.price, product.original_price, product.discount)}\n"
+            f"🔗 [Ver na Shopee]({product.link})"
+        )
+    if not_found:
+        message.append(f"\n⚠️ {not_found} link(s) não encontrado(s)")
+    return "\n".join(message)
+
+def product_keyboard(product: Product) -> InlineKeyboardMarkup:
+    """Botões ⭐ Favoritar e 🔔 Alertar Preço do cartão do produto"""
+    return InlineKeyboardMarkup([
+        [
+            InlineKeyboardButton("⭐ Favoritar", callback_data=f"fav_{product.shop_id}_{product.id}"),
+            InlineKeyboardButton("🔔 Alertar Preço", callback_data=f"alert_{product.shop_id}_{product.id}")
+        ]
+    ])
+
+async def send_product_photo(bot, chat_id: int, product: Product, caption: str, **kwargs) -> Optional[Message]:
+    """
+    Envia o cartão como foto com legenda
+    Retorna None quando o cartão fica só em texto: sem imagem, legenda longa demais ou imagem indisponível
+    """
+    if not PRODUCT_PHOTOS or not product.image or len(caption) > MessageLimit.CAPTION_LENGTH:
+        return None
+    try:
+        with metrics.phase("telegram_photo"):
+            return await product_images.send_photo(bot, chat_id, product.image, caption=caption,
+                                                   parse_mode='Markdown', **kwargs)
+    except ImageUnavailable as e:
+        logger.warning("Imagem do produto %s indisponível: %s", product.id, e)
+        return None
+
+async def send_product_card(bot, chat_id: int, product: Product, text: str, **kwargs) -> Message:
+    """Envia o cartão do produto com foto (ou só o texto, se não houver foto)"""
+    message = await send_product_photo(bot, chat_id, product, text, **kwargs)
+    if message is None:
+        message = await bot.send_message(chat_id=chat_id, text=text, parse_mode='Markdown',
+                                         disable_web_page_preview=True, **kwargs)
+    return message
 
 async def process_message(update: Update, context: ContextTypes.DEFAULT_TYPE):
     """Processa mensagens procurando por links da Shopee"""
     message_text = update.message.text
     
-    # Extrai URL da Shopee
-    url = extract_shopee_url(message_text)
+    # Extrai URLs da Shopee
+    urls = extract_shopee_urls(message_text, MAX_LINKS_PER_MESSAGE)
     
-    if not url:
+    if not urls:
         # Ignora mensagens sem links da Shopee
         return
 
+    if len(urls) > 1:
+        await process_multiple_links(update, urls)
+        return
+
+    url = urls[0]
     try:
         # Envia mensagem de carregamento
         loading_message = await update.message.reply_text(
@@ -69,31 +133,69 @@ async def process_message(update: Update, context: ContextTypes.DEFAULT_TYPE):
         if product:
             # Formata e envia a mensagem com os detalhes
             message = await format_product_message(product)
-            keyboard = [
-                [
-                    InlineKeyboardButton("⭐ Favoritar", callback_data=f"fav_{product['id']}"),
-                    InlineKeyboardButton("🔔 Alertar Preço", callback_data=f"alert_{product['id']}")
-                ]
-            ]
-            reply_markup = InlineKeyboardMarkup(keyboard)
-            
-            await loading_message.edit_text(
-                message,
-                reply_markup=reply_markup,
-                parse_mode='Markdown',
-                disable_web_page_preview=True
+            keyboard = product_keyboard(product)
+
+            # Texto não vira foto: o cartão com foto responde ao link e substitui o "Buscando..."
+            photo = await send_product_photo(
+                context.bot, update.effective_chat.id, product, message,
+                reply_markup=keyboard, reply_to_message_id=update.message.message_id
             )
+            if photo is not None:
+                await loading_message.delete()
+            else:
+                with metrics.phase("telegram_edit"):
+                    await loading_message.edit_text(
+                        message,
+                        reply_markup=keyboard,
+                        parse_mode='Markdown',
+                        disable_web_page_preview=True
+                    )
         else:
             await loading_message.edit_text(
                 "❌ Não foi possível encontrar o produto. Verifique se o link está correto."
             )
+    except ShopeeAPIUnavailable as e:
+        logger.warning("API indisponível: %s", e)
+        await loading_message.edit_text(API_UNAVAILABLE_MESSAGE)
     except Exception as e:
-        print(f"Erro ao processar produto: {e}")
+        logger.error("Erro ao processar produto: %s", e)
         await update.message.reply_text(
             "😅 Ops! Ocorreu um erro ao buscar o produto.\n"
             "Por favor, verifique se o link está correto e tente novamente."
         )
 
+async def process_multiple_links(update: Update, urls: list):
+    """Responde mensagens com vários links com um único cartão combinado"""
+    try:
+        loading_message = await update.message.reply_text(
+            f"🔄 Buscando informações de {len(urls)} produtos..."
+        )
+
+        # Busca todos os produtos de uma vez (consulta em lote)
+        products = [product for product in await get_products_details(urls) if product]
+
+        if products:
+            message = await format_products_message(products, not_found=len(urls) - len(products))
+            with metrics.phase("telegram_edit"):
+                await loading_message.edit_text(
+                    message,
+                    parse_mode='Markdown',
+                    disable_web_page_preview=True
+                )
+        else:
+            await loading_message.edit_text(
+                "❌ Não foi possível encontrar os produtos. Verifique se os links estão corretos."
+            )
+    except ShopeeAPIUnavailable as e:
+        logger.warning("API indisponível: %s", e)
+        await loading_message.edit_text(API_UNAVAILABLE_MESSAGE)
+    except Exception as e:
+        logger.error("Erro ao processar produtos: %s", e)
+        await update.message.reply_text(
+            "😅 Ops! Ocorreu um erro ao buscar os produtos.\n"
+            "Por favor, verifique se os links estão corretos e tente novamente."
+        )
+
 # Mantém a função search_products para compatibilidade, mas redireciona para process_message
 async def search_products(update: Update, context: ContextTypes.DEFAULT_TYPE):
     """Handler para o comando /buscar (mantido para compatibilidade)"""
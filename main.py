@@ -1,31 +1,70 @@
-from telegram.ext import Application, CommandHandler, MessageHandler, filters, CallbackQueryHandler
+# Primeira importação: mede a inicialização a partir daqui (utils/startup.py)
+from utils.startup import startup, deferred
+from telegram.ext import Application, ApplicationBuilder, CommandHandler, MessageHandler, filters, CallbackQueryHandler, ChatMemberHandler, InlineQueryHandler
 from telegram import Update
+import asyncio
+import importlib
 import os
-from dotenv import load_dotenv
+from typing import Optional
 import logging
 import sys
-from handlers.commands import start, help_command, menu_handler
-from handlers.shopee import search_products, process_message
-from handlers.scheduler import schedule_message
-
-# Configuração de logging
-logging.basicConfig(
-    format='%(asctime)s - %(name)s - %(levelname)s - %(message)s',
-    level=logging.INFO,
-    stream=sys.stdout
-)
-
-logger = logging.getLogger(__name__)
+from handlers.filters import SHOPEE_LINK
+from services.persistence import SQLitePersistence
+from services.update_processor import ChatUpdateProcessor, UpdateQueue
+from utils.env import load_env
+from utils.log import setup_logging
+from utils.metrics import metrics
+from utils.permissions import ADMIN_IDS
 
 # Carrega variáveis de ambiente
-load_dotenv()
+load_env()
 TOKEN = os.getenv('TELEGRAM_TOKEN')
+# Bot API alternativa (servidor telegram-bot-api local, stub dos benchmarks), terminada em /bot
+TELEGRAM_API_URL = os.getenv('TELEGRAM_API_URL')
+# URL pública do webhook; definida, o bot roda em modo webhook (services/webhook.py)
+WEBHOOK_URL = os.getenv('WEBHOOK_URL')
+
+# Aquecimento em segundo plano: o bot começa a receber updates enquanto importa o resto
+FAST_START = os.getenv('FAST_START', '1').lower() in ('1', 'true', 'yes')
+
+# Métricas no formato Prometheus (desativadas por padrão)
+METRICS_ENABLED = os.getenv('METRICS_ENABLED', '').lower() in ('1', 'true', 'yes')
+METRICS_HOST = os.getenv('METRICS_HOST', '127.0.0.1')
+METRICS_PORT = int(os.getenv('METRICS_PORT', '9100'))
+
+# Handlers e serviços importados no aquecimento (com eles, o aiohttp e o cliente da Shopee)
+DEFERRED_MODULES = (
+    "services.http_client",
+    "services.shopee_api",
+    "services.product_images",
+    "services.price_history",
+    "services.broadcast",
+    "services.scheduler",
+    "services.price_watch",
+    "handlers.shopee",
+    "handlers.scheduler",
+    "handlers.broadcast",
+    "handlers.price_watch",
+    "handlers.commands",
+    "handlers.inline",
+)
+
+# Configuração de logging (fila + listener: formatação e escrita fora do loop de eventos)
+setup_logging()
+
+logger = logging.getLogger(__name__)
 
 # Verifica se o token existe
 if not TOKEN:
     logger.error("Token do Telegram não encontrado! Verifique o arquivo .env")
     sys.exit(1)
 
+# Sem administradores, os comandos que publicam em nome do bot ficam bloqueados
+if not ADMIN_IDS:
+    logger.warning("ADMIN_IDS não definido: /divulgar e /agendar estão bloqueados para todos os usuários")
+
+startup.mark("importações")
+
 async def error_handler(update: Update, context):
     """Trata erros do bot de forma global"""
     logger.error(f"Erro durante o processamento: {context.error}")
@@ -35,33 +74,214 @@ async def error_handler(update: Update, context):
             "Por favor, tente novamente mais tarde."
         )
 
-def main():
-    try:
-        # Inicializa o bot
-        application = Application.builder().token(TOKEN).build()
+async def start_services(application: Application):
+    """Inicia os serviços usados pelos handlers (sessão HTTP, filas, agendador, preços)"""
+    from services.http_client import init_http_session
+    from services.broadcast import broadcaster, PRIORITY_HIGH
+    from services.scheduler import message_scheduler
+    from services.price_watch import price_watcher
+    from services.price_history import price_history
+    from handlers.price_watch import format_price_alert
+
+    await init_http_session(application)
+    await broadcaster.start(application.bot)
+
+    async def send_scheduled(chat_id: int, text: str):
+        # Passa pela mesma fila das divulgações (respeita os limites do Telegram)
+        broadcast = await broadcaster.submit([chat_id], priority=PRIORITY_HIGH, text=text).wait()
+        if broadcast.failed:
+            raise RuntimeError(broadcast.errors[chat_id])
+
+    await message_scheduler.start(send_scheduled)
+
+    async def notify_price_drop(user_ids: list, item: dict):
+        # Mesma mensagem para todos os usuários com alerta no produto
+        broadcaster.submit(user_ids, text=format_price_alert(item), disable_web_page_preview=True)
+
+    await price_watcher.start(notify_price_drop)
+    await price_history.start()
+    if METRICS_ENABLED:
+        register_gauges()
+        await metrics.start_server(METRICS_HOST, METRICS_PORT)
+
+def import_modules(names) -> None:
+    for name in names:
+        importlib.import_module(name)
+
+async def warm_up(application: Application):
+    """Importa os módulos adiados, inicia os serviços e aquece regexes e menus"""
+    with startup.phase("aquecimento"):
+        with startup.phase("importações adiadas"):
+            # Numa thread: o loop segue com as chamadas do início do polling enquanto isso
+            # (os módulos só criam primitivas do asyncio, ligadas ao loop no primeiro uso)
+            await asyncio.to_thread(import_modules, DEFERRED_MODULES)
+
+        with startup.phase("serviços"):
+            await start_services(application)
 
-        # Adiciona handlers
-        application.add_handler(CommandHandler("start", start))
-        application.add_handler(CommandHandler("help", help_command))
-        application.add_handler(CommandHandler("buscar", search_products))
-        application.add_handler(CommandHandler("agendar", schedule_message))
-        
-        # Adiciona handler para os menus
-        application.add_handler(CallbackQueryHandler(menu_handler))
+        # Os menus fixos já foram montados na importação de handlers.commands
+        with startup.phase("regexes"):
+            from utils.link_parser import extract_shopee_urls, extract_product_ids
+            for url in extract_shopee_urls("https://shopee.com.br/product/1/2 https://shopee.com.br/a-i.1.2"):
+                extract_product_ids(url)
 
-        # Adiciona handler para processar todas as mensagens
-        application.add_handler(MessageHandler(filters.TEXT & ~filters.COMMAND, process_message))
+    # Pode levar até 2x HTTP_CONNECT_TIMEOUT: os handlers não esperam por isso
+    startup.start_background(open_connections())
 
-        # Adiciona handler de erro global
-        application.add_error_handler(error_handler)
+async def open_connections():
+    """Abre conexões com a API da Shopee e o CDN das imagens antes das primeiras buscas"""
+    from services.http_client import warm_up_connections
+    from services.shopee_api import API_URL
+    from services.product_images import product_images, PRODUCT_PHOTOS
+
+    with startup.phase("conexões"):
+        urls = [API_URL] + ([product_images.image_url("")] if PRODUCT_PHOTOS else [])
+        opened = await warm_up_connections(urls)
+    logger.info("Aquecimento: %s/%s conexões abertas", opened, len(urls))
+
+async def post_init(application: Application):
+    """
+    Inicializa recursos compartilhados antes de receber updates
+    Com FAST_START o aquecimento roda junto com o início do polling/webhook; os handlers
+    de updates que chegarem antes do fim esperam por ele (não pelas conexões) e uma falha
+    nele encerra o bot
+    """
+    startup.mark("initialize (getMe, persistência)")
+    if FAST_START:
+        startup.start_warm_up(warm_up(application))
+    else:
+        await warm_up(application)
+
+async def post_shutdown(application: Application):
+    """Libera recursos compartilhados ao encerrar o bot"""
+    await startup.stop_warm_up()
+    from services.http_client import close_http_session
+    from services.broadcast import broadcaster
+    from services.scheduler import message_scheduler
+    from services.price_watch import price_watcher
+    from services.price_history import price_history
+    from services.product_images import product_images
+
+    await message_scheduler.stop()
+    await price_watcher.stop()
+    await price_history.stop()
+    await broadcaster.stop()
+    product_images.close()
+    await close_http_session(application)
+    await metrics.stop_server()
+
+def register_gauges():
+    """Métricas dos serviços (chamado depois que o aquecimento os importa)"""
+    from services.shopee_api import get_cache_stats, get_api_metrics
+    from services.scheduler import message_scheduler
+    from services.broadcast import broadcaster
+    from services.price_watch import price_watcher
+    from services.price_history import price_history
+    from services.product_images import product_images
+    from handlers.inline import get_inline_stats
+
+    metrics.register_gauges("product_cache", get_cache_stats)
+    metrics.register_gauges("shopee_api", get_api_metrics)
+    metrics.register_gauges("scheduler", message_scheduler.stats)
+    metrics.register_gauges("broadcast", broadcaster.status)
+    metrics.register_gauges("price_watch", price_watcher.stats)
+    metrics.register_gauges("price_history", price_history.stats)
+    metrics.register_gauges("inline", get_inline_stats)
+    metrics.register_gauges("product_images", product_images.stats)
+
+def register_handlers(application: Application):
+    """Registra os handlers (os mesmos no polling e no webhook)"""
+    def handler(module: str, name: str):
+        # Módulo importado no aquecimento (ou no primeiro update, sem post_init)
+        return metrics.instrument_handler(name, deferred(module, name))
+
+    application.add_handler(CommandHandler("start", handler("handlers.commands", "start")))
+    application.add_handler(CommandHandler("help", handler("handlers.commands", "help_command")))
+    application.add_handler(CommandHandler("buscar", handler("handlers.shopee", "search_products")))
+    application.add_handler(CommandHandler("agendar", handler("handlers.scheduler", "schedule_message")))
+    application.add_handler(CommandHandler("divulgar", handler("handlers.broadcast", "broadcast_command")))
+
+    # Acompanha os grupos em que o bot entra/sai (destinos das divulgações)
+    application.add_handler(ChatMemberHandler(deferred("handlers.broadcast", "track_groups"), ChatMemberHandler.MY_CHAT_MEMBER))
+
+    # Botões ⭐ Favoritar / 🔔 Alertar Preço do cartão do produto
+    application.add_handler(CallbackQueryHandler(handler("handlers.price_watch", "watch_button"), pattern=r"^(fav|alert)_\d+_\d+$"))
+    # Cartões anteriores à loja no callback_data (fav_{id} / alert_{id})
+    application.add_handler(CallbackQueryHandler(handler("handlers.price_watch", "legacy_watch_button"), pattern=r"^(fav|alert)_\d+$"))
+
+    # Adiciona handler para os menus
+    application.add_handler(CallbackQueryHandler(handler("handlers.commands", "menu_handler")))
+
+    # Adiciona handler para mensagens com links da Shopee (as demais são descartadas pelo filtro)
+    application.add_handler(MessageHandler(
+        filters.TEXT & ~filters.COMMAND & SHOPEE_LINK,
+        handler("handlers.shopee", "process_message")
+    ))
+
+    # Modo inline (@bot <link>): block=False libera a vaga do update enquanto a consulta
+    # espera o debounce e a API (consultas substituídas desistem sozinhas)
+    application.add_handler(InlineQueryHandler(handler("handlers.inline", "inline_query"), block=False))
+
+    # Adiciona handler de erro global
+    application.add_error_handler(error_handler)
+
+def build_application(builder: Optional[ApplicationBuilder] = None) -> Application:
+    """
+    Monta o Application de produção (persistência, fila, processamento por chat e handlers)
+    Um builder já configurado (token, request) permite rodar a mesma montagem fora do Telegram
+    """
+    # user_data/chat_data/bot_data (configurações, grupos cadastrados) sobrevivem a reinícios
+    persistence = SQLitePersistence()
+    update_processor = ChatUpdateProcessor()
+    if metrics.enabled:
+        metrics.register_gauges("persistence", persistence.stats)
+        metrics.register_gauges("updates", update_processor.stats)
+
+    if builder is None:
+        builder = Application.builder().token(TOKEN)
+        if TELEGRAM_API_URL:
+            builder = builder.base_url(TELEGRAM_API_URL)
+    application = (
+        builder
+        .persistence(persistence)
+        # Fila limitada: com ela cheia, o webhook segura/recusa updates em vez de acumular
+        .update_queue(UpdateQueue())
+        # Chats diferentes em paralelo, cada chat em ordem, menus na frente das buscas
+        .concurrent_updates(update_processor)
+        .post_init(post_init)
+        .post_shutdown(post_shutdown)
+        .build()
+    )
+    register_handlers(application)
+    return application
+
+def main():
+    try:
+        # Instrumentação precisa ser ligada antes de registrar os handlers
+        if METRICS_ENABLED:
+            metrics.enabled = True
+
+        # Inicializa o bot
+        application = build_application()
+        startup.mark("montagem do Application")
 
         # Inicia o bot
-        logger.info("Iniciando o bot...")
-        application.run_polling(drop_pending_updates=True)
+        if WEBHOOK_URL:
+            # aiohttp.web só é importado no modo webhook
+            from services.webhook import run_webhook
+            logger.info("Iniciando o bot (webhook)...")
+            run_webhook(application, WEBHOOK_URL)
+        else:
+            logger.info("Iniciando o bot...")
+            application.run_polling(drop_pending_updates=True)
+
+        # Falha no aquecimento em segundo plano (FAST_START): mesmo fim de uma falha no post_init
+        if startup.error is not None:
+            raise startup.error
 
     except Exception as e:
         logger.error(f"Erro fatal ao iniciar o bot: {e}")
         sys.exit(1)
 
 if __name__ == '__main__':
-    main() 
\ No newline at end of file
+    main()
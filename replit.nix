@@ -1,6 +1,5 @@
 {pkgs}: {
   deps = [
-    pkgs.playwright-driver
     pkgs.gitFull
   ];
 }
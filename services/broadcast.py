@@ -0,0 +1,255 @@
+"""
+Envio da mesma mensagem para muitos chats respeitando os limites do Telegram
+
+Limites aproximados: ~30 mensagens/s no total e ~20 mensagens/min por grupo.
+Os envios passam por uma fila de prioridade; cada chat tem um intervalo mínimo entre
+mensagens e um token bucket global limita a taxa total. RetryAfter pausa todos os envios
+pelo tempo pedido e o envio volta para a fila.
+"""
+import asyncio
+import heapq
+import itertools
+import logging
+import os
+import time
+from datetime import timedelta
+from typing import Callable, Dict, Iterable, List, Optional, Tuple, Union
+from utils.env import load_env
+from telegram.error import BadRequest, Forbidden, NetworkError, RetryAfter
+from services.rate_limit import TokenBucket
+
+# Carrega variáveis de ambiente
+load_env()
+
+logger = logging.getLogger(__name__)
+
+BROADCAST_GLOBAL_RATE = float(os.getenv('BROADCAST_GLOBAL_RATE', '25'))
+BROADCAST_PER_CHAT_INTERVAL = float(os.getenv('BROADCAST_PER_CHAT_INTERVAL', '3.1'))
+BROADCAST_MAX_CONCURRENCY = int(os.getenv('BROADCAST_MAX_CONCURRENCY', '10'))
+BROADCAST_MAX_ATTEMPTS = int(os.getenv('BROADCAST_MAX_ATTEMPTS', '3'))
+
+# Prioridades (menor sai primeiro)
+PRIORITY_HIGH = 0
+PRIORITY_NORMAL = 1
+PRIORITY_LOW = 2
+
+def _seconds(value) -> float:
+    return value.total_seconds() if isinstance(value, timedelta) else float(value)
+
+class Broadcast:
+    """
+    Uma mensagem para vários chats
+    A mensagem é montada uma única vez (method + kwargs) e reaproveitada em todos os envios
+    """
+
+    def __init__(self, broadcast_id: int, targets: List[int], method: Union[str, Callable], kwargs: Dict,
+                 priority: int, on_progress: Optional[Callable[["Broadcast"], None]] = None):
+        self.id = broadcast_id
+        self.targets = targets
+        self.method = method
+        self.kwargs = kwargs
+        self.priority = priority
+        self.on_progress = on_progress
+        self.sent = 0
+        self.failed = 0
+        self.errors: Dict[int, str] = {}
+        self.started_at = time.monotonic()
+        self.finished_at: Optional[float] = None
+        self._done = asyncio.Event()
+        if not targets:
+            self._finish()
+
+    @property
+    def total(self) -> int:
+        return len(self.targets)
+
+    @property
+    def pending(self) -> int:
+        return self.total - self.sent - self.failed
+
+    @property
+    def done(self) -> bool:
+        return self._done.is_set()
+
+    def progress(self) -> Dict:
+        elapsed = (self.finished_at or time.monotonic()) - self.started_at
+        return {
+            "id": self.id,
+            "total": self.total,
+            "sent": self.sent,
+            "failed": self.failed,
+            "pending": self.pending,
+            "elapsed": round(elapsed, 2),
+            "rate": round(self.sent / elapsed, 2) if elapsed > 0 else 0.0,
+        }
+
+    def _record(self, chat_id: int, error: Optional[str] = None) -> None:
+        if error is None:
+            self.sent += 1
+        else:
+            self.failed += 1
+            self.errors[chat_id] = error
+        if self.on_progress is not None:
+            try:
+                self.on_progress(self)
+            except Exception as e:
+                logger.warning("Erro no callback de progresso do envio %s: %s", self.id, e)
+        if self.pending == 0:
+            self._finish()
+
+    def _finish(self) -> None:
+        self.finished_at = time.monotonic()
+        self._done.set()
+
+    async def wait(self) -> "Broadcast":
+        await self._done.wait()
+        return self
+
+class Broadcaster:
+    """Fila de envios com ritmo global e por chat"""
+
+    def __init__(self, global_rate: float = BROADCAST_GLOBAL_RATE,
+                 per_chat_interval: float = BROADCAST_PER_CHAT_INTERVAL,
+                 max_concurrency: int = BROADCAST_MAX_CONCURRENCY,
+                 max_attempts: int = BROADCAST_MAX_ATTEMPTS):
+        self.global_rate = global_rate
+        self.per_chat_interval = per_chat_interval
+        self.max_concurrency = max_concurrency
+        self.max_attempts = max_attempts
+        self.bot = None
+        self._ready: List[Tuple] = []  # (prioridade, seq, broadcast, chat_id, tentativa)
+        self._delayed: List[Tuple] = []  # (liberado_em, seq, prioridade, broadcast, chat_id, tentativa)
+        self._chat_next: Dict[int, float] = {}
+        self._paused_until = 0.0
+        self._seq = itertools.count()
+        self._ids = itertools.count(1)
+        self._wakeup: Optional[asyncio.Event] = None
+        self._task: Optional[asyncio.Task] = None
+        self._bucket: Optional[TokenBucket] = None
+        self._semaphore: Optional[asyncio.Semaphore] = None
+        self._in_flight = set()
+        self.retry_after_count = 0
+        self.broadcasts: Dict[int, Broadcast] = {}
+
+    async def start(self, bot) -> None:
+        self.bot = bot
+        self._wakeup = asyncio.Event()
+        # Sem rajada: ritmo constante, para nenhuma janela de 1s passar do limite global
+        self._bucket = TokenBucket(rate=self.global_rate, capacity=1.0)
+        self._semaphore = asyncio.Semaphore(self.max_concurrency)
+        self._task = asyncio.create_task(self._run())
+
+    async def stop(self) -> None:
+        if self._task is not None:
+            self._task.cancel()
+            try:
+                await self._task
+            except asyncio.CancelledError:
+                pass
+            self._task = None
+        if self._in_flight:
+            await asyncio.gather(*self._in_flight, return_exceptions=True)
+
+    def submit(self, targets: Iterable[int], method: Union[str, Callable] = "send_message", priority: int = PRIORITY_NORMAL,
+               on_progress: Optional[Callable[[Broadcast], None]] = None, **kwargs) -> Broadcast:
+        """
+        Enfileira uma mensagem para vários chats (chats repetidos são enviados uma vez)
+        method é o método do Bot usado (send_message, copy_message, send_photo...) e kwargs seus argumentos;
+        também pode ser uma função async chamada como method(bot, chat_id=..., **kwargs)
+        """
+        targets = list(dict.fromkeys(targets))
+        # Mantém só os envios em andamento (quem precisa do resultado guarda o Broadcast)
+        for finished in [b_id for b_id, b in self.broadcasts.items() if b.done]:
+            del self.broadcasts[finished]
+        broadcast = Broadcast(next(self._ids), targets, method, kwargs, priority, on_progress)
+        self.broadcasts[broadcast.id] = broadcast
+        for chat_id in targets:
+            heapq.heappush(self._ready, (priority, next(self._seq), broadcast, chat_id, 1))
+        if self._wakeup is not None:
+            self._wakeup.set()
+        return broadcast
+
+    def status(self) -> Dict:
+        return {
+            "queued": len(self._ready) + len(self._delayed),
+            "in_flight": len(self._in_flight),
+            "paused_for": round(max(0.0, self._paused_until - time.monotonic()), 1),
+            "retry_after": self.retry_after_count,
+            "active_broadcasts": sum(1 for b in self.broadcasts.values() if not b.done),
+        }
+
+    def _delay(self, ready_at: float, priority: int, broadcast: Broadcast, chat_id: int, attempt: int) -> None:
+        heapq.heappush(self._delayed, (ready_at, next(self._seq), priority, broadcast, chat_id, attempt))
+
+    async def _run(self) -> None:
+        while True:
+            now = time.monotonic()
+            while self._delayed and self._delayed[0][0] <= now:
+                _, seq, priority, broadcast, chat_id, attempt = heapq.heappop(self._delayed)
+                heapq.heappush(self._ready, (priority, seq, broadcast, chat_id, attempt))
+
+            if self._paused_until > now:
+                await asyncio.sleep(self._paused_until - now)
+                continue
+
+            if not self._ready:
+                self._wakeup.clear()
+                timeout = self._delayed[0][0] - now if self._delayed else None
+                try:
+                    await asyncio.wait_for(self._wakeup.wait(), timeout=timeout)
+                except asyncio.TimeoutError:
+                    pass
+                continue
+
+            priority, _, broadcast, chat_id, attempt = heapq.heappop(self._ready)
+            next_allowed = self._chat_next.get(chat_id, 0.0)
+            if next_allowed > now:
+                # Chat ainda no intervalo mínimo: volta para a fila quando liberar
+                self._delay(next_allowed, priority, broadcast, chat_id, attempt)
+                continue
+
+            await self._bucket.acquire()
+            await self._semaphore.acquire()
+            if self._paused_until > time.monotonic():
+                # Chegou um RetryAfter enquanto aguardava a vez
+                self._semaphore.release()
+                self._delay(self._paused_until, priority, broadcast, chat_id, attempt)
+                continue
+            self._chat_next[chat_id] = time.monotonic() + self.per_chat_interval
+            task = asyncio.create_task(self._send(broadcast, chat_id, attempt))
+            self._in_flight.add(task)
+            task.add_done_callback(self._in_flight.discard)
+
+    async def _send(self, broadcast: Broadcast, chat_id: int, attempt: int) -> None:
+        try:
+            if callable(broadcast.method):
+                await broadcast.method(self.bot, chat_id=chat_id, **broadcast.kwargs)
+            else:
+                await getattr(self.bot, broadcast.method)(chat_id=chat_id, **broadcast.kwargs)
+        except RetryAfter as e:
+            # O Telegram pediu uma pausa: vale para todos os envios do bot
+            wait = _seconds(e.retry_after)
+            self.retry_after_count += 1
+            self._paused_until = max(self._paused_until, time.monotonic() + wait)
+            logger.warning("RetryAfter de %.1fs ao enviar para %s", wait, chat_id)
+            self._delay(self._paused_until, broadcast.priority, broadcast, chat_id, attempt)
+            self._wakeup.set()
+        except (Forbidden, BadRequest) as e:
+            # Bot removido do grupo, chat inexistente etc.: não adianta tentar de novo
+            broadcast._record(chat_id, str(e))
+        except NetworkError as e:
+            if attempt < self.max_attempts:
+                self._delay(time.monotonic() + 2 ** attempt, broadcast.priority, broadcast, chat_id, attempt + 1)
+                self._wakeup.set()
+            else:
+                broadcast._record(chat_id, str(e))
+        except Exception as e:
+            logger.error("Erro ao enviar para %s: %s", chat_id, e)
+            broadcast._record(chat_id, str(e))
+        else:
+            broadcast._record(chat_id)
+        finally:
+            self._semaphore.release()
+
+# Fila de envios usada pelo bot (iniciada no post_init)
+broadcaster = Broadcaster()
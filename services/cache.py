@@ -0,0 +1,73 @@
+import time
+from collections import OrderedDict
+from typing import Any, Dict, Hashable, Optional, Tuple
+
+# Estados possíveis de uma entrada consultada no cache
+FRESH = "fresh"
+STALE = "stale"
+
+class TTLCache:
+    """
+    Cache em memória com limite de tamanho, despejo LRU e TTL
+    Entradas vencidas continuam disponíveis como "stale" até stale_ttl,
+    permitindo responder na hora enquanto uma atualização roda em segundo plano
+    """
+
+    def __init__(self, maxsize: int = 1000, ttl: float = 300, stale_ttl: float = 3600):
+        self.maxsize = maxsize
+        self.ttl = ttl
+        self.stale_ttl = max(stale_ttl, ttl)
+        self._data: "OrderedDict[Hashable, Tuple[float, Any]]" = OrderedDict()
+        self.hits = 0
+        self.stale_hits = 0
+        self.misses = 0
+        self.evictions = 0
+
+    def __len__(self) -> int:
+        return len(self._data)
+
+    def get(self, key: Hashable) -> Tuple[Optional[Any], Optional[str]]:
+        """Retorna (valor, estado) onde estado é FRESH, STALE ou None (miss)"""
+        entry = self._data.get(key)
+        if entry is None:
+            self.misses += 1
+            return None, None
+
+        stored_at, value = entry
+        age = time.monotonic() - stored_at
+        if age > self.stale_ttl:
+            del self._data[key]
+            self.misses += 1
+            return None, None
+
+        self._data.move_to_end(key)
+        if age > self.ttl:
+            self.stale_hits += 1
+            return value, STALE
+        self.hits += 1
+        return value, FRESH
+
+    def set(self, key: Hashable, value: Any) -> None:
+        """Armazena um valor, despejando o menos usado se o cache estiver cheio"""
+        self._data[key] = (time.monotonic(), value)
+        self._data.move_to_end(key)
+        while len(self._data) > self.maxsize:
+            self._data.popitem(last=False)
+            self.evictions += 1
+
+    def invalidate(self, key: Hashable) -> None:
+        self._data.pop(key, None)
+
+    def clear(self) -> None:
+        self._data.clear()
+
+    def stats(self) -> Dict[str, int]:
+        """Contadores para ajuste de tamanho e TTL"""
+        return {
+            "size": len(self._data),
+            "maxsize": self.maxsize,
+            "hits": self.hits,
+            "stale_hits": self.stale_hits,
+            "misses": self.misses,
+            "evictions": self.evictions,
+        }
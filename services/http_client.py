@@ -0,0 +1,74 @@
+import asyncio
+import logging
+import os
+from utils.env import load_env
+from typing import Iterable, Optional
+import aiohttp
+
+# Carrega variáveis de ambiente
+load_env()
+
+logger = logging.getLogger(__name__)
+
+# Configurações do pool de conexões HTTP
+HTTP_TIMEOUT = float(os.getenv('HTTP_TIMEOUT', '15'))
+HTTP_CONNECT_TIMEOUT = float(os.getenv('HTTP_CONNECT_TIMEOUT', '5'))
+HTTP_POOL_LIMIT = int(os.getenv('HTTP_POOL_LIMIT', '100'))
+HTTP_POOL_LIMIT_PER_HOST = int(os.getenv('HTTP_POOL_LIMIT_PER_HOST', '20'))
+HTTP_KEEPALIVE_TIMEOUT = float(os.getenv('HTTP_KEEPALIVE_TIMEOUT', '30'))
+HTTP_DNS_TTL = int(os.getenv('HTTP_DNS_TTL', '300'))
+
+_session: Optional[aiohttp.ClientSession] = None
+
+def create_session() -> aiohttp.ClientSession:
+    """Cria uma sessão HTTP com keep-alive, pool limitado por host e cache de DNS"""
+    connector = aiohttp.TCPConnector(
+        limit=HTTP_POOL_LIMIT,
+        limit_per_host=HTTP_POOL_LIMIT_PER_HOST,
+        keepalive_timeout=HTTP_KEEPALIVE_TIMEOUT,
+        ttl_dns_cache=HTTP_DNS_TTL,
+        use_dns_cache=True
+    )
+    timeout = aiohttp.ClientTimeout(total=HTTP_TIMEOUT, connect=HTTP_CONNECT_TIMEOUT)
+    return aiohttp.ClientSession(connector=connector, timeout=timeout)
+
+def get_http_session() -> aiohttp.ClientSession:
+    """
+    Retorna a sessão HTTP compartilhada
+    Se o bot não a criou no post_init (ex: scripts avulsos), cria sob demanda
+    """
+    global _session
+    if _session is None or _session.closed:
+        _session = create_session()
+    return _session
+
+async def init_http_session(application=None) -> None:
+    """Cria a sessão compartilhada (usado no post_init do Application)"""
+    get_http_session()
+
+async def warm_up_connections(urls: Iterable[str]) -> int:
+    """
+    Abre uma conexão com o host de cada URL (DNS, TCP e TLS) antes da primeira chamada de verdade
+    A conexão volta para o pool (keep-alive); retorna quantas abriram
+    """
+    session = get_http_session()
+    timeout = aiohttp.ClientTimeout(total=2 * HTTP_CONNECT_TIMEOUT)
+
+    async def connect(url: str) -> bool:
+        try:
+            # HEAD: a resposta (mesmo um 404/405) não tem corpo e a conexão fica livre para reuso
+            async with session.head(url, allow_redirects=False, timeout=timeout) as response:
+                await response.read()
+            return True
+        except (aiohttp.ClientError, asyncio.TimeoutError) as e:
+            logger.debug("Conexão antecipada com %s falhou: %r", url, e)
+            return False
+
+    return sum(await asyncio.gather(*(connect(url) for url in urls)))
+
+async def close_http_session(application=None) -> None:
+    """Fecha a sessão compartilhada (usado no post_shutdown do Application)"""
+    global _session
+    if _session is not None and not _session.closed:
+        await _session.close()
+    _session = None
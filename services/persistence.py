@@ -0,0 +1,235 @@
+"""
+Persistência do PTB (user_data, chat_data, bot_data, conversas) em SQLite
+
+Cada usuário, chat e chave do bot_data é uma linha própria: uma gravação só escreve o
+que mudou, em vez de regravar um arquivo inteiro como o PicklePersistence. As alterações
+ficam num buffer (a última versão de cada chave vence) e vão para o banco numa única
+transação. user_data/chat_data são carregados sob demanda, no primeiro update de cada
+usuário/chat, então a inicialização não depende do tamanho do banco.
+"""
+import asyncio
+import json
+import logging
+import os
+import pickle
+import sqlite3
+from typing import Dict, Optional, Tuple
+from utils.env import load_env
+from telegram.ext import BasePersistence, PersistenceInput
+
+# Carrega variáveis de ambiente
+load_env()
+
+logger = logging.getLogger(__name__)
+
+DATA_DIR = os.getenv('DATA_DIR', 'data')
+PERSISTENCE_DB = os.getenv('PERSISTENCE_DB', os.path.join(DATA_DIR, 'persistence.sqlite3'))
+# Intervalo entre as coletas de dados alterados feitas pelo PTB
+PERSISTENCE_UPDATE_INTERVAL = float(os.getenv('PERSISTENCE_UPDATE_INTERVAL', '30'))
+# Espera antes de gravar, para juntar todas as alterações de uma coleta numa transação
+PERSISTENCE_WRITE_DELAY = float(os.getenv('PERSISTENCE_WRITE_DELAY', '1'))
+
+USER_DATA = "user_data"
+CHAT_DATA = "chat_data"
+BOT_DATA = "bot_data"
+
+# Marca de remoção no buffer de gravação
+_DELETED = object()
+
+class SQLitePersistence(BasePersistence):
+    """BasePersistence com uma linha por chave e gravação em lote"""
+
+    def __init__(self, path: str = PERSISTENCE_DB, store_data: Optional[PersistenceInput] = None,
+                 update_interval: float = PERSISTENCE_UPDATE_INTERVAL,
+                 write_delay: float = PERSISTENCE_WRITE_DELAY):
+        super().__init__(store_data=store_data, update_interval=update_interval)
+        self.path = path
+        self.write_delay = write_delay
+        self._conn: Optional[sqlite3.Connection] = None
+        # (tabela, chave) -> objeto a gravar (ou _DELETED)
+        self._dirty: Dict[Tuple[str, object], object] = {}
+        self._loaded = {USER_DATA: set(), CHAT_DATA: set()}
+        # Última versão gravada de cada chave do bot_data, para gravar só as que mudaram
+        self._bot_data_written: Dict[object, bytes] = {}
+        self._write_task: Optional[asyncio.Task] = None
+        self.writes = 0
+        self.rows_written = 0
+
+    def _connect(self) -> sqlite3.Connection:
+        if self._conn is None:
+            if self.path != ':memory:':
+                os.makedirs(os.path.dirname(self.path) or '.', exist_ok=True)
+            self._conn = sqlite3.connect(self.path)
+            self._conn.execute("PRAGMA journal_mode=WAL")
+            self._conn.execute("PRAGMA synchronous=NORMAL")
+            self._conn.execute("CREATE TABLE IF NOT EXISTS user_data (id INTEGER PRIMARY KEY, data BLOB NOT NULL)")
+            self._conn.execute("CREATE TABLE IF NOT EXISTS chat_data (id INTEGER PRIMARY KEY, data BLOB NOT NULL)")
+            self._conn.execute("CREATE TABLE IF NOT EXISTS bot_data (key BLOB PRIMARY KEY, data BLOB NOT NULL)")
+            self._conn.execute(
+                "CREATE TABLE IF NOT EXISTS conversations ("
+                " name TEXT NOT NULL, key TEXT NOT NULL, state BLOB NOT NULL, PRIMARY KEY (name, key))"
+            )
+            self._conn.execute("CREATE TABLE IF NOT EXISTS callback_data (id INTEGER PRIMARY KEY, data BLOB NOT NULL)")
+            self._conn.commit()
+        return self._conn
+
+    def _mark(self, table: str, key, value) -> None:
+        """Coloca uma alteração no buffer e agenda a gravação em lote"""
+        self._dirty[(table, key)] = value
+        if self._write_task is None or self._write_task.done():
+            self._write_task = asyncio.create_task(self._write_later())
+
+    async def _write_later(self) -> None:
+        await asyncio.sleep(self.write_delay)
+        try:
+            self.write_pending()
+        except Exception as e:
+            logger.error("Erro ao gravar persistência: %s", e)
+
+    def write_pending(self) -> int:
+        """Grava todas as alterações do buffer numa única transação e retorna quantas foram"""
+        if not self._dirty:
+            return 0
+        dirty, self._dirty = self._dirty, {}
+        upserts: Dict[str, list] = {}
+        deletes: Dict[str, list] = {}
+        for (table, key), value in dirty.items():
+            if value is _DELETED:
+                deletes.setdefault(table, []).append((key,))
+            else:
+                upserts.setdefault(table, []).append((key, value))
+
+        conn = self._connect()
+        with conn:
+            for table, rows in upserts.items():
+                if table == "conversations":
+                    conn.executemany(
+                        "INSERT OR REPLACE INTO conversations (name, key, state) VALUES (?, ?, ?)",
+                        [(name, key, pickle.dumps(state)) for (name, key), state in rows]
+                    )
+                elif table == BOT_DATA:
+                    # Já serializado em update_bot_data
+                    conn.executemany("INSERT OR REPLACE INTO bot_data (key, data) VALUES (?, ?)", rows)
+                else:
+                    conn.executemany(
+                        f"INSERT OR REPLACE INTO {table} (id, data) VALUES (?, ?)",
+                        [(key, pickle.dumps(data)) for key, data in rows]
+                    )
+            for table, keys in deletes.items():
+                if table == "conversations":
+                    conn.executemany("DELETE FROM conversations WHERE name = ? AND key = ?", [key for key, in keys])
+                elif table == BOT_DATA:
+                    conn.executemany("DELETE FROM bot_data WHERE key = ?", keys)
+                else:
+                    conn.executemany(f"DELETE FROM {table} WHERE id = ?", keys)
+        self.writes += 1
+        self.rows_written += len(dirty)
+        return len(dirty)
+
+    def _load(self, table: str, key: int) -> Optional[Dict]:
+        pending = self._dirty.get((table, key))
+        if pending is not None:
+            return None if pending is _DELETED else pending
+        row = self._connect().execute(f"SELECT data FROM {table} WHERE id = ?", (key,)).fetchone()
+        return pickle.loads(row[0]) if row else None
+
+    async def get_user_data(self) -> Dict[int, Dict]:
+        # Carregados sob demanda em refresh_user_data
+        return {}
+
+    async def get_chat_data(self) -> Dict[int, Dict]:
+        # Carregados sob demanda em refresh_chat_data
+        return {}
+
+    async def get_bot_data(self) -> Dict:
+        rows = self._connect().execute("SELECT key, data FROM bot_data").fetchall()
+        self._bot_data_written = {pickle.loads(key): data for key, data in rows}
+        return {key: pickle.loads(data) for key, data in self._bot_data_written.items()}
+
+    async def get_callback_data(self):
+        row = self._connect().execute("SELECT data FROM callback_data WHERE id = 0").fetchone()
+        return pickle.loads(row[0]) if row else None
+
+    async def get_conversations(self, name: str) -> Dict:
+        rows = self._connect().execute("SELECT key, state FROM conversations WHERE name = ?", (name,)).fetchall()
+        return {tuple(json.loads(key)): pickle.loads(state) for key, state in rows}
+
+    async def update_conversation(self, name: str, key, new_state) -> None:
+        db_key = (name, json.dumps(list(key)))
+        self._mark("conversations", db_key, _DELETED if new_state is None else new_state)
+
+    async def update_user_data(self, user_id: int, data: Dict) -> None:
+        self._merge_unloaded(USER_DATA, user_id, data)
+        self._mark(USER_DATA, user_id, data)
+
+    async def update_chat_data(self, chat_id: int, data: Dict) -> None:
+        self._merge_unloaded(CHAT_DATA, chat_id, data)
+        self._mark(CHAT_DATA, chat_id, data)
+
+    def _merge_unloaded(self, table: str, key: int, data: Dict) -> None:
+        """Dados alterados sem passar por um update (ex: job) ainda não foram carregados: completa com o banco"""
+        if key in self._loaded[table]:
+            return
+        stored = self._load(table, key)
+        if stored:
+            for name, value in stored.items():
+                data.setdefault(name, value)
+
+    async def update_bot_data(self, data: Dict) -> None:
+        # O PTB entrega o bot_data inteiro a cada coleta: grava só as chaves que mudaram
+        for key, value in data.items():
+            serialized = pickle.dumps(value)
+            if self._bot_data_written.get(key) != serialized:
+                self._bot_data_written[key] = serialized
+                self._mark(BOT_DATA, pickle.dumps(key), serialized)
+        for key in [key for key in self._bot_data_written if key not in data]:
+            del self._bot_data_written[key]
+            self._mark(BOT_DATA, pickle.dumps(key), _DELETED)
+
+    async def update_callback_data(self, data) -> None:
+        self._mark("callback_data", 0, data)
+
+    async def drop_user_data(self, user_id: int) -> None:
+        self._loaded[USER_DATA].discard(user_id)
+        self._mark(USER_DATA, user_id, _DELETED)
+
+    async def drop_chat_data(self, chat_id: int) -> None:
+        self._loaded[CHAT_DATA].discard(chat_id)
+        self._mark(CHAT_DATA, chat_id, _DELETED)
+
+    async def refresh_user_data(self, user_id: int, user_data: Dict) -> None:
+        # Primeiro update do usuário desde a inicialização: carrega do banco
+        if user_id not in self._loaded[USER_DATA]:
+            self._loaded[USER_DATA].add(user_id)
+            stored = self._load(USER_DATA, user_id)
+            if stored:
+                user_data.update(stored)
+
+    async def refresh_chat_data(self, chat_id: int, chat_data: Dict) -> None:
+        if chat_id not in self._loaded[CHAT_DATA]:
+            self._loaded[CHAT_DATA].add(chat_id)
+            stored = self._load(CHAT_DATA, chat_id)
+            if stored:
+                chat_data.update(stored)
+
+    async def refresh_bot_data(self, bot_data: Dict) -> None:
+        # bot_data é carregado inteiro na inicialização e só este processo o altera
+        pass
+
+    async def flush(self) -> None:
+        """Chamado pelo PTB ao encerrar: grava o que estiver pendente e fecha o banco"""
+        if self._write_task is not None and not self._write_task.done():
+            self._write_task.cancel()
+        self.write_pending()
+        if self._conn is not None:
+            self._conn.close()
+            self._conn = None
+
+    def stats(self) -> Dict[str, int]:
+        return {
+            "pending": len(self._dirty),
+            "writes": self.writes,
+            "rows_written": self.rows_written,
+            "loaded_users": len(self._loaded[USER_DATA]),
+            "loaded_chats": len(self._loaded[CHAT_DATA]),
+        }
@@ -0,0 +1,419 @@
+"""
+Histórico de preços dos produtos consultados, em arquivos colunares mapeados em memória
+
+Cada consulta à API registra o preço (e o preço "de", quando veio) do produto. As amostras
+ficam em blocos de tamanho fixo, um produto por bloco, em três colunas de inteiros de 32 bits
+(times.bin, prices.bin em centavos, original.bin em centavos); index.bin tem um cabeçalho por
+bloco (produto, bloco anterior, quantidade, primeiro/último horário, menor/maior preço). Os
+blocos de um produto formam uma lista encadeada do mais novo para o mais velho, então as
+consultas dos últimos dias leem só os blocos finais, e o menor/maior preço de um bloco
+inteiro sai do cabeçalho, sem ler as amostras.
+
+Os arquivos são mapeados com mmap: só as páginas lidas ocupam memória, e o sistema as
+descarta quando precisa. Na memória do processo fica apenas produto -> último bloco.
+
+Preço repetido só é gravado de novo depois de PRICE_HISTORY_MIN_GAP segundos. A compactação
+periódica reescreve o histórico com os blocos de cada produto contíguos, descarta o que
+passou de PRICE_HISTORY_RETENTION_DAYS e reduz amostras mais velhas que PRICE_HISTORY_RAW_DAYS
+ao menor e ao maior preço de cada período de PRICE_HISTORY_BUCKET segundos.
+"""
+import asyncio
+import logging
+import mmap
+import os
+import shutil
+import struct
+import time
+from array import array
+from bisect import bisect_left, bisect_right
+from typing import Dict, Iterator, List, Optional, Tuple
+from utils.env import load_env
+
+# Carrega variáveis de ambiente
+load_env()
+
+logger = logging.getLogger(__name__)
+
+DATA_DIR = os.getenv('DATA_DIR', 'data')
+PRICE_HISTORY_DIR = os.getenv('PRICE_HISTORY_DIR', os.path.join(DATA_DIR, 'price_history'))
+# Amostras por bloco
+PRICE_HISTORY_BLOCK = int(os.getenv('PRICE_HISTORY_BLOCK', '32'))
+# Intervalo mínimo entre duas amostras iguais do mesmo produto
+PRICE_HISTORY_MIN_GAP = float(os.getenv('PRICE_HISTORY_MIN_GAP', '3600'))
+# Amostras mais novas que isso ficam intactas na compactação
+PRICE_HISTORY_RAW_DAYS = float(os.getenv('PRICE_HISTORY_RAW_DAYS', '7'))
+# Período das amostras reduzidas (menor e maior preço de cada um)
+PRICE_HISTORY_BUCKET = int(os.getenv('PRICE_HISTORY_BUCKET', '86400'))
+PRICE_HISTORY_RETENTION_DAYS = float(os.getenv('PRICE_HISTORY_RETENTION_DAYS', '365'))
+PRICE_HISTORY_COMPACT_INTERVAL = float(os.getenv('PRICE_HISTORY_COMPACT_INTERVAL', '86400'))
+
+# Cabeçalho de bloco: shop_id, item_id, bloco anterior, quantidade, primeiro e último
+# horário, menor e maior preço
+HEADER = struct.Struct("<qqIIIIII")
+NO_BLOCK = 0xFFFFFFFF
+COLUMNS = ("times.bin", "prices.bin", "original.bin")
+INDEX_FILE = "index.bin"
+# Blocos acrescentados de uma vez quando os arquivos enchem
+GROW_BLOCKS = 1024
+
+Sample = Tuple[int, float, float]
+
+def _cents(value: float) -> int:
+    return max(0, min(NO_BLOCK, round(value * 100)))
+
+class PriceHistory:
+    """Séries de preço por produto (append-only) com consultas por período"""
+
+    def __init__(self, path: str = PRICE_HISTORY_DIR, block_size: int = PRICE_HISTORY_BLOCK,
+                 min_gap: float = PRICE_HISTORY_MIN_GAP, raw_days: float = PRICE_HISTORY_RAW_DAYS,
+                 bucket: int = PRICE_HISTORY_BUCKET, retention_days: float = PRICE_HISTORY_RETENTION_DAYS):
+        self.path = path
+        self.block_size = block_size
+        self.min_gap = min_gap
+        self.raw_days = raw_days
+        self.bucket = bucket
+        self.retention_days = retention_days
+        self._files = []
+        self._maps: List[mmap.mmap] = []
+        self._columns: List[memoryview] = []
+        self._index: Optional[mmap.mmap] = None
+        # (shop_id, item_id) -> último bloco do produto
+        self._last: Dict[Tuple[int, int], int] = {}
+        self.blocks = 0
+        self.capacity = 0
+        self.samples = 0
+        # Amostras recebidas durante a compactação (gravadas depois da troca dos arquivos)
+        self._pending: Optional[List[Tuple[int, int, int, float, Optional[float]]]] = None
+        self._task: Optional[asyncio.Task] = None
+        self.skipped = 0
+        self.compactions = 0
+
+    # Arquivos
+
+    def _open(self) -> None:
+        if self._index is not None:
+            return
+        self._recover()
+        os.makedirs(self.path, exist_ok=True)
+        names = COLUMNS + (INDEX_FILE,)
+        self._files = [open(os.path.join(self.path, name), "a+b") for name in names]
+        size = os.fstat(self._files[-1].fileno()).st_size
+        self.capacity = size // HEADER.size
+        self._map_files()
+
+        # Blocos são usados em ordem: o primeiro cabeçalho vazio marca o fim
+        self._last.clear()
+        self.blocks = self.samples = 0
+        for block in range(self.capacity):
+            shop_id, item_id, _, count, *_ = HEADER.unpack_from(self._index, block * HEADER.size)
+            if count == 0:
+                break
+            self._last[(shop_id, item_id)] = block
+            self.blocks += 1
+            self.samples += count
+
+    def _recover(self) -> None:
+        """Termina (ou descarta) uma troca de arquivos interrompida da compactação"""
+        compacted, old = self.path + ".compact", self.path + ".old"
+        if os.path.isdir(compacted):
+            if os.path.isdir(self.path):
+                # Compactação incompleta: o histórico atual ainda vale
+                shutil.rmtree(compacted)
+            else:
+                os.rename(compacted, self.path)
+        if os.path.isdir(old):
+            shutil.rmtree(old)
+
+    def _map_files(self) -> None:
+        self._maps = []
+        for file, item_size in zip(self._files, (4, 4, 4, HEADER.size)):
+            size = self.capacity * self.block_size * item_size if item_size == 4 else self.capacity * item_size
+            os.ftruncate(file.fileno(), size)
+            self._maps.append(mmap.mmap(file.fileno(), size) if size else None)
+        self._columns = [memoryview(m).cast("I") if m is not None else None for m in self._maps[:3]]
+        self._index = self._maps[3] if self._maps[3] is not None else bytearray()
+
+    def _unmap_files(self) -> None:
+        for column in self._columns:
+            if column is not None:
+                column.release()
+        for m in self._maps:
+            if m is not None:
+                m.close()
+        self._columns, self._maps = [], []
+        self._index = None
+
+    def _grow(self) -> None:
+        self._unmap_files()
+        self.capacity += max(GROW_BLOCKS, self.capacity // 2)
+        self._map_files()
+
+    def flush(self) -> None:
+        for m in self._maps:
+            if m is not None:
+                m.flush()
+
+    def close(self) -> None:
+        if self._index is None:
+            return
+        self.flush()
+        self._unmap_files()
+        for file in self._files:
+            file.close()
+        self._files = []
+
+    # Gravação
+
+    def record(self, shop_id: int, item_id: int, price: float, original_price: Optional[float] = None,
+               now: Optional[float] = None) -> bool:
+        """
+        Registra o preço atual do produto (False se foi descartado como repetido ou fora de ordem)
+        original_price None: consulta sem o preço "de" (vale o da amostra anterior, ou 0)
+        """
+        now = time.time() if now is None else now
+        if self._pending is not None:
+            self._pending.append((shop_id, item_id, int(now), price, original_price))
+            return True
+        self._open()
+        original = None if original_price is None else _cents(original_price)
+        return self._append((shop_id, item_id), int(now), _cents(price), original)
+
+    def _append(self, key: Tuple[int, int], timestamp: int, price: int, original: Optional[int]) -> bool:
+        times, prices, originals = self._columns if self._columns else (None, None, None)
+        last = self._last.get(key)
+        if last is None and original is None:
+            original = 0
+        if last is not None:
+            shop_id, item_id, previous, count, first, latest, low, high = HEADER.unpack_from(
+                self._index, last * HEADER.size)
+            slot = last * self.block_size + count - 1
+            if original is None:
+                original = originals[slot]
+            if timestamp < latest or (
+                prices[slot] == price and originals[slot] == original and timestamp - latest < self.min_gap
+            ):
+                self.skipped += 1
+                return False
+            if count < self.block_size:
+                times[slot + 1], prices[slot + 1], originals[slot + 1] = timestamp, price, original
+                HEADER.pack_into(self._index, last * HEADER.size, shop_id, item_id, previous, count + 1,
+                                 first, timestamp, min(low, price), max(high, price))
+                self.samples += 1
+                return True
+
+        if self.blocks >= self.capacity:
+            self._grow()
+            times, prices, originals = self._columns
+        block = self.blocks
+        slot = block * self.block_size
+        # Amostra antes do cabeçalho: um bloco só passa a existir com count > 0
+        times[slot], prices[slot], originals[slot] = timestamp, price, original
+        HEADER.pack_into(self._index, block * HEADER.size, key[0], key[1],
+                         NO_BLOCK if last is None else last, 1, timestamp, timestamp, price, price)
+        self._last[key] = block
+        self.blocks += 1
+        self.samples += 1
+        return True
+
+    # Consultas
+
+    def _chain(self, key: Tuple[int, int], start: int) -> Iterator[Tuple[int, int, int, int, int, int]]:
+        """Blocos do produto do mais novo ao mais velho, até o primeiro que termina antes de start"""
+        block = self._last.get(key, NO_BLOCK)
+        while block != NO_BLOCK:
+            _, _, previous, count, first, latest, low, high = HEADER.unpack_from(self._index, block * HEADER.size)
+            if latest < start:
+                return
+            yield block, count, first, latest, low, high
+            block = previous
+
+    def _slice(self, block: int, count: int, start: int, end: int) -> Tuple[int, int]:
+        """Posições [de, até) das amostras do bloco dentro de [start, end]"""
+        base = block * self.block_size
+        times = self._columns[0][base:base + count]
+        return base + bisect_left(times, start), base + bisect_right(times, end)
+
+    def history(self, shop_id: int, item_id: int, start: float = 0, end: Optional[float] = None) -> List[Sample]:
+        """Amostras (horário, preço, preço "de") do produto entre start e end, em ordem"""
+        self._open()
+        end = NO_BLOCK if end is None else int(end)
+        times, prices, originals = self._columns if self._columns else (None, None, None)
+        samples = []
+        for block, count, first, latest, _, _ in self._chain((shop_id, item_id), int(start)):
+            if first > end:
+                continue
+            begin, stop = self._slice(block, count, int(start), end)
+            samples.extend(
+                (times[n], prices[n] / 100, originals[n] / 100) for n in range(stop - 1, begin - 1, -1)
+            )
+        samples.reverse()
+        return samples
+
+    def price_range(self, shop_id: int, item_id: int, start: float = 0,
+                    end: Optional[float] = None) -> Optional[Tuple[float, float, int]]:
+        """(menor preço, maior preço, horário da amostra mais velha) entre start e end; None sem amostras"""
+        self._open()
+        start, end = int(start), NO_BLOCK if end is None else int(end)
+        low = high = oldest = None
+        for block, count, first, latest, block_low, block_high in self._chain((shop_id, item_id), start):
+            if first > end:
+                continue
+            if start <= first and latest <= end:
+                # Bloco inteiro no período: o cabeçalho basta
+                block_oldest = first
+            else:
+                begin, stop = self._slice(block, count, start, end)
+                if begin == stop:
+                    continue
+                prices = self._columns[1][begin:stop]
+                block_low, block_high = min(prices), max(prices)
+                block_oldest = self._columns[0][begin]
+            low = block_low if low is None else min(low, block_low)
+            high = block_high if high is None else max(high, block_high)
+            oldest = block_oldest
+        if low is None:
+            return None
+        return low / 100, high / 100, oldest
+
+    def lowest_price(self, shop_id: int, item_id: int, days: float = 30,
+                     now: Optional[float] = None) -> Optional[Tuple[float, int]]:
+        """Menor preço dos últimos `days` dias e o horário da amostra mais velha considerada"""
+        now = time.time() if now is None else now
+        found = self.price_range(shop_id, item_id, now - days * 86400)
+        return (found[0], found[2]) if found else None
+
+    # Compactação
+
+    def _reduce(self, times: array, prices: array, raw_start: int) -> List[int]:
+        """Posições mantidas: as recentes todas; das velhas, o menor e o maior preço de cada período"""
+        keep = []
+        recent = bisect_left(times, raw_start)
+        n = 0
+        while n < recent:
+            bucket = times[n] // self.bucket
+            low = high = n
+            n += 1
+            while n < recent and times[n] // self.bucket == bucket:
+                if prices[n] < prices[low]:
+                    low = n
+                elif prices[n] > prices[high]:
+                    high = n
+                n += 1
+            keep.extend(sorted({low, high}))
+        keep.extend(range(recent, len(times)))
+        return keep
+
+    def _write_compacted(self, target: str, now: float) -> Tuple[int, int]:
+        """Grava em target o histórico compactado (roda numa thread; o atual não muda enquanto isso)"""
+        os.makedirs(target)
+        keep_start = int(now - self.retention_days * 86400)
+        raw_start = int(now - self.raw_days * 86400)
+        size = self.block_size
+        outputs = [open(os.path.join(target, name), "wb") for name in COLUMNS + (INDEX_FILE,)]
+        blocks = samples = 0
+        try:
+            for key, last in self._last.items():
+                chain = list(self._chain(key, keep_start))
+                chain.reverse()
+                times, prices, originals = array("I"), array("I"), array("I")
+                for block, count, *_ in chain:
+                    begin, stop = self._slice(block, count, keep_start, NO_BLOCK)
+                    times.frombytes(self._columns[0][begin:stop].cast("B"))
+                    prices.frombytes(self._columns[1][begin:stop].cast("B"))
+                    originals.frombytes(self._columns[2][begin:stop].cast("B"))
+                keep = self._reduce(times, prices, raw_start)
+                if not keep:
+                    continue
+                previous = NO_BLOCK
+                headers = bytearray()
+                columns = (array("I"), array("I"), array("I"))
+                for offset in range(0, len(keep), size):
+                    chunk = keep[offset:offset + size]
+                    chunk_prices = [prices[n] for n in chunk]
+                    for column, source in zip(columns, (times, prices, originals)):
+                        column.extend(source[n] for n in chunk)
+                        column.extend([0] * (size - len(chunk)))
+                    headers += HEADER.pack(key[0], key[1], previous, len(chunk), times[chunk[0]],
+                                           times[chunk[-1]], min(chunk_prices), max(chunk_prices))
+                    previous = blocks
+                    blocks += 1
+                samples += len(keep)
+                for output, column in zip(outputs, columns):
+                    column.tofile(output)
+                outputs[3].write(headers)
+            for output in outputs:
+                output.flush()
+                os.fsync(output.fileno())
+        finally:
+            for output in outputs:
+                output.close()
+        return blocks, samples
+
+    async def compact(self, now: Optional[float] = None) -> Dict[str, int]:
+        """
+        Reescreve o histórico compactado e troca os arquivos
+        Amostras recebidas enquanto isso ficam guardadas e entram depois da troca
+        """
+        now = time.time() if now is None else now
+        self._open()
+        before = self.samples
+        target = self.path + ".compact"
+        if os.path.isdir(target):
+            shutil.rmtree(target)
+        self._pending = []
+        try:
+            blocks, samples = await asyncio.to_thread(self._write_compacted, target, now)
+            self.close()
+            os.rename(self.path, self.path + ".old")
+            os.rename(target, self.path)
+            shutil.rmtree(self.path + ".old")
+        except BaseException:
+            if os.path.isdir(target) and os.path.isdir(self.path):
+                shutil.rmtree(target)
+            raise
+        finally:
+            pending, self._pending = self._pending, None
+            self.close()
+            self._open()
+            for shop_id, item_id, timestamp, price, original_price in pending:
+                self.record(shop_id, item_id, price, original_price, now=timestamp)
+        self.compactions += 1
+        logger.info("Histórico de preços compactado: %s -> %s amostras em %s blocos", before, samples, blocks)
+        return {"samples_before": before, "samples_after": samples, "blocks": blocks}
+
+    async def start(self) -> None:
+        """Abre o histórico e agenda a compactação periódica"""
+        self._open()
+        self._task = asyncio.create_task(self._run())
+
+    async def stop(self) -> None:
+        if self._task is not None:
+            self._task.cancel()
+            try:
+                await self._task
+            except asyncio.CancelledError:
+                pass
+            self._task = None
+        self.close()
+
+    async def _run(self) -> None:
+        while True:
+            await asyncio.sleep(PRICE_HISTORY_COMPACT_INTERVAL)
+            try:
+                await self.compact()
+            except Exception as e:
+                logger.error("Erro ao compactar o histórico de preços: %s", e)
+
+    def stats(self) -> Dict[str, int]:
+        self._open()
+        return {
+            "items": len(self._last),
+            "blocks": self.blocks,
+            "samples": self.samples,
+            "skipped": self.skipped,
+            "compactions": self.compactions,
+            "file_bytes": self.capacity * (3 * 4 * self.block_size + HEADER.size),
+        }
+
+# Histórico usado pelo bot (compactação iniciada no post_init)
+price_history = PriceHistory()
@@ -0,0 +1,379 @@
+"""
+Acompanhamento de preços dos produtos favoritados e com alerta
+
+Cada produto é consultado uma única vez, não importa quantos usuários o acompanham.
+As consultas saem em lotes (GraphQL agrupado) com ritmo próprio, abaixo do limite da API,
+e a frequência se adapta ao produto: preço que muda é consultado mais vezes, preço
+parado vai espaçando até PRICE_WATCH_MAX_INTERVAL. Um alerta dispara quando o preço
+cruza o valor desejado (de cima para baixo), não a cada consulta abaixo dele.
+"""
+import asyncio
+import logging
+import math
+import os
+import random
+import sqlite3
+import time
+from typing import Awaitable, Callable, Dict, List, Optional, Tuple
+from utils.env import load_env
+from services.rate_limit import TokenBucket
+from services.shopee_api import (
+    fetch_items_details, ShopeeAPIUnavailable, GRAPHQL_BATCH_SIZE, PROFILE_PRICE, api_circuit_breaker
+)
+
+# Carrega variáveis de ambiente
+load_env()
+
+logger = logging.getLogger(__name__)
+
+DATA_DIR = os.getenv('DATA_DIR', 'data')
+PRICE_WATCH_DB = os.getenv('PRICE_WATCH_DB', os.path.join(DATA_DIR, 'price_watch.sqlite3'))
+PRICE_WATCH_MIN_INTERVAL = float(os.getenv('PRICE_WATCH_MIN_INTERVAL', '600'))
+PRICE_WATCH_MAX_INTERVAL = float(os.getenv('PRICE_WATCH_MAX_INTERVAL', '21600'))
+PRICE_WATCH_DEFAULT_INTERVAL = float(os.getenv('PRICE_WATCH_DEFAULT_INTERVAL', '3600'))
+# Consultas GraphQL por segundo usadas pelo acompanhamento (o restante da API fica para os usuários)
+PRICE_WATCH_RATE = float(os.getenv('PRICE_WATCH_RATE', '3'))
+# Produtos consultados por rodada do laço
+PRICE_WATCH_CYCLE_SIZE = int(os.getenv('PRICE_WATCH_CYCLE_SIZE', '100'))
+# Atraso (vencimento -> consulta) a partir do qual o laço é considerado atrasado
+PRICE_WATCH_MAX_LAG = float(os.getenv('PRICE_WATCH_MAX_LAG', '60'))
+# Espera máxima para juntar um lote cheio antes de consultar os vencidos
+PRICE_WATCH_COALESCE = float(os.getenv('PRICE_WATCH_COALESCE', '30'))
+# Queda padrão pedida pelo botão "Alertar Preço" (10% abaixo do preço atual)
+PRICE_ALERT_DROP = float(os.getenv('PRICE_ALERT_DROP', '0.10'))
+PRICE_WATCH_MAX_PER_USER = int(os.getenv('PRICE_WATCH_MAX_PER_USER', '200'))
+
+FAVORITE = "fav"
+ALERT = "alert"
+
+# notify(user_ids, item): item com shop_id, item_id, name, price e old_price
+NotifyFunc = Callable[[List[int], Dict], Awaitable[None]]
+
+def alert_target(price: float) -> float:
+    """Preço alvo do botão "Alertar Preço" a partir do preço atual"""
+    return round(price * (1 - PRICE_ALERT_DROP), 2)
+
+class WatchLimitExceeded(Exception):
+    """O usuário já acompanha o máximo de produtos"""
+
+class PriceWatcher:
+    """Produtos acompanhados (SQLite) e o laço que consulta os vencidos"""
+
+    def __init__(self, path: str = PRICE_WATCH_DB,
+                 min_interval: float = PRICE_WATCH_MIN_INTERVAL,
+                 max_interval: float = PRICE_WATCH_MAX_INTERVAL,
+                 default_interval: float = PRICE_WATCH_DEFAULT_INTERVAL,
+                 rate: float = PRICE_WATCH_RATE,
+                 cycle_size: int = PRICE_WATCH_CYCLE_SIZE):
+        self.path = path
+        self.min_interval = min_interval
+        self.max_interval = max_interval
+        self.default_interval = default_interval
+        self.rate = rate
+        self.cycle_size = cycle_size
+        self._conn: Optional[sqlite3.Connection] = None
+        self._notify: Optional[NotifyFunc] = None
+        self._bucket: Optional[TokenBucket] = None
+        self._wakeup: Optional[asyncio.Event] = None
+        self._task: Optional[asyncio.Task] = None
+        self.checks = 0
+        self.changes = 0
+        self.notifications = 0
+        self.last_lag = 0.0
+
+    def _connect(self) -> sqlite3.Connection:
+        if self._conn is None:
+            if self.path != ':memory:':
+                os.makedirs(os.path.dirname(self.path) or '.', exist_ok=True)
+            self._conn = sqlite3.connect(self.path)
+            self._conn.execute("PRAGMA journal_mode=WAL")
+            self._conn.execute("PRAGMA synchronous=NORMAL")
+            # Um registro por produto, compartilhado por todos que o acompanham
+            self._conn.execute(
+                "CREATE TABLE IF NOT EXISTS items ("
+                " shop_id INTEGER NOT NULL,"
+                " item_id INTEGER NOT NULL,"
+                " name TEXT NOT NULL DEFAULT '',"
+                " price REAL,"
+                " interval REAL NOT NULL,"
+                " next_check REAL NOT NULL,"
+                " watchers INTEGER NOT NULL DEFAULT 0,"
+                " PRIMARY KEY (shop_id, item_id)"
+                ")"
+            )
+            self._conn.execute(
+                "CREATE TABLE IF NOT EXISTS watches ("
+                " id INTEGER PRIMARY KEY,"
+                " user_id INTEGER NOT NULL,"
+                " shop_id INTEGER NOT NULL,"
+                " item_id INTEGER NOT NULL,"
+                " kind TEXT NOT NULL,"
+                " target_price REAL,"
+                " created_at REAL NOT NULL,"
+                " UNIQUE (user_id, kind, shop_id, item_id)"
+                ")"
+            )
+            # Vencidos saem em ordem de next_check; alertas cruzados saem por faixa de preço alvo
+            self._conn.execute("CREATE INDEX IF NOT EXISTS items_due ON items (next_check)")
+            self._conn.execute(
+                "CREATE INDEX IF NOT EXISTS watches_by_item ON watches (shop_id, item_id, kind, target_price)"
+            )
+            self._conn.execute("CREATE INDEX IF NOT EXISTS watches_by_user ON watches (user_id, kind, created_at)")
+            self._conn.commit()
+        return self._conn
+
+    def add_watch(self, user_id: int, shop_id: int, item_id: int, kind: str, price: Optional[float] = None,
+                  name: str = '', target_price: Optional[float] = None, now: Optional[float] = None) -> bool:
+        """Acompanha um produto para o usuário (False se já acompanhava)"""
+        now = time.time() if now is None else now
+        conn = self._connect()
+        count = conn.execute("SELECT COUNT(*) FROM watches WHERE user_id = ?", (user_id,)).fetchone()[0]
+        if count >= PRICE_WATCH_MAX_PER_USER:
+            raise WatchLimitExceeded(f"limite de {PRICE_WATCH_MAX_PER_USER} produtos atingido")
+        if kind == ALERT and target_price is None:
+            # Sem preço na consulta do botão, vale o último preço conhecido do produto
+            known = price
+            if known is None:
+                row = conn.execute(
+                    "SELECT price FROM items WHERE shop_id = ? AND item_id = ?", (shop_id, item_id)
+                ).fetchone()
+                known = row[0] if row else None
+            if known is not None:
+                target_price = alert_target(known)
+
+        with conn:
+            cursor = conn.execute(
+                "INSERT OR IGNORE INTO watches (user_id, shop_id, item_id, kind, target_price, created_at)"
+                " VALUES (?, ?, ?, ?, ?, ?)",
+                (user_id, shop_id, item_id, kind, target_price, now)
+            )
+            if cursor.rowcount == 0:
+                return False
+            # Produto novo entra com o preço já conhecido; sem preço, é consultado na próxima rodada
+            next_check = now + self.default_interval if price is not None else now
+            conn.execute(
+                "INSERT INTO items (shop_id, item_id, name, price, interval, next_check, watchers)"
+                " VALUES (?, ?, ?, ?, ?, ?, 1)"
+                " ON CONFLICT (shop_id, item_id) DO UPDATE SET watchers = watchers + 1",
+                (shop_id, item_id, name, price, self.default_interval, next_check)
+            )
+        if self._wakeup is not None and price is None:
+            self._wakeup.set()
+        return True
+
+    def add_watches(self, watches: List[Tuple[int, int, int, str, Optional[float], Optional[float]]],
+                    now: Optional[float] = None) -> None:
+        """Cadastra vários (user_id, shop_id, item_id, kind, preço, alvo) numa única transação"""
+        now = time.time() if now is None else now
+        conn = self._connect()
+        with conn:
+            for user_id, shop_id, item_id, kind, price, target_price in watches:
+                cursor = conn.execute(
+                    "INSERT OR IGNORE INTO watches (user_id, shop_id, item_id, kind, target_price, created_at)"
+                    " VALUES (?, ?, ?, ?, ?, ?)",
+                    (user_id, shop_id, item_id, kind, target_price, now)
+                )
+                if cursor.rowcount:
+                    # Com preço conhecido, a primeira consulta é espalhada ao longo do intervalo padrão
+                    next_check = now + random.uniform(0, self.default_interval) if price is not None else now
+                    conn.execute(
+                        "INSERT INTO items (shop_id, item_id, price, interval, next_check, watchers)"
+                        " VALUES (?, ?, ?, ?, ?, 1)"
+                        " ON CONFLICT (shop_id, item_id) DO UPDATE SET watchers = watchers + 1",
+                        (shop_id, item_id, price, self.default_interval, next_check)
+                    )
+        if self._wakeup is not None:
+            self._wakeup.set()
+
+    def remove_watch(self, user_id: int, shop_id: int, item_id: int, kind: str) -> bool:
+        """Deixa de acompanhar; o produto sai da fila quando ninguém mais o acompanha"""
+        conn = self._connect()
+        with conn:
+            cursor = conn.execute(
+                "DELETE FROM watches WHERE user_id = ? AND kind = ? AND shop_id = ? AND item_id = ?",
+                (user_id, kind, shop_id, item_id)
+            )
+            if cursor.rowcount == 0:
+                return False
+            conn.execute(
+                "UPDATE items SET watchers = watchers - 1 WHERE shop_id = ? AND item_id = ?", (shop_id, item_id)
+            )
+            conn.execute(
+                "DELETE FROM items WHERE shop_id = ? AND item_id = ? AND watchers <= 0", (shop_id, item_id)
+            )
+        return True
+
+    def has_watch(self, user_id: int, shop_id: int, item_id: int, kind: str) -> bool:
+        return self._connect().execute(
+            "SELECT 1 FROM watches WHERE user_id = ? AND kind = ? AND shop_id = ? AND item_id = ?",
+            (user_id, kind, shop_id, item_id)
+        ).fetchone() is not None
+
+    def list_watches(self, user_id: int, kind: str, page: int = 0, page_size: int = 5) -> Tuple[List[Dict], int]:
+        """Página dos produtos acompanhados pelo usuário (mais recentes primeiro) e o total"""
+        conn = self._connect()
+        total = conn.execute(
+            "SELECT COUNT(*) FROM watches WHERE user_id = ? AND kind = ?", (user_id, kind)
+        ).fetchone()[0]
+        rows = conn.execute(
+            "SELECT w.shop_id, w.item_id, w.target_price, i.name, i.price FROM watches w"
+            " JOIN items i ON i.shop_id = w.shop_id AND i.item_id = w.item_id"
+            " WHERE w.user_id = ? AND w.kind = ? ORDER BY w.created_at DESC LIMIT ? OFFSET ?",
+            (user_id, kind, page_size, page * page_size)
+        ).fetchall()
+        watches = [
+            {"shop_id": shop_id, "item_id": item_id, "target_price": target, "name": name, "price": price}
+            for shop_id, item_id, target, name, price in rows
+        ]
+        return watches, total
+
+    def next_interval(self, interval: float, changed: bool, behind: bool = False) -> float:
+        """
+        Preço mudou: consulta com o dobro da frequência; parado: espaça 25%
+        Com o laço atrasado, os parados espaçam mais rápido para aliviar a fila
+        """
+        if changed:
+            return max(self.min_interval, interval / 2)
+        return min(self.max_interval, interval * (2.0 if behind else 1.25))
+
+    async def check_due(self, now: Optional[float] = None) -> int:
+        """Consulta uma rodada de produtos vencidos e retorna quantos foram processados"""
+        now = time.time() if now is None else now
+        conn = self._connect()
+        rows = conn.execute(
+            "SELECT shop_id, item_id, name, price, interval, next_check FROM items"
+            " WHERE next_check <= ? ORDER BY next_check LIMIT ?",
+            (now, self.cycle_size)
+        ).fetchall()
+        if not rows:
+            return 0
+
+        if self._bucket is not None:
+            for _ in range(math.ceil(len(rows) / GRAPHQL_BATCH_SIZE)):
+                await self._bucket.acquire()
+        # Só nome e preço: a resposta é uma fração da do cartão
+        products = await fetch_items_details([(shop_id, item_id) for shop_id, item_id, *_ in rows], PROFILE_PRICE)
+
+        self.last_lag = now - rows[0][5]
+        behind = self.last_lag > PRICE_WATCH_MAX_LAG
+        updates = []
+        drops = []
+        # Alertas criados sem preço conhecido ganham o alvo no primeiro preço do produto
+        targets = []
+        for shop_id, item_id, name, old_price, interval, next_check in rows:
+            product = products.get((shop_id, item_id))
+            if product is None:
+                # Fora do ar ou removido: tenta de novo no intervalo atual
+                updates.append((old_price, name, interval, now + interval, shop_id, item_id))
+                continue
+            price = product.price
+            changed = old_price is None or abs(price - old_price) >= 0.01
+            interval = self.next_interval(interval, changed and old_price is not None, behind)
+            # Espalha as próximas consultas para não formar picos
+            updates.append((price, product.name or name, interval,
+                            now + interval * random.uniform(0.9, 1.1), shop_id, item_id))
+            if old_price is None:
+                targets.append((alert_target(price), shop_id, item_id, ALERT))
+            if changed:
+                self.changes += 1
+                if old_price is not None and price < old_price:
+                    drops.append((shop_id, item_id, product.name or name, old_price, price))
+
+        with conn:
+            conn.executemany(
+                "UPDATE items SET price = ?, name = ?, interval = ?, next_check = ? WHERE shop_id = ? AND item_id = ?",
+                updates
+            )
+            conn.executemany(
+                "UPDATE watches SET target_price = ?"
+                " WHERE shop_id = ? AND item_id = ? AND kind = ? AND target_price IS NULL",
+                targets
+            )
+        self.checks += len(rows)
+
+        # Só quedas podem cruzar um alvo: old_price > alvo >= price
+        for shop_id, item_id, name, old_price, price in drops:
+            users = [user_id for user_id, in conn.execute(
+                "SELECT user_id FROM watches WHERE shop_id = ? AND item_id = ? AND kind = ?"
+                " AND target_price >= ? AND target_price < ?",
+                (shop_id, item_id, ALERT, price, old_price)
+            )]
+            if users and self._notify is not None:
+                self.notifications += len(users)
+                item = {"shop_id": shop_id, "item_id": item_id, "name": name, "price": price, "old_price": old_price}
+                try:
+                    await self._notify(users, item)
+                except Exception as e:
+                    logger.error("Erro ao notificar alerta de preço de %s/%s: %s", shop_id, item_id, e)
+        return len(rows)
+
+    def next_wakeup(self) -> Optional[float]:
+        """
+        Quando rodar de novo: ao vencer um lote cheio de GRAPHQL_BATCH_SIZE produtos,
+        mas sem atrasar o primeiro vencido mais que PRICE_WATCH_COALESCE segundos
+        """
+        conn = self._connect()
+        earliest = conn.execute("SELECT MIN(next_check) FROM items").fetchone()[0]
+        if earliest is None:
+            return None
+        row = conn.execute(
+            "SELECT next_check FROM items ORDER BY next_check LIMIT 1 OFFSET ?", (GRAPHQL_BATCH_SIZE - 1,)
+        ).fetchone()
+        full_batch = row[0] if row else math.inf
+        return min(full_batch, earliest + PRICE_WATCH_COALESCE)
+
+    async def start(self, notify: NotifyFunc) -> None:
+        """Inicia o laço de consultas (notify(user_ids, item) avisa quem tinha alerta no preço)"""
+        self._notify = notify
+        self._bucket = TokenBucket(rate=self.rate, capacity=max(1.0, self.rate))
+        self._wakeup = asyncio.Event()
+        self._task = asyncio.create_task(self._run())
+
+    async def stop(self) -> None:
+        if self._task is not None:
+            self._task.cancel()
+            try:
+                await self._task
+            except asyncio.CancelledError:
+                pass
+            self._task = None
+        if self._conn is not None:
+            self._conn.close()
+            self._conn = None
+
+    async def _run(self) -> None:
+        while True:
+            self._wakeup.clear()
+            try:
+                # Rodada cheia: ainda há fila; senão espera juntar o próximo lote
+                if await self.check_due() >= self.cycle_size:
+                    continue
+            except ShopeeAPIUnavailable as e:
+                logger.warning("Acompanhamento de preços pausado: %s", e)
+                await asyncio.sleep(api_circuit_breaker.reset_timeout)
+                continue
+            except Exception as e:
+                logger.error("Erro no acompanhamento de preços: %s", e)
+                await asyncio.sleep(5)
+                continue
+
+            wakeup = self.next_wakeup()
+            timeout = max(0.0, wakeup - time.time()) if wakeup is not None else None
+            try:
+                await asyncio.wait_for(self._wakeup.wait(), timeout=timeout)
+            except asyncio.TimeoutError:
+                pass
+
+    def stats(self) -> Dict[str, float]:
+        conn = self._connect()
+        oldest = conn.execute("SELECT MIN(next_check) FROM items").fetchone()[0]
+        return {
+            "items": conn.execute("SELECT COUNT(*) FROM items").fetchone()[0],
+            "checks": self.checks,
+            "changes": self.changes,
+            "notifications": self.notifications,
+            "lag_seconds": round(max(0.0, time.time() - oldest), 1) if oldest is not None else 0.0,
+        }
+
+# Acompanhamento usado pelo bot (iniciado no post_init)
+price_watcher = PriceWatcher()
@@ -0,0 +1,208 @@
+"""
+Fotos dos produtos enviadas pelo file_id do Telegram
+
+Na primeira vez que a imagem de um produto é enviada, o bot a baixa do CDN da Shopee e a
+envia; o Telegram devolve um file_id que vale para qualquer chat do bot. O file_id fica
+guardado em SQLite por imagem, então os envios seguintes (para qualquer chat, mesmo depois
+de reiniciar) não baixam nem enviam a imagem de novo. Envios simultâneos da mesma imagem
+esperam o primeiro upload terminar; downloads simultâneos da mesma imagem viram um só, com
+no máximo IMAGE_DOWNLOAD_CONCURRENCY downloads ao mesmo tempo.
+"""
+import asyncio
+import logging
+import os
+import sqlite3
+from typing import Dict, Optional
+import aiohttp
+from utils.env import load_env
+from telegram.error import BadRequest
+from services.cache import TTLCache
+from services.http_client import get_http_session
+from services.shopee_api import SingleFlight
+
+# Carrega variáveis de ambiente
+load_env()
+
+logger = logging.getLogger(__name__)
+
+DATA_DIR = os.getenv('DATA_DIR', 'data')
+PRODUCT_IMAGES_DB = os.getenv('PRODUCT_IMAGES_DB', os.path.join(DATA_DIR, 'product_images.sqlite3'))
+# Cartões com foto (0 volta para o cartão só de texto)
+PRODUCT_PHOTOS = os.getenv('PRODUCT_PHOTOS', '1').lower() in ('1', 'true', 'yes')
+IMAGE_URL = os.getenv('SHOPEE_IMAGE_URL', 'https://down-br.img.susercontent.com/file/{image}')
+IMAGE_DOWNLOAD_CONCURRENCY = int(os.getenv('IMAGE_DOWNLOAD_CONCURRENCY', '4'))
+# Fotos enviadas por upload podem ter até 10MB
+IMAGE_MAX_BYTES = int(os.getenv('IMAGE_MAX_BYTES', str(5 * 1024 * 1024)))
+
+class ImageUnavailable(Exception):
+    """Não foi possível baixar a imagem do produto"""
+
+class FileIdStore:
+    """Mapeamento persistente imagem da Shopee -> file_id da foto no Telegram"""
+
+    def __init__(self, path: str = PRODUCT_IMAGES_DB, memory_size: int = 10000):
+        self.path = path
+        self._conn: Optional[sqlite3.Connection] = None
+        # Frente em memória para as imagens mais enviadas
+        self._memory = TTLCache(maxsize=memory_size, ttl=float('inf'))
+
+    def _connect(self) -> sqlite3.Connection:
+        if self._conn is None:
+            if self.path != ':memory:':
+                os.makedirs(os.path.dirname(self.path) or '.', exist_ok=True)
+            self._conn = sqlite3.connect(self.path)
+            self._conn.execute(
+                "CREATE TABLE IF NOT EXISTS product_images ("
+                " image TEXT PRIMARY KEY,"
+                " file_id TEXT NOT NULL"
+                ")"
+            )
+            self._conn.commit()
+        return self._conn
+
+    def get(self, image: str) -> Optional[str]:
+        file_id, _ = self._memory.get(image)
+        if file_id is not None:
+            return file_id
+        row = self._connect().execute(
+            "SELECT file_id FROM product_images WHERE image = ?", (image,)
+        ).fetchone()
+        if row is None:
+            return None
+        self._memory.set(image, row[0])
+        return row[0]
+
+    def set(self, image: str, file_id: str) -> None:
+        self._memory.set(image, file_id)
+        conn = self._connect()
+        conn.execute("INSERT OR REPLACE INTO product_images (image, file_id) VALUES (?, ?)", (image, file_id))
+        conn.commit()
+
+    def delete(self, image: str) -> None:
+        self._memory.invalidate(image)
+        conn = self._connect()
+        conn.execute("DELETE FROM product_images WHERE image = ?", (image,))
+        conn.commit()
+
+    def __len__(self) -> int:
+        return self._connect().execute("SELECT COUNT(*) FROM product_images").fetchone()[0]
+
+    def close(self) -> None:
+        if self._conn is not None:
+            self._conn.close()
+            self._conn = None
+
+class ProductImages:
+    """Envio de fotos de produtos reaproveitando o file_id de cada imagem"""
+
+    def __init__(self, store: Optional[FileIdStore] = None,
+                 concurrency: int = IMAGE_DOWNLOAD_CONCURRENCY, max_bytes: int = IMAGE_MAX_BYTES):
+        self.store = store if store is not None else FileIdStore()
+        self.max_bytes = max_bytes
+        self._semaphore = asyncio.Semaphore(concurrency)
+        self._downloads = SingleFlight()
+        # Imagem -> upload em andamento (os outros envios da mesma imagem esperam o file_id)
+        self._uploads: Dict[str, asyncio.Future] = {}
+        self.reused = 0
+        self.uploads = 0
+        self.waited = 0
+        self.expired = 0
+        self.downloads = 0
+        self.bytes_downloaded = 0
+        self.bytes_uploaded = 0
+
+    @staticmethod
+    def image_url(image: str) -> str:
+        return IMAGE_URL.format(image=image)
+
+    async def download(self, image: str) -> bytes:
+        """Baixa a imagem (downloads simultâneos da mesma imagem são feitos uma vez)"""
+        return await self._downloads.do(image, self._download, image)
+
+    async def _download(self, image: str) -> bytes:
+        async with self._semaphore:
+            chunks = []
+            size = 0
+            try:
+                async with get_http_session().get(self.image_url(image)) as response:
+                    response.raise_for_status()
+                    async for chunk in response.content.iter_chunked(64 * 1024):
+                        size += len(chunk)
+                        if size > self.max_bytes:
+                            raise ImageUnavailable(f"{image}: mais de {self.max_bytes} bytes")
+                        chunks.append(chunk)
+            except (aiohttp.ClientError, asyncio.TimeoutError) as e:
+                raise ImageUnavailable(f"{image}: {e!r}") from e
+        self.downloads += 1
+        self.bytes_downloaded += size
+        return b"".join(chunks)
+
+    async def send_photo(self, bot, chat_id: int, image: str, **kwargs):
+        """Envia a foto pelo file_id guardado; sem ele, baixa, envia e guarda o file_id devolvido"""
+        while True:
+            file_id = self.store.get(image)
+            if file_id is not None:
+                try:
+                    message = await bot.send_photo(chat_id=chat_id, photo=file_id, **kwargs)
+                except BadRequest as e:
+                    if "file" not in e.message.lower():
+                        raise
+                    # file_id recusado (outro token, arquivo expirado): a imagem sobe de novo
+                    logger.info("file_id da imagem %s recusado: %s", image, e.message)
+                    if self.store.get(image) == file_id:
+                        self.store.delete(image)
+                        self.expired += 1
+                    continue
+                self.reused += 1
+                return message
+
+            upload = self._uploads.get(image)
+            if upload is None:
+                return await self._upload(bot, chat_id, image, **kwargs)
+            # Outro envio já está subindo a mesma imagem: espera o file_id dele
+            self.waited += 1
+            await asyncio.wait([upload])
+            if upload.result() is not None:
+                # A imagem não baixou para quem subia: não adianta tentar de novo agora
+                raise ImageUnavailable(upload.result())
+
+    async def _upload(self, bot, chat_id: int, image: str, **kwargs):
+        upload = asyncio.get_running_loop().create_future()
+        self._uploads[image] = upload
+        # Resultado para quem espera: None, ou o erro do download
+        error = None
+        try:
+            try:
+                data = await self.download(image)
+            except ImageUnavailable as e:
+                error = str(e)
+                raise
+            message = await bot.send_photo(chat_id=chat_id, photo=data, filename=f"{image}.jpg", **kwargs)
+            self.uploads += 1
+            self.bytes_uploaded += len(data)
+            if message.photo:
+                # Maior tamanho gerado pelo Telegram (o file_id de qualquer um serve para reenviar)
+                self.store.set(image, message.photo[-1].file_id)
+            return message
+        finally:
+            del self._uploads[image]
+            upload.set_result(error)
+
+    def stats(self) -> Dict[str, int]:
+        return {
+            "reused": self.reused,
+            "uploads": self.uploads,
+            "waited": self.waited,
+            "expired": self.expired,
+            "downloads": self.downloads,
+            "downloads_shared": self._downloads.shared,
+            "downloads_in_flight": len(self._downloads),
+            "bytes_downloaded": self.bytes_downloaded,
+            "bytes_uploaded": self.bytes_uploaded,
+        }
+
+    def close(self) -> None:
+        self.store.close()
+
+# Fotos dos produtos usadas pelo bot
+product_images = ProductImages()
@@ -0,0 +1,162 @@
+"""
+Controle de chamadas a APIs externas: limite por token bucket, novas tentativas
+com backoff exponencial e circuit breaker
+"""
+import asyncio
+import random
+import time
+from typing import Dict, Optional
+
+class RateLimitExceeded(Exception):
+    """A fila de espera do limitador está cheia"""
+
+class TokenBucket:
+    """
+    Limita a taxa de chamadas (rate por segundo, rajadas de até capacity)
+    Chamadas sem token aguardam numa fila FIFO de até max_waiters posições
+    """
+
+    def __init__(self, rate: float, capacity: float, max_waiters: Optional[int] = None):
+        self.rate = rate
+        self.capacity = capacity
+        self.max_waiters = max_waiters
+        self.tokens = capacity
+        self._updated_at = time.monotonic()
+        self._lock = asyncio.Lock()
+        self.waiting = 0
+        self.acquired = 0
+        self.rejected = 0
+
+    def _refill(self) -> None:
+        now = time.monotonic()
+        self.tokens = min(self.capacity, self.tokens + (now - self._updated_at) * self.rate)
+        self._updated_at = now
+
+    async def acquire(self) -> None:
+        """Aguarda um token (levanta RateLimitExceeded se a fila estiver cheia)"""
+        if self.max_waiters is not None and self.waiting >= self.max_waiters:
+            self.rejected += 1
+            raise RateLimitExceeded(f"fila do limitador cheia ({self.waiting} aguardando)")
+
+        self.waiting += 1
+        try:
+            # O lock garante a ordem de chegada: só o primeiro da fila espera pelo próximo token
+            async with self._lock:
+                while True:
+                    self._refill()
+                    if self.tokens >= 1:
+                        self.tokens -= 1
+                        self.acquired += 1
+                        return
+                    await asyncio.sleep((1 - self.tokens) / self.rate)
+        finally:
+            self.waiting -= 1
+
+    def status(self) -> Dict:
+        self._refill()
+        return {
+            "rate": self.rate,
+            "capacity": self.capacity,
+            "tokens": round(self.tokens, 2),
+            "waiting": self.waiting,
+            "acquired": self.acquired,
+            "rejected": self.rejected,
+        }
+
+class RetryPolicy:
+    """Backoff exponencial com jitter completo, respeitando Retry-After quando informado"""
+
+    def __init__(self, max_retries: int = 3, base_delay: float = 0.5, max_delay: float = 8.0,
+                 retry_statuses=(429, 500, 502, 503, 504)):
+        self.max_retries = max_retries
+        self.base_delay = base_delay
+        self.max_delay = max_delay
+        self.retry_statuses = frozenset(retry_statuses)
+        self.retries = 0
+
+    def should_retry(self, status: int) -> bool:
+        return status in self.retry_statuses
+
+    def delay(self, attempt: int, retry_after: Optional[float] = None) -> float:
+        """Tempo de espera antes da tentativa attempt + 1 (attempt começa em 0)"""
+        self.retries += 1
+        if retry_after is not None:
+            return min(retry_after, self.max_delay)
+        return random.uniform(0, min(self.max_delay, self.base_delay * 2 ** attempt))
+
+    def status(self) -> Dict:
+        return {
+            "max_retries": self.max_retries,
+            "base_delay": self.base_delay,
+            "max_delay": self.max_delay,
+            "retries": self.retries,
+        }
+
+class CircuitBreaker:
+    """
+    Abre o circuito após failure_threshold falhas seguidas e rejeita chamadas por reset_timeout segundos
+    Depois disso libera uma chamada de teste (meio aberto): sucesso fecha o circuito, falha reabre
+    """
+
+    CLOSED = "closed"
+    OPEN = "open"
+    HALF_OPEN = "half_open"
+
+    def __init__(self, failure_threshold: int = 5, reset_timeout: float = 30.0):
+        self.failure_threshold = failure_threshold
+        self.reset_timeout = reset_timeout
+        self._state = self.CLOSED
+        self.failures = 0
+        self._opened_at = 0.0
+        self._trial_running = False
+        self.rejected = 0
+        self.opened = 0
+
+    @property
+    def state(self) -> str:
+        if self._state == self.OPEN and time.monotonic() - self._opened_at >= self.reset_timeout:
+            self._state = self.HALF_OPEN
+            self._trial_running = False
+        return self._state
+
+    def allow(self) -> bool:
+        """Indica se uma chamada pode seguir (no estado meio aberto, apenas uma por vez)"""
+        state = self.state
+        if state == self.CLOSED:
+            return True
+        if state == self.HALF_OPEN and not self._trial_running:
+            self._trial_running = True
+            return True
+        self.rejected += 1
+        return False
+
+    def record_success(self) -> None:
+        self._state = self.CLOSED
+        self.failures = 0
+        self._trial_running = False
+
+    def release(self) -> None:
+        """Libera a chamada de teste sem registrar resultado (ex: cancelamento)"""
+        self._trial_running = False
+
+    def record_failure(self) -> None:
+        self.failures += 1
+        self._trial_running = False
+        if self._state == self.HALF_OPEN or self.failures >= self.failure_threshold:
+            self._state = self.OPEN
+            self._opened_at = time.monotonic()
+            self.opened += 1
+
+    def status(self) -> Dict:
+        state = self.state
+        retry_in = 0.0
+        if state == self.OPEN:
+            retry_in = max(0.0, self.reset_timeout - (time.monotonic() - self._opened_at))
+        return {
+            "state": state,
+            "failures": self.failures,
+            "failure_threshold": self.failure_threshold,
+            "retry_in": round(retry_in, 1),
+            "opened": self.opened,
+            "rejected": self.rejected,
+        }
@@ -0,0 +1,295 @@
+"""
+Agendador de mensagens persistente
+
+Os agendamentos ficam num SQLite local e sobrevivem a reinícios. Em memória, apenas um
+heap de (horário, id) dos pendentes: o próximo disparo sai em O(log n), sem varrer a lista.
+"""
+import asyncio
+import heapq
+import logging
+import os
+import sqlite3
+import time
+from datetime import datetime, timedelta
+from typing import Awaitable, Callable, Dict, List, Optional, Set, Tuple
+from utils.env import load_env
+import pytz
+
+# Carrega variáveis de ambiente
+load_env()
+
+logger = logging.getLogger(__name__)
+
+DATA_DIR = os.getenv('DATA_DIR', 'data')
+SCHEDULER_DB = os.getenv('SCHEDULER_DB', os.path.join(DATA_DIR, 'scheduler.sqlite3'))
+BOT_TIMEZONE = os.getenv('BOT_TIMEZONE', 'America/Sao_Paulo')
+# Atraso máximo tolerado para um disparo (ex: bot fora do ar no horário); além disso o job é marcado como perdido
+SCHEDULER_MISFIRE_GRACE = float(os.getenv('SCHEDULER_MISFIRE_GRACE', '300'))
+SCHEDULER_MAX_CONCURRENT_SENDS = int(os.getenv('SCHEDULER_MAX_CONCURRENT_SENDS', '20'))
+# Cancelados acumulados no heap antes de compactá-lo (e pelo menos metade do heap)
+SCHEDULER_COMPACT_MIN = int(os.getenv('SCHEDULER_COMPACT_MIN', '1000'))
+
+PENDING = "pending"
+SENT = "sent"
+FAILED = "failed"
+MISSED = "missed"
+CANCELLED = "cancelled"
+
+SendFunc = Callable[[int, str], Awaitable[None]]
+
+def next_run_at(hour: int, minute: int, timezone: str = BOT_TIMEZONE, now: Optional[datetime] = None) -> datetime:
+    """Próxima ocorrência de HH:MM no fuso informado (hoje, se ainda não passou; senão amanhã), em UTC"""
+    tz = pytz.timezone(timezone)
+    local_now = (now or datetime.now(pytz.utc)).astimezone(tz)
+    day = local_now.date()
+    for _ in range(2):
+        # localize/normalize tratam horário de verão (horários inexistentes são ajustados)
+        candidate = tz.normalize(tz.localize(datetime(day.year, day.month, day.day, hour, minute)))
+        if candidate > local_now:
+            return candidate.astimezone(pytz.utc)
+        day += timedelta(days=1)
+    return candidate.astimezone(pytz.utc)
+
+class ScheduledJob:
+    """Agendamento lido do banco"""
+
+    __slots__ = ("id", "run_at", "chat_id", "text", "created_by", "timezone", "status")
+
+    def __init__(self, id: int, run_at: float, chat_id: int, text: str, created_by: int, timezone: str, status: str):
+        self.id = id
+        self.run_at = run_at
+        self.chat_id = chat_id
+        self.text = text
+        self.created_by = created_by
+        self.timezone = timezone
+        self.status = status
+
+    def local_time(self) -> datetime:
+        return datetime.fromtimestamp(self.run_at, pytz.utc).astimezone(pytz.timezone(self.timezone))
+
+class MessageScheduler:
+    """Agendador com armazenamento SQLite e heap em memória"""
+
+    def __init__(self, path: str = SCHEDULER_DB, misfire_grace: float = SCHEDULER_MISFIRE_GRACE,
+                 max_concurrent_sends: int = SCHEDULER_MAX_CONCURRENT_SENDS):
+        self.path = path
+        self.misfire_grace = misfire_grace
+        self.max_concurrent_sends = max_concurrent_sends
+        self._conn: Optional[sqlite3.Connection] = None
+        self._heap: List[Tuple[float, int]] = []
+        # Cancelados que ainda estão no heap (descartados no topo ou na compactação)
+        self._cancelled: Set[int] = set()
+        self._send: Optional[SendFunc] = None
+        self._wakeup: Optional[asyncio.Event] = None
+        self._loop_task: Optional[asyncio.Task] = None
+        self._send_tasks = set()
+        self._semaphore: Optional[asyncio.Semaphore] = None
+        self.dispatched = 0
+        self.missed = 0
+        self.failed = 0
+
+    def _connect(self) -> sqlite3.Connection:
+        if self._conn is None:
+            if self.path != ':memory:':
+                os.makedirs(os.path.dirname(self.path) or '.', exist_ok=True)
+            self._conn = sqlite3.connect(self.path)
+            self._conn.execute("PRAGMA journal_mode=WAL")
+            self._conn.execute("PRAGMA synchronous=NORMAL")
+            self._conn.execute(
+                "CREATE TABLE IF NOT EXISTS jobs ("
+                " id INTEGER PRIMARY KEY,"
+                " run_at REAL NOT NULL,"
+                " chat_id INTEGER NOT NULL,"
+                " text TEXT NOT NULL,"
+                " created_by INTEGER NOT NULL,"
+                " timezone TEXT NOT NULL,"
+                " status TEXT NOT NULL DEFAULT 'pending'"
+                ")"
+            )
+            # Recarga dos pendentes e listagem paginada por usuário saem dos índices
+            self._conn.execute("CREATE INDEX IF NOT EXISTS jobs_pending ON jobs (status, run_at)")
+            self._conn.execute("CREATE INDEX IF NOT EXISTS jobs_by_user ON jobs (created_by, status, run_at)")
+            self._conn.commit()
+        return self._conn
+
+    def load(self) -> int:
+        """Carrega os agendamentos pendentes do banco para o heap"""
+        rows = self._connect().execute(
+            "SELECT run_at, id FROM jobs WHERE status = ?", (PENDING,)
+        ).fetchall()
+        self._heap = rows
+        heapq.heapify(self._heap)
+        self._cancelled.clear()
+        return len(self._heap)
+
+    def __len__(self) -> int:
+        return len(self._heap) - len(self._cancelled)
+
+    def add_job(self, run_at: datetime, chat_id: int, text: str, created_by: int,
+                timezone: str = BOT_TIMEZONE) -> int:
+        """Agenda uma mensagem (run_at com fuso) e retorna o id do agendamento"""
+        timestamp = run_at.timestamp()
+        conn = self._connect()
+        cursor = conn.execute(
+            "INSERT INTO jobs (run_at, chat_id, text, created_by, timezone, status) VALUES (?, ?, ?, ?, ?, ?)",
+            (timestamp, chat_id, text, created_by, timezone, PENDING)
+        )
+        conn.commit()
+        job_id = cursor.lastrowid
+        self._push(timestamp, job_id)
+        return job_id
+
+    def add_jobs(self, jobs: List[Tuple[datetime, int, str, int]], timezone: str = BOT_TIMEZONE) -> None:
+        """Agenda vários (run_at, chat_id, texto, criado_por) numa única transação"""
+        conn = self._connect()
+        with conn:
+            for run_at, chat_id, text, created_by in jobs:
+                timestamp = run_at.timestamp()
+                cursor = conn.execute(
+                    "INSERT INTO jobs (run_at, chat_id, text, created_by, timezone, status) VALUES (?, ?, ?, ?, ?, ?)",
+                    (timestamp, chat_id, text, created_by, timezone, PENDING)
+                )
+                heapq.heappush(self._heap, (timestamp, cursor.lastrowid))
+        if self._wakeup is not None:
+            self._wakeup.set()
+
+    def _push(self, timestamp: float, job_id: int) -> None:
+        earliest = self._heap[0][0] if self._heap else None
+        heapq.heappush(self._heap, (timestamp, job_id))
+        # Acorda o laço se o novo job vier antes do que ele está esperando
+        if self._wakeup is not None and (earliest is None or timestamp < earliest):
+            self._wakeup.set()
+
+    def cancel_job(self, job_id: int, user_id: Optional[int] = None) -> bool:
+        """
+        Cancela um agendamento pendente (o heap descarta a entrada quando ela chegar ao topo,
+        ou antes, ao compactar: cancelamentos de jobs distantes não acumulam no heap)
+        """
+        query = "UPDATE jobs SET status = ? WHERE id = ? AND status = ?"
+        params = [CANCELLED, job_id, PENDING]
+        if user_id is not None:
+            query += " AND created_by = ?"
+            params.append(user_id)
+        conn = self._connect()
+        cursor = conn.execute(query, params)
+        conn.commit()
+        if cursor.rowcount == 0:
+            return False
+        self._cancelled.add(job_id)
+        if len(self._cancelled) > max(SCHEDULER_COMPACT_MIN, len(self._heap) // 2):
+            self._compact()
+        return True
+
+    def _compact(self) -> None:
+        """Remove do heap as entradas canceladas"""
+        self._heap = [entry for entry in self._heap if entry[1] not in self._cancelled]
+        heapq.heapify(self._heap)
+        self._cancelled.clear()
+
+    def get_job(self, job_id: int) -> Optional[ScheduledJob]:
+        row = self._connect().execute(
+            "SELECT id, run_at, chat_id, text, created_by, timezone, status FROM jobs WHERE id = ?", (job_id,)
+        ).fetchone()
+        return ScheduledJob(*row) if row else None
+
+    def list_jobs(self, user_id: int, page: int = 0, page_size: int = 5) -> Tuple[List[ScheduledJob], int]:
+        """Página de agendamentos pendentes do usuário (ordem de disparo) e o total"""
+        conn = self._connect()
+        total = conn.execute(
+            "SELECT COUNT(*) FROM jobs WHERE created_by = ? AND status = ?", (user_id, PENDING)
+        ).fetchone()[0]
+        rows = conn.execute(
+            "SELECT id, run_at, chat_id, text, created_by, timezone, status FROM jobs"
+            " WHERE created_by = ? AND status = ? ORDER BY run_at LIMIT ? OFFSET ?",
+            (user_id, PENDING, page_size, page * page_size)
+        ).fetchall()
+        return [ScheduledJob(*row) for row in rows], total
+
+    def _set_status(self, job_id: int, status: str) -> None:
+        conn = self._connect()
+        conn.execute("UPDATE jobs SET status = ? WHERE id = ?", (status, job_id))
+        conn.commit()
+
+    async def start(self, send: SendFunc) -> None:
+        """Carrega os pendentes e inicia o laço de disparo (send(chat_id, texto) envia a mensagem)"""
+        self._send = send
+        self._wakeup = asyncio.Event()
+        self._semaphore = asyncio.Semaphore(self.max_concurrent_sends)
+        started = time.perf_counter()
+        count = self.load()
+        logger.info("Agendador: %s agendamentos pendentes carregados em %.2fs", count, time.perf_counter() - started)
+        self._loop_task = asyncio.create_task(self._run())
+
+    async def stop(self) -> None:
+        if self._loop_task is not None:
+            self._loop_task.cancel()
+            try:
+                await self._loop_task
+            except asyncio.CancelledError:
+                pass
+            self._loop_task = None
+        if self._send_tasks:
+            await asyncio.gather(*self._send_tasks, return_exceptions=True)
+        if self._conn is not None:
+            self._conn.close()
+            self._conn = None
+
+    async def _run(self) -> None:
+        while True:
+            self._wakeup.clear()
+            if not self._heap:
+                await self._wakeup.wait()
+                continue
+
+            delay = self._heap[0][0] - time.time()
+            if delay > 0:
+                try:
+                    await asyncio.wait_for(self._wakeup.wait(), timeout=delay)
+                except asyncio.TimeoutError:
+                    pass
+                continue
+
+            run_at, job_id = heapq.heappop(self._heap)
+            if job_id in self._cancelled:
+                self._cancelled.discard(job_id)
+                continue
+            job = self.get_job(job_id)
+            if job is None or job.status != PENDING:
+                continue  # Cancelado (ou já tratado)
+
+            lateness = time.time() - run_at
+            if lateness > self.misfire_grace:
+                logger.warning("Agendamento %s perdido: atrasado %.0fs", job_id, lateness)
+                self.missed += 1
+                self._set_status(job_id, MISSED)
+                continue
+
+            task = asyncio.create_task(self._dispatch(job))
+            self._send_tasks.add(task)
+            task.add_done_callback(self._send_tasks.discard)
+
+    async def _dispatch(self, job: ScheduledJob) -> None:
+        async with self._semaphore:
+            try:
+                await self._send(job.chat_id, job.text)
+            except Exception as e:
+                logger.error("Erro ao enviar agendamento %s para %s: %s", job.id, job.chat_id, e)
+                self.failed += 1
+                self._set_status(job.id, FAILED)
+                return
+        self.dispatched += 1
+        self._set_status(job.id, SENT)
+
+    def stats(self) -> Dict[str, int]:
+        return {
+            # Do banco (índice jobs_pending): o heap ainda pode ter entradas canceladas
+            "pending": self._connect().execute(
+                "SELECT COUNT(*) FROM jobs WHERE status = ?", (PENDING,)
+            ).fetchone()[0],
+            "dispatched": self.dispatched,
+            "missed": self.missed,
+            "failed": self.failed,
+        }
+
+# Agendador usado pelo bot (iniciado no post_init)
+message_scheduler = MessageScheduler()
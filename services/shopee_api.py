@@ -1,21 +1,75 @@
 import os
-from dotenv import load_dotenv
+import asyncio
+from utils.env import load_env
 import time
 import hmac
 import hashlib
 import json
-import re
-from typing import Optional, Dict, Tuple
-from urllib.parse import urlparse, parse_qs, unquote
+import logging
+from functools import lru_cache
+from typing import Optional, Dict, Tuple, List, Hashable, Callable, Awaitable
+from urllib.parse import urljoin
 import aiohttp
+from services.http_client import get_http_session
+from services.cache import TTLCache, STALE
+from services.rate_limit import TokenBucket, RetryPolicy, CircuitBreaker, RateLimitExceeded
+from services.short_links import ShortLinkStore
+from services.price_history import price_history
+from utils.link_parser import extract_product_ids, is_short_url
+from utils.metrics import metrics
+
+# orjson (opcional) decodifica bem mais rápido; o json padrão também aceita bytes
+try:
+    import orjson
+    json_loads = orjson.loads
+except ImportError:
+    json_loads = json.loads
 
 # Carrega variáveis de ambiente
-load_dotenv()
+load_env()
+
+logger = logging.getLogger(__name__)
+# Dumps de cabeçalhos, payloads e respostas (DEBUG, com amostragem)
+payload_logger = logging.getLogger(f"{__name__}.payloads")
 
 # Configurações da API da Shopee
 PARTNER_ID = os.getenv('SHOPEE_PARTNER_ID')
 API_KEY = os.getenv('SHOPEE_API_KEY')
-API_URL = "https://open-api.affiliate.shopee.com.br/graphql"
+API_URL = os.getenv('SHOPEE_API_URL', "https://open-api.affiliate.shopee.com.br/graphql")
+PRODUCT_URL = "https://shopee.com.br/product/{shop_id}/{item_id}"
+SHORT_URL_MAX_HOPS = int(os.getenv('SHORT_URL_MAX_HOPS', '5'))
+# Bytes da resposta mostrados no dump de depuração
+PAYLOAD_LOG_LIMIT = int(os.getenv('PAYLOAD_LOG_LIMIT', '2000'))
+
+class ShopeeAPIUnavailable(Exception):
+    """A API está fora do ar, limitando as chamadas ou com o circuito aberto"""
+
+# Limite de taxa, novas tentativas e circuit breaker das chamadas à API
+api_rate_limiter = TokenBucket(
+    rate=float(os.getenv('SHOPEE_API_RATE', '5')),
+    capacity=float(os.getenv('SHOPEE_API_BURST', '10')),
+    max_waiters=int(os.getenv('SHOPEE_API_MAX_QUEUE', '200'))
+)
+api_retry_policy = RetryPolicy(
+    max_retries=int(os.getenv('SHOPEE_API_MAX_RETRIES', '3')),
+    base_delay=float(os.getenv('SHOPEE_API_RETRY_BASE', '0.5')),
+    max_delay=float(os.getenv('SHOPEE_API_RETRY_MAX', '8'))
+)
+api_circuit_breaker = CircuitBreaker(
+    failure_threshold=int(os.getenv('SHOPEE_API_BREAKER_THRESHOLD', '5')),
+    reset_timeout=float(os.getenv('SHOPEE_API_BREAKER_RESET', '30'))
+)
+
+# Cache de produtos por (shop_id, item_id)
+product_cache = TTLCache(
+    maxsize=int(os.getenv('PRODUCT_CACHE_SIZE', '1000')),
+    ttl=float(os.getenv('PRODUCT_CACHE_TTL', '300')),
+    stale_ttl=float(os.getenv('PRODUCT_CACHE_STALE_TTL', '3600'))
+)
+_refreshes = 0
+
+# Mapeamento persistente de links curtos (links curtos nunca mudam de destino)
+short_link_store = ShortLinkStore()
 
 def generate_auth_params(timestamp: int) -> Dict:
     """Gera os parâmetros de autenticação para a API da Shopee"""
@@ -33,210 +87,613 @@ def generate_auth_params(timestamp: int) -> Dict:
     }
 
 async def resolve_short_url(url: str) -> Optional[str]:
-    """Resolve URLs curtas da Shopee para a URL completa"""
+    """
+    Resolve URLs curtas da Shopee seguindo os redirecionamentos manualmente
+    Lê apenas o cabeçalho Location de cada salto (sem baixar a página do produto)
+    e para assim que encontra uma URL com os IDs do produto
+    """
     try:
         headers = {
             "User-Agent": "Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/91.0.4472.124 Safari/537.36"
         }
-        async with aiohttp.ClientSession() as session:
-            async with session.get(url, headers=headers, allow_redirects=True) as response:
+        session = get_http_session()
+        current = url
+        for _ in range(SHORT_URL_MAX_HOPS):
+            async with session.get(current, headers=headers, allow_redirects=False) as response:
+                if response.status in (301, 302, 303, 307, 308):
+                    location = response.headers.get("Location")
+                    if not location:
+                        logger.warning("Redirecionamento sem Location: %s", current)
+                        return None
+                    current = urljoin(current, location)
+                    if extract_product_info(current):
+                        logger.debug("URL resolvida: %s", current)
+                        return current
+                    continue
                 if response.status == 200:
-                    final_url = str(response.url)
-                    print(f"URL resolvida: {final_url}")
-                    return final_url
-                print(f"Erro ao resolver URL curta: Status {response.status}")
+                    logger.debug("URL resolvida: %s", current)
+                    return current
+                logger.warning("Erro ao resolver URL curta: Status %s", response.status)
                 return None
+        logger.warning("Limite de %s redirecionamentos atingido: %s", SHORT_URL_MAX_HOPS, url)
+        return None
     except Exception as e:
-        print(f"Erro ao resolver URL curta: {str(e)}")
+        logger.error("Erro ao resolver URL curta: %s", e)
+        return None
+
+async def _resolve_short_url_ids(url: str) -> Optional[Tuple[int, int]]:
+    resolved_url = await resolve_short_url(url)
+    if not resolved_url:
         return None
+    product_info = extract_product_info(resolved_url)
+    if product_info:
+        short_link_store.set(url, *product_info)
+    return product_info
+
+async def resolve_short_url_ids(url: str) -> Optional[Tuple[int, int]]:
+    """Resolve um link curto para (shop_id, item_id), consultando antes o mapeamento persistente"""
+    product_info = short_link_store.get(url)
+    if product_info:
+        return product_info
+    return await _short_url_flights.do(url, _resolve_short_url_ids, url)
+
+async def resolve_short_urls(urls: List[str]) -> Dict[str, Optional[Tuple[int, int]]]:
+    """Resolve vários links curtos em paralelo"""
+    unique_urls = list(dict.fromkeys(urls))
+    results = await asyncio.gather(*(resolve_short_url_ids(url) for url in unique_urls))
+    return dict(zip(unique_urls, results))
 
 def extract_product_info(url: str) -> Optional[Tuple[int, int]]:
     """
     Extrai shop_id e item_id do link da Shopee
-    Suporta vários formatos de URL da Shopee
+    Suporta vários formatos de URL da Shopee (ver utils/link_parser.py)
     """
     try:
-        # Remove parâmetros de query e decode a URL
-        clean_url = unquote(url.split('?')[0])
-        print(f"URL limpa: {clean_url}")
-        
-        # Padrões de extração de IDs
-        patterns = [
-            r"i\.(\d+)\.(\d+)",  # Formato curto (i.SHOP_ID.ITEM_ID)
-            r"product/(\d+)/(\d+)",  # Formato completo (/product/SHOP_ID/ITEM_ID)
-            r"-i\.(\d+)\.(\d+)",  # Formato alternativo (-i.SHOP_ID.ITEM_ID)
-            r"\.(\d+)\.(\d+)$",  # Formato no final da URL (.SHOP_ID.ITEM_ID)
-            r"(?:/|-)i\.(\d+)\.(\d+)(?:/|$)",  # Formato com prefixo/sufixo
-            r"(?:/|-)(\d+)\.(\d+)(?:/|$)",  # Formato numérico simples
-        ]
-        
-        # Tenta cada padrão
-        for pattern in patterns:
-            match = re.search(pattern, clean_url)
-            if match:
-                shop_id = int(match.group(1))
-                item_id = int(match.group(2))
-                print(f"IDs extraídos: shop_id={shop_id}, item_id={item_id}")
-                return shop_id, item_id
-        
-        # Se não encontrou com os padrões, tenta extrair da query string
-        parsed = urlparse(url)
-        query_params = parse_qs(parsed.query)
-        
-        if 'shop_id' in query_params and 'item_id' in query_params:
-            shop_id = int(query_params['shop_id'][0])
-            item_id = int(query_params['item_id'][0])
-            print(f"IDs extraídos da query: shop_id={shop_id}, item_id={item_id}")
-            return shop_id, item_id
-        
-        # Tenta extrair do final da URL
-        parts = clean_url.split('-i.')
-        if len(parts) > 1:
-            last_part = parts[-1]
-            id_parts = last_part.split('.')
-            if len(id_parts) >= 2:
-                try:
-                    shop_id = int(id_parts[0])
-                    item_id = int(id_parts[1].split('?')[0])
-                    print(f"IDs extraídos do final: shop_id={shop_id}, item_id={item_id}")
-                    return shop_id, item_id
-                except ValueError:
-                    pass
-            
-        print(f"Nenhum padrão conhecido encontrado na URL: {url}")
+        product_info = extract_product_ids(url)
+        if product_info:
+            logger.debug("IDs extraídos: shop_id=%s, item_id=%s", product_info[0], product_info[1])
+            return product_info
+        logger.debug("Nenhum padrão conhecido encontrado na URL: %s", url)
         return None
     except Exception as e:
-        print(f"Erro ao extrair IDs: {str(e)}")
+        logger.error("Erro ao extrair IDs: %s", e)
         return None
 
-async def get_product_details(url: str) -> Optional[Dict]:
-    """Obtém detalhes do produto usando a API GraphQL da Shopee"""
+# Perfis de campos pedidos ao getItemDetail: cada uso pede só o que mostra
+PROFILE_CARD = "card"    # Cartão do produto (format_product_message)
+PROFILE_PRICE = "price"  # Acompanhamento de preços
+PROFILE_FULL = "full"    # Tudo o que a API oferece
+
+ITEM_PROFILES = {
+    PROFILE_CARD: (
+        "name", "price", "price_before_discount", "raw_discount", "stock", "historical_sold",
+        "rating_star", "rating_count { count }", "shop_name", "description", "image",
+    ),
+    PROFILE_PRICE: ("name", "price"),
+    PROFILE_FULL: (
+        "itemid", "shopid", "name", "image", "images", "currency", "stock", "status", "ctime",
+        "sold", "historical_sold", "liked_count", "price", "price_min", "price_max",
+        "price_before_discount", "show_discount", "raw_discount", "discount", "shop_name",
+        "brand", "item_status", "price_min_before_discount", "price_max_before_discount",
+        "has_lowest_price_guarantee", "show_free_shipping", "description",
+        "attributes { name value }", "rating_star", "rating_count { rating count }",
+    ),
+}
+
+def _item_selection(profile: str) -> str:
+    return "item { " + " ".join(ITEM_PROFILES[profile]) + " }"
+
+# Consultas montadas uma única vez por perfil
+ITEM_QUERIES = {
+    profile: (
+        "query GetItemDetail($shopId: String!, $itemId: String!) { "
+        "getItemDetail(shopId: $shopId, itemId: $itemId) { " + _item_selection(profile) + " } }"
+    )
+    for profile in ITEM_PROFILES
+}
+
+GRAPHQL_BATCH_SIZE = int(os.getenv('GRAPHQL_BATCH_SIZE', '10'))
+GRAPHQL_BATCH_CONCURRENCY = int(os.getenv('GRAPHQL_BATCH_CONCURRENCY', '3'))
+
+@lru_cache(maxsize=None)
+def build_batch_query(count: int, profile: str = PROFILE_CARD) -> str:
+    """Monta uma consulta com `count` campos getItemDetail apelidados (item0, item1, ...)"""
+    params = ", ".join(f"$s{n}: String!, $i{n}: String!" for n in range(count))
+    selection = _item_selection(profile)
+    fields = " ".join(
+        f"item{n}: getItemDetail(shopId: $s{n}, itemId: $i{n}) {{ {selection} }}"
+        for n in range(count)
+    )
+    return f"query GetItemDetails({params}) {{ {fields} }}"
+
+def build_api_headers() -> Dict:
+    """Cabeçalhos autenticados para a API GraphQL"""
+    auth_params = generate_auth_params(int(time.time()))
+    return {
+        "Content-Type": "application/json",
+        # Respostas compactadas (o aiohttp descompacta ao ler)
+        "Accept-Encoding": "gzip, deflate",
+        "X-Shopee-Client-Id": auth_params["id"],
+        "X-Shopee-Client-Signature": auth_params["signature"],
+        "X-Shopee-Client-Timestamp": auth_params["timestamp"]
+    }
+
+class Product:
+    """Produto retornado pela API, no formato usado pelos handlers"""
+
+    __slots__ = ("id", "shop_id", "name", "price", "original_price", "discount", "stock",
+                 "description", "sales", "rating", "rating_count", "shop_name", "shop_rating", "image", "link")
+
+    def __init__(self, id: int, shop_id: int, name: str = '', price: float = 0.0,
+                 original_price: float = 0.0, discount: int = 0, stock: int = 0,
+                 description: str = '', sales: int = 0, rating: float = 0.0, rating_count: int = 0,
+                 shop_name: str = '', shop_rating: float = 5.0, image: str = '', link: str = ''):
+        self.id = id
+        self.shop_id = shop_id
+        self.name = name
+        self.price = price
+        self.original_price = original_price
+        self.discount = discount
+        self.stock = stock
+        self.description = description
+        self.sales = sales
+        self.rating = rating
+        self.rating_count = rating_count
+        self.shop_name = shop_name
+        self.shop_rating = shop_rating
+        # Hash da imagem principal no CDN da Shopee (services/product_images.py)
+        self.image = image
+        self.link = link
+
+    def with_link(self, link: str) -> "Product":
+        """Cópia com outro link (o cache guarda uma instância por produto)"""
+        product = Product.__new__(Product)
+        for name in Product.__slots__:
+            setattr(product, name, getattr(self, name))
+        product.link = link
+        return product
+
+    def __repr__(self) -> str:
+        return f"Product({self.shop_id}/{self.id}, {self.name!r}, R$ {self.price:.2f})"
+
+def parse_item(item: Dict, shop_id: int, item_id: int, url: str) -> Product:
+    """Converte o item retornado pela API (de qualquer perfil) num Product"""
+    return Product(
+        id=item_id,
+        shop_id=shop_id,
+        name=item.get('name', ''),
+        price=float(item.get('price', 0)) / 100000,  # Convertendo para reais
+        original_price=float(item.get('price_before_discount', 0)) / 100000,
+        discount=item.get('raw_discount', 0),
+        stock=item.get('stock', 0),
+        description=item.get('description', ''),
+        sales=item.get('historical_sold', 0),
+        rating=item.get('rating_star', 0),
+        rating_count=sum(rc.get('count', 0) for rc in item.get('rating_count') or ()),
+        shop_name=item.get('shop_name', ''),
+        shop_rating=5.0,  # Temporário
+        image=item.get('image') or '',
+        link=url,
+    )
+
+def _parse_retry_after(value: Optional[str]) -> Optional[float]:
     try:
-        # Se for uma URL curta, resolve para a URL completa
-        if 's.shopee' in url or 'shope.ee' in url:
-            print("Detectada URL curta, resolvendo...")
-            resolved_url = await resolve_short_url(url)
-            if resolved_url:
-                url = resolved_url
-                print(f"URL resolvida: {url}")
-            else:
-                print("Não foi possível resolver a URL curta")
+        return float(value) if value else None
+    except ValueError:
+        return None
+
+class _UpstreamFailure(Exception):
+    """Todas as tentativas falharam com 429/5xx ou erro de conexão"""
+
+async def _send_with_retries(payload: Dict) -> Optional[Dict]:
+    session = get_http_session()
+    last_error = None
+    for attempt in range(api_retry_policy.max_retries + 1):
+        retry_after = None
+        try:
+            await api_rate_limiter.acquire()
+        except RateLimitExceeded as e:
+            raise ShopeeAPIUnavailable(str(e)) from e
+
+        headers = build_api_headers()
+        # Dumps detalhados só em DEBUG e por amostragem (ver utils/log.py)
+        payload_logger.debug("Headers: %s", headers)
+        payload_logger.debug("Payload: %s", payload)
+
+        try:
+            # Faz a requisição GraphQL (sessão compartilhada, reaproveita conexões)
+            with metrics.phase("graphql_call"):
+                async with session.post(API_URL, headers=headers, json=payload) as response:
+                    body = await response.read()
+                    status = response.status
+                    retry_after = _parse_retry_after(response.headers.get("Retry-After"))
+        except (aiohttp.ClientError, asyncio.TimeoutError) as e:
+            logger.warning("Erro de conexão com a API: %s", e)
+            last_error = str(e) or type(e).__name__
+        else:
+            if payload_logger.isEnabledFor(logging.DEBUG):
+                payload_logger.debug("Resposta da API (%s bytes): %s", len(body),
+                                     body[:PAYLOAD_LOG_LIMIT].decode(errors="replace"))
+
+            if status == 200:
+                with metrics.phase("json_parse"):
+                    return json_loads(body)
+
+            logger.warning("Erro na requisição: Status %s", status)
+            metrics.record_error("graphql_call")
+            if not api_retry_policy.should_retry(status):
                 return None
+            last_error = f"status {status}"
 
-        # Extrai IDs do produto
-        product_info = extract_product_info(url)
-        if not product_info:
-            print(f"Não foi possível extrair IDs da URL: {url}")
-            return None
+        if attempt < api_retry_policy.max_retries:
+            await asyncio.sleep(api_retry_policy.delay(attempt, retry_after))
 
-        shop_id, item_id = product_info
-        
-        # Gera parâmetros de autenticação
-        timestamp = int(time.time())
-        auth_params = generate_auth_params(timestamp)
-        
-        # Query GraphQL
-        query = """
-        query GetItemDetail($shopId: String!, $itemId: String!) {
-            getItemDetail(shopId: $shopId, itemId: $itemId) {
-                item {
-                    itemid
-                    shopid
-                    name
-                    image
-                    images
-                    currency
-                    stock
-                    status
-                    ctime
-                    sold
-                    historical_sold
-                    liked_count
-                    price
-                    price_min
-                    price_max
-                    price_before_discount
-                    show_discount
-                    raw_discount
-                    discount
-                    shop_name
-                    brand
-                    item_status
-                    price_min_before_discount
-                    price_max_before_discount
-                    has_lowest_price_guarantee
-                    show_free_shipping
-                    description
-                    attributes {
-                        name
-                        value
-                    }
-                    rating_star
-                    rating_count {
-                        rating
-                        count
-                    }
-                }
-            }
-        }
-        """
-        
-        # Prepara a requisição
-        headers = {
-            "Content-Type": "application/json",
-            "X-Shopee-Client-Id": auth_params["id"],
-            "X-Shopee-Client-Signature": auth_params["signature"],
-            "X-Shopee-Client-Timestamp": auth_params["timestamp"]
-        }
-        
-        variables = {
-            "shopId": str(shop_id),
-            "itemId": str(item_id)
-        }
-        
+    raise _UpstreamFailure(last_error)
+
+async def post_graphql(payload: Dict) -> Optional[Dict]:
+    """
+    Envia uma consulta à API GraphQL e retorna o JSON da resposta (None para erros do cliente)
+    Passa pelo limitador de taxa, repete em 429/5xx com backoff e levanta ShopeeAPIUnavailable
+    quando a API está fora do ar, limitando as chamadas ou com o circuito aberto
+    """
+    if not api_circuit_breaker.allow():
+        raise ShopeeAPIUnavailable("API da Shopee indisponível (circuito aberto)")
+
+    try:
+        data = await _send_with_retries(payload)
+    except _UpstreamFailure as e:
+        api_circuit_breaker.record_failure()
+        raise ShopeeAPIUnavailable(f"API da Shopee indisponível ({e})") from e
+    except BaseException:
+        # Cancelamento ou fila cheia não dizem nada sobre a saúde da API
+        api_circuit_breaker.release()
+        raise
+
+    api_circuit_breaker.record_success()
+    return data
+
+def get_api_metrics() -> Dict[str, float]:
+    """Valores numéricos do limitador, das novas tentativas e do circuit breaker (para /metrics)"""
+    status = get_api_status()
+    limiter = status["rate_limiter"]
+    breaker = status["circuit_breaker"]
+    return {
+        "rate_limiter_tokens": limiter["tokens"],
+        "rate_limiter_waiting": limiter["waiting"],
+        "rate_limiter_rejected": limiter["rejected"],
+        "retries": status["retry"]["retries"],
+        "circuit_open": breaker["state"] != CircuitBreaker.CLOSED,
+        "circuit_failures": breaker["failures"],
+        "circuit_opened": breaker["opened"],
+        "circuit_rejected": breaker["rejected"],
+    }
+
+def get_api_status() -> Dict:
+    """Estado atual do limitador de taxa, das novas tentativas e do circuit breaker"""
+    return {
+        "rate_limiter": api_rate_limiter.status(),
+        "retry": api_retry_policy.status(),
+        "circuit_breaker": api_circuit_breaker.status(),
+    }
+
+def record_price(product: Product, profile: str) -> None:
+    """
+    Registra o preço consultado no histórico. O preço "de" só vai junto quando o perfil o
+    pediu (sem ele, o histórico mantém o último conhecido). Falhas no histórico (disco cheio,
+    mmap) só vão para o log: a consulta à API já deu certo
+    """
+    original = product.original_price if "price_before_discount" in ITEM_PROFILES[profile] else None
+    try:
+        price_history.record(product.shop_id, product.id, product.price, original)
+    except Exception as e:
+        logger.error("Erro ao registrar o preço de %s/%s no histórico: %s", product.shop_id, product.id, e)
+
+async def fetch_item_details(shop_id: int, item_id: int, url: str,
+                             profile: str = PROFILE_CARD) -> Optional[Product]:
+    """Consulta a API GraphQL da Shopee (sem cache)"""
+    try:
         payload = {
-            "query": query,
-            "variables": variables
+            "query": ITEM_QUERIES[profile],
+            "variables": {
+                "shopId": str(shop_id),
+                "itemId": str(item_id)
+            }
         }
-        
-        print(f"Headers: {json.dumps(headers, indent=2)}")
-        print(f"Payload: {json.dumps(payload, indent=2)}")
-        
-        # Faz a requisição GraphQL
-        async with aiohttp.ClientSession() as session:
-            async with session.post(API_URL, headers=headers, json=payload) as response:
-                response_text = await response.text()
-                print(f"Resposta da API: {response_text}")
-                
-                if response.status == 200:
-                    data = json.loads(response_text)
-                    if "errors" in data:
-                        print(f"Erro na resposta GraphQL: {data['errors']}")
-                        return None
-                        
-                    if data.get("data", {}).get("getItemDetail", {}).get("item"):
-                        item = data["data"]["getItemDetail"]["item"]
-                        return {
-                            'id': item_id,
-                            'name': item.get('name', ''),
-                            'price': float(item.get('price', 0)) / 100000,  # Convertendo para reais
-                            'original_price': float(item.get('price_before_discount', 0)) / 100000,
-                            'discount': item.get('raw_discount', 0),
-                            'stock': item.get('stock', 0),
-                            'description': item.get('description', ''),
-                            'sales': item.get('historical_sold', 0),
-                            'rating': item.get('rating_star', 0),
-                            'rating_count': sum(rc.get('count', 0) for rc in item.get('rating_count', [])),
-                            'shop_name': item.get('shop_name', ''),
-                            'shop_rating': 5.0,  # Temporário
-                            'link': url
-                        }
-                    
-                    print("Dados do produto não encontrados na resposta")
-                else:
-                    print(f"Erro na requisição: Status {response.status}")
-                
+        data = await post_graphql(payload)
+        if data is None:
+            return None
+
+        if "errors" in data:
+            logger.warning("Erro na resposta GraphQL: %s", data['errors'])
+            return None
+
+        item = ((data.get("data") or {}).get("getItemDetail") or {}).get("item")
+        if item:
+            product = parse_item(item, shop_id, item_id, url)
+            record_price(product, profile)
+            return product
+
+        logger.info("Dados do produto não encontrados na resposta")
+        return None
+    except ShopeeAPIUnavailable:
+        raise
+    except Exception as e:
+        logger.error("Erro ao buscar produto: %s", e)
         return None
+
+async def _fetch_items_chunk(keys: List[Tuple[int, int]], semaphore: asyncio.Semaphore,
+                             profile: str) -> Dict[Tuple[int, int], Product]:
+    async with semaphore:
+        try:
+            variables = {}
+            for n, (shop_id, item_id) in enumerate(keys):
+                variables[f"s{n}"] = str(shop_id)
+                variables[f"i{n}"] = str(item_id)
+            data = await post_graphql({"query": build_batch_query(len(keys), profile), "variables": variables})
+            if data is None:
+                return {}
+
+            # Erros parciais não invalidam os itens que vieram na resposta
+            if "errors" in data:
+                logger.warning("Erro na resposta GraphQL: %s", data['errors'])
+
+            results = {}
+            fields = data.get("data") or {}
+            for n, (shop_id, item_id) in enumerate(keys):
+                item = (fields.get(f"item{n}") or {}).get("item")
+                if item:
+                    url = PRODUCT_URL.format(shop_id=shop_id, item_id=item_id)
+                    product = parse_item(item, shop_id, item_id, url)
+                    record_price(product, profile)
+                    results[(shop_id, item_id)] = product
+            return results
+        except ShopeeAPIUnavailable:
+            raise
+        except Exception as e:
+            logger.error("Erro ao buscar produtos em lote: %s", e)
+            return {}
+
+async def fetch_items_details(keys: List[Tuple[int, int]],
+                              profile: str = PROFILE_CARD) -> Dict[Tuple[int, int], Product]:
+    """
+    Consulta vários produtos (sem cache) com consultas GraphQL agrupadas
+    Lotes de até GRAPHQL_BATCH_SIZE itens, no máximo GRAPHQL_BATCH_CONCURRENCY lotes em paralelo
+    """
+    semaphore = asyncio.Semaphore(GRAPHQL_BATCH_CONCURRENCY)
+    chunks = [keys[i:i + GRAPHQL_BATCH_SIZE] for i in range(0, len(keys), GRAPHQL_BATCH_SIZE)]
+    results = {}
+    for chunk_results in await asyncio.gather(*(_fetch_items_chunk(chunk, semaphore, profile) for chunk in chunks)):
+        results.update(chunk_results)
+    return results
+
+class SingleFlight:
+    """
+    Agrupa chamadas concorrentes com a mesma chave numa única execução
+    Todos os chamadores aguardam o mesmo resultado (ou a mesma exceção); nada é guardado após o término.
+    Uma chamada abandonada por todos que a esperavam é cancelada (as de segundo plano continuam)
+    """
+
+    def __init__(self):
+        self._calls: Dict[Hashable, asyncio.Task] = {}
+        # Chamada -> quantos a esperam (as de segundo plano não entram)
+        self._waiters: Dict[asyncio.Task, int] = {}
+        self.calls = 0
+        self.shared = 0
+        self.abandoned = 0
+
+    def __contains__(self, key: Hashable) -> bool:
+        return key in self._calls
+
+    def __len__(self) -> int:
+        return len(self._calls)
+
+    def join(self, key: Hashable) -> Optional[asyncio.Task]:
+        """Retorna a chamada em andamento para a chave, se houver"""
+        task = self._calls.get(key)
+        if task is not None:
+            self.shared += 1
+        return task
+
+    def start(self, key: Hashable, func: Callable[..., Awaitable], *args,
+              background: bool = False) -> asyncio.Task:
+        """Inicia a chamada para a chave, ou retorna a que já está em andamento"""
+        task = self._calls.get(key)
+        if task is not None:
+            self.shared += 1
+            return task
+
+        self.calls += 1
+        task = asyncio.ensure_future(func(*args))
+        self._calls[key] = task
+        if not background:
+            self._waiters[task] = 0
+
+        def done(finished: asyncio.Task):
+            if self._calls.get(key) is finished:
+                del self._calls[key]
+            self._waiters.pop(finished, None)
+            # Evita aviso de exceção não recuperada quando todos os chamadores desistiram
+            if not finished.cancelled():
+                finished.exception()
+
+        task.add_done_callback(done)
+        return task
+
+    async def wait(self, *tasks: asyncio.Task) -> list:
+        """Espera as chamadas; as que ficarem sem ninguém esperando (cancelamento) são canceladas"""
+        for task in tasks:
+            if task in self._waiters:
+                self._waiters[task] += 1
+        try:
+            # shield: o cancelamento de um chamador não cancela quem ainda espera a mesma chamada
+            return await asyncio.gather(*(asyncio.shield(task) for task in tasks))
+        finally:
+            for task in tasks:
+                if task in self._waiters:
+                    self._waiters[task] -= 1
+                    if self._waiters[task] == 0 and not task.done():
+                        self.abandoned += 1
+                        task.cancel()
+
+    async def do(self, key: Hashable, func: Callable[..., Awaitable], *args):
+        """Executa func(*args) uma única vez por chave entre chamadores concorrentes"""
+        return (await self.wait(self.start(key, func, *args)))[0]
+
+    def stats(self) -> Dict[str, int]:
+        return {"in_flight": len(self._calls), "calls": self.calls, "shared": self.shared,
+                "abandoned": self.abandoned}
+
+# Consultas em andamento por (shop_id, item_id) e por URL curta
+_item_flights = SingleFlight()
+_short_url_flights = SingleFlight()
+
+async def _load_item(shop_id: int, item_id: int, url: str) -> Optional[Product]:
+    """Consulta a API e guarda o produto no cache (falhas nunca são guardadas)"""
+    product = await fetch_item_details(shop_id, item_id, url)
+    if product:
+        product_cache.set((shop_id, item_id), product)
+    return product
+
+def _schedule_refresh(shop_id: int, item_id: int, url: str) -> None:
+    """Atualiza em segundo plano uma entrada vencida do cache"""
+    global _refreshes
+    key = (shop_id, item_id)
+    if key in _item_flights:
+        return
+    _refreshes += 1
+    _item_flights.start(key, _load_item, shop_id, item_id, url, background=True)
+
+def get_cache_stats() -> Dict[str, int]:
+    """Contadores do cache de produtos (hits, misses, despejos, atualizações, chamadas agrupadas)"""
+    stats = product_cache.stats()
+    stats["refreshes"] = _refreshes
+    stats["item_lookups"] = _item_flights.calls
+    stats["item_lookups_shared"] = _item_flights.shared
+    stats["item_lookups_abandoned"] = _item_flights.abandoned
+    stats["short_url_lookups"] = _short_url_flights.calls
+    stats["short_url_lookups_shared"] = _short_url_flights.shared
+    stats["short_url_lookups_abandoned"] = _short_url_flights.abandoned
+    return stats
+
+async def get_product_details(url: str) -> Optional[Product]:
+    """Obtém detalhes do produto usando a API GraphQL da Shopee, com cache por (shop_id, item_id)"""
+    try:
+        # Se for uma URL curta, resolve para os IDs do produto (sem rede se já conhecida)
+        if is_short_url(url):
+            logger.debug("Detectada URL curta, resolvendo...")
+            with metrics.phase("short_url_resolution"):
+                product_info = await resolve_short_url_ids(url)
+            if not product_info:
+                logger.info("Não foi possível resolver a URL curta: %s", url)
+                return None
+            url = PRODUCT_URL.format(shop_id=product_info[0], item_id=product_info[1])
+        else:
+            # Extrai IDs do produto
+            with metrics.phase("id_extraction"):
+                product_info = extract_product_info(url)
+            if not product_info:
+                logger.info("Não foi possível extrair IDs da URL: %s", url)
+                return None
+
+        shop_id, item_id = product_info
+
+        # Responde do cache; entradas vencidas são servidas enquanto atualizam em segundo plano
+        cached, state = product_cache.get(product_info)
+        if cached is not None:
+            if state == STALE:
+                _schedule_refresh(shop_id, item_id, url)
+            return cached.with_link(url)
+
+        # Consultas simultâneas do mesmo produto compartilham uma única chamada à API
+        product = await _item_flights.do(product_info, _load_item, shop_id, item_id, url)
+        if product:
+            return product.with_link(url)
+        return None
+    except ShopeeAPIUnavailable:
+        raise
+    except Exception as e:
+        logger.error("Erro ao buscar produto: %s", e)
+        return None
+
+async def _load_items(keys: List[Tuple[int, int]]) -> Dict[Tuple[int, int], Product]:
+    """Consulta um lote de produtos e guarda no cache os encontrados"""
+    products = await fetch_items_details(keys)
+    for key, product in products.items():
+        product_cache.set(key, product)
+    return products
+
+async def _pick_from_batch(batch: asyncio.Future, key: Tuple[int, int]) -> Optional[Product]:
+    return (await batch).get(key)
+
+def _cancel_when_abandoned(batch: asyncio.Future, picks: List[asyncio.Task]) -> None:
+    """Cancela o lote se todas as consultas que dependem dele forem canceladas antes do fim"""
+    remaining = len(picks)
+
+    def done(_):
+        nonlocal remaining
+        remaining -= 1
+        if remaining == 0 and not batch.done():
+            batch.cancel()
+
+    for pick in picks:
+        pick.add_done_callback(done)
+
+async def get_products_details(urls: List[str]) -> List[Optional[Product]]:
+    """
+    Obtém vários produtos de uma vez, na ordem das URLs (None para os não encontrados)
+    Usa o cache primeiro e busca todo o restante numa única rodada de consultas em lote
+    """
+    try:
+        # Resolve todos os links curtos em paralelo
+        short_urls = [url for url in urls if is_short_url(url)]
+        resolved = {}
+        if short_urls:
+            with metrics.phase("short_url_resolution"):
+                resolved = await resolve_short_urls(short_urls)
+
+        keys = []
+        links = []
+        for url in urls:
+            if is_short_url(url):
+                product_info = resolved.get(url)
+                link = PRODUCT_URL.format(shop_id=product_info[0], item_id=product_info[1]) if product_info else url
+            else:
+                with metrics.phase("id_extraction"):
+                    product_info = extract_product_info(url)
+                link = url
+            keys.append(product_info)
+            links.append(link)
+
+        products = {}
+        pending = {}
+        missing = []
+        for key in dict.fromkeys(key for key in keys if key):
+            cached, state = product_cache.get(key)
+            if cached is not None:
+                products[key] = cached
+                if state == STALE:
+                    _schedule_refresh(key[0], key[1], PRODUCT_URL.format(shop_id=key[0], item_id=key[1]))
+            elif key in _item_flights:
+                # Já está sendo consultado por outra mensagem
+                pending[key] = _item_flights.join(key)
+            else:
+                missing.append(key)
+
+        # Os faltantes viram um lote; cada chave fica registrada como consulta em andamento
+        if missing:
+            batch = asyncio.ensure_future(_load_items(missing))
+            picks = [_item_flights.start(key, _pick_from_batch, batch, key) for key in missing]
+            pending.update(zip(missing, picks))
+            _cancel_when_abandoned(batch, picks)
+
+        products.update(zip(pending, await _item_flights.wait(*pending.values())))
+
+        return [
+            products[key].with_link(link) if key and products.get(key) else None
+            for key, link in zip(keys, links)
+        ]
+    except ShopeeAPIUnavailable:
+        raise
     except Exception as e:
-        print(f"Erro ao buscar produto: {str(e)}")
-        return None
\ No newline at end of file
+        logger.error("Erro ao buscar produtos: %s", e)
+        return [None] * len(urls)
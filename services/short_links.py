@@ -0,0 +1,65 @@
+import os
+import sqlite3
+from utils.env import load_env
+from typing import Optional, Tuple
+from services.cache import TTLCache
+
+# Carrega variáveis de ambiente
+load_env()
+
+DATA_DIR = os.getenv('DATA_DIR', 'data')
+SHORT_LINKS_DB = os.getenv('SHORT_LINKS_DB', os.path.join(DATA_DIR, 'short_links.sqlite3'))
+
+class ShortLinkStore:
+    """
+    Mapeamento persistente link curto -> (shop_id, item_id)
+    Links curtos não mudam de destino, então as entradas nunca expiram
+    """
+
+    def __init__(self, path: str = SHORT_LINKS_DB, memory_size: int = 10000):
+        self.path = path
+        self._conn: Optional[sqlite3.Connection] = None
+        # Frente em memória para os links mais repetidos
+        self._memory = TTLCache(maxsize=memory_size, ttl=float('inf'))
+
+    def _connect(self) -> sqlite3.Connection:
+        if self._conn is None:
+            if self.path != ':memory:':
+                os.makedirs(os.path.dirname(self.path) or '.', exist_ok=True)
+            self._conn = sqlite3.connect(self.path)
+            self._conn.execute(
+                "CREATE TABLE IF NOT EXISTS short_links ("
+                " url TEXT PRIMARY KEY,"
+                " shop_id INTEGER NOT NULL,"
+                " item_id INTEGER NOT NULL"
+                ")"
+            )
+            self._conn.commit()
+        return self._conn
+
+    def get(self, url: str) -> Optional[Tuple[int, int]]:
+        ids, _ = self._memory.get(url)
+        if ids is not None:
+            return ids
+        row = self._connect().execute(
+            "SELECT shop_id, item_id FROM short_links WHERE url = ?", (url,)
+        ).fetchone()
+        if row is None:
+            return None
+        ids = (row[0], row[1])
+        self._memory.set(url, ids)
+        return ids
+
+    def set(self, url: str, shop_id: int, item_id: int) -> None:
+        self._memory.set(url, (shop_id, item_id))
+        conn = self._connect()
+        conn.execute(
+            "INSERT OR REPLACE INTO short_links (url, shop_id, item_id) VALUES (?, ?, ?)",
+            (url, shop_id, item_id)
+        )
+        conn.commit()
+
+    def close(self) -> None:
+        if self._conn is not None:
+            self._conn.close()
+            self._conn = None
@@ -0,0 +1,167 @@
+"""
+Processamento concorrente de updates com ordem garantida por chat
+
+O PTB processa um update por vez por padrão: uma busca de produto lenta (link curto +
+GraphQL) segura o /start e os menus de todos os outros chats. Com o ChatUpdateProcessor,
+chats diferentes rodam em paralelo e os updates de um mesmo chat continuam em ordem.
+Cliques em botões (callback queries) têm fila própria no chat e furam a fila global, então
+um menu não espera atrás de buscas de links. Consultas inline também furam a fila, mas não
+têm ordem: cada uma substitui a anterior do usuário (handlers/inline.py cancela a velha).
+
+UpdateQueue mantém a contrapressão da fila limitada: com processamento concorrente o PTB
+tira os updates da fila assim que chegam, então o limite conta também os em processamento.
+"""
+import asyncio
+import os
+from collections import deque
+from typing import Awaitable, Dict, Optional, Tuple
+from utils.env import load_env
+from telegram import Update
+from telegram.ext import BaseUpdateProcessor
+
+# Carrega variáveis de ambiente
+load_env()
+
+# Updates na fila ou em processamento (webhook e polling esperam quando chega no limite)
+UPDATE_QUEUE_SIZE = int(os.getenv('UPDATE_QUEUE_SIZE', '1000'))
+# Updates processados ao mesmo tempo
+UPDATE_CONCURRENCY = int(os.getenv('UPDATE_CONCURRENCY', '32'))
+# Vagas reservadas para callback queries (mensagens usam no máximo CONCURRENCY - RESERVED)
+UPDATE_PRIORITY_SLOTS = int(os.getenv('UPDATE_PRIORITY_SLOTS', '4'))
+
+class UpdateQueue(asyncio.Queue):
+    """Fila de updates cujo limite conta os updates na fila e os ainda em processamento"""
+
+    def __init__(self, maxsize: int = UPDATE_QUEUE_SIZE):
+        # A fila interna não tem limite; o limite vale para os não concluídos (task_done)
+        super().__init__()
+        self.limit = maxsize
+        self.unfinished = 0
+        self._room = asyncio.Event()
+
+    def full(self) -> bool:
+        return self.unfinished >= self.limit
+
+    async def put(self, item) -> None:
+        while self.full():
+            self._room.clear()
+            await self._room.wait()
+        self.put_nowait(item)
+
+    def put_nowait(self, item) -> None:
+        if self.full():
+            raise asyncio.QueueFull
+        super().put_nowait(item)
+        self.unfinished += 1
+
+    def task_done(self) -> None:
+        super().task_done()
+        self.unfinished -= 1
+        self._room.set()
+
+class ChatUpdateProcessor(BaseUpdateProcessor):
+    """
+    Updates de chats diferentes em paralelo, os de um mesmo chat em ordem
+
+    Ordem: cada update espera o anterior da mesma fila do chat (mensagens e callback
+    queries têm filas separadas; um clique é sempre num botão que o bot já enviou).
+    Consultas inline não entram em fila nenhuma.
+    Concorrência: no máximo max_concurrent_updates rodando; callback queries e consultas
+    inline passam na frente das mensagens e só elas usam as priority_slots vagas reservadas.
+    """
+
+    def __init__(self, max_concurrent_updates: int = UPDATE_CONCURRENCY,
+                 priority_slots: int = UPDATE_PRIORITY_SLOTS, max_pending: int = UPDATE_QUEUE_SIZE):
+        # O semáforo da classe base limita os updates admitidos (rodando ou esperando a vez);
+        # quantos rodam de fato é controlado aqui
+        super().__init__(max(2, max_pending))
+        self.concurrency = max_concurrent_updates
+        self.normal_limit = max(1, max_concurrent_updates - priority_slots)
+        self.running = 0
+        self._urgent: deque = deque()
+        self._normal: deque = deque()
+        # Última vez da fila de cada chat: (chat, é callback) -> future concluída quando ele termina
+        self._tails: Dict[Tuple[int, bool], asyncio.Future] = {}
+        self.processed = 0
+
+    @staticmethod
+    def _key(update: object) -> Tuple[Optional[Tuple[int, bool]], bool]:
+        """(fila do chat, prioridade) do update"""
+        if not isinstance(update, Update):
+            return None, False
+        if update.inline_query is not None:
+            # A consulta nova não pode esperar a que ela substitui
+            return None, True
+        urgent = update.callback_query is not None
+        chat = update.effective_chat or update.effective_user
+        return ((chat.id, urgent) if chat else None), urgent
+
+    async def do_process_update(self, update: object, coroutine: Awaitable) -> None:
+        key, urgent = self._key(update)
+        previous = self._tails.get(key) if key is not None else None
+        turn = asyncio.get_running_loop().create_future()
+        if key is not None:
+            self._tails[key] = turn
+        started = False
+        try:
+            if previous is not None:
+                # asyncio.wait não cancela a vez do anterior se este for cancelado
+                await asyncio.wait([previous])
+            await self._acquire(urgent)
+            try:
+                started = True
+                await coroutine
+            finally:
+                self._release()
+        finally:
+            if not started:
+                coroutine.close()
+            turn.set_result(None)
+            if self._tails.get(key) is turn:
+                del self._tails[key]
+            self.processed += 1
+
+    async def _acquire(self, urgent: bool) -> None:
+        waiting = self._urgent if urgent else self._normal
+        limit = self.concurrency if urgent else self.normal_limit
+        # Só entra direto se ninguém com a mesma prioridade (ou maior) estiver esperando
+        if self.running < limit and not waiting and not (self._urgent and not urgent):
+            self.running += 1
+            return
+        slot = asyncio.get_running_loop().create_future()
+        waiting.append(slot)
+        try:
+            await slot
+        except asyncio.CancelledError:
+            if slot.done() and not slot.cancelled():
+                # A vaga já tinha sido entregue: devolve
+                self._release()
+            else:
+                waiting.remove(slot)
+            raise
+
+    def _release(self) -> None:
+        self.running -= 1
+        # Entrega a vaga liberada: callback queries primeiro
+        while self._urgent and self.running < self.concurrency:
+            self.running += 1
+            self._urgent.popleft().set_result(None)
+        while self._normal and not self._urgent and self.running < self.normal_limit:
+            self.running += 1
+            self._normal.popleft().set_result(None)
+
+    async def initialize(self) -> None:
+        pass
+
+    async def shutdown(self) -> None:
+        # Application.stop() já espera a fila esvaziar e os updates em processamento terminarem
+        pass
+
+    def stats(self) -> Dict[str, int]:
+        return {
+            "running": self.running,
+            "waiting_urgent": len(self._urgent),
+            "waiting_normal": len(self._normal),
+            "chats": len(self._tails),
+            "processed": self.processed,
+        }
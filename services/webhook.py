@@ -0,0 +1,153 @@
+"""
+Recebimento de updates por webhook (alternativa ao run_polling)
+
+Um servidor aiohttp local recebe os POSTs do Telegram, confere o secret token e coloca
+os updates na fila do Application. A fila é limitada: cheia, o POST espera até
+WEBHOOK_ENQUEUE_TIMEOUT e então responde 503, e o Telegram reenvia depois. Ao encerrar,
+o servidor para de aceitar updates e a fila é processada até o fim antes do shutdown.
+"""
+import asyncio
+import hmac
+import logging
+import os
+import secrets
+import signal
+from typing import Dict, Optional
+from aiohttp import web
+from utils.env import load_env
+from telegram import Update
+from telegram.ext import Application
+
+# Carrega variáveis de ambiente
+load_env()
+
+logger = logging.getLogger(__name__)
+
+# URL pública (https) que o Telegram chama; definida, o bot roda em modo webhook
+WEBHOOK_URL = os.getenv('WEBHOOK_URL')
+WEBHOOK_SECRET = os.getenv('WEBHOOK_SECRET')
+WEBHOOK_HOST = os.getenv('WEBHOOK_HOST', '0.0.0.0')
+WEBHOOK_PORT = int(os.getenv('WEBHOOK_PORT', os.getenv('PORT', '8080')))
+WEBHOOK_PATH = os.getenv('WEBHOOK_PATH', 'telegram')
+WEBHOOK_MAX_CONNECTIONS = int(os.getenv('WEBHOOK_MAX_CONNECTIONS', '40'))
+WEBHOOK_ENQUEUE_TIMEOUT = float(os.getenv('WEBHOOK_ENQUEUE_TIMEOUT', '5'))
+
+SECRET_HEADER = "X-Telegram-Bot-Api-Secret-Token"
+
+class WebhookServer:
+    """Servidor HTTP que entrega os updates do Telegram na fila do Application"""
+
+    def __init__(self, application: Application, secret: str, host: str = WEBHOOK_HOST,
+                 port: int = WEBHOOK_PORT, path: str = WEBHOOK_PATH,
+                 enqueue_timeout: float = WEBHOOK_ENQUEUE_TIMEOUT):
+        self.application = application
+        self.secret = secret
+        self.host = host
+        self.port = port
+        self.path = "/" + path.strip("/")
+        self.enqueue_timeout = enqueue_timeout
+        self.accepting = False
+        self._runner = None
+        self.received = 0
+        self.rejected = 0
+        self.unauthorized = 0
+
+    async def handle(self, request: web.Request) -> web.Response:
+        if not self.accepting:
+            return web.Response(status=503, headers={"Retry-After": "1"})
+        if not hmac.compare_digest(request.headers.get(SECRET_HEADER, ""), self.secret):
+            self.unauthorized += 1
+            logger.warning("POST no webhook com secret token inválido (%s)", request.remote)
+            return web.Response(status=403)
+        try:
+            update = Update.de_json(await request.json(), self.application.bot)
+        except Exception as e:
+            logger.warning("Update inválido recebido no webhook: %s", e)
+            return web.Response(status=400)
+
+        # Fila cheia: segura o POST por um tempo; se não abrir vaga, o Telegram reenvia depois
+        try:
+            await asyncio.wait_for(self.application.update_queue.put(update), timeout=self.enqueue_timeout)
+        except asyncio.TimeoutError:
+            self.rejected += 1
+            return web.Response(status=503, headers={"Retry-After": "1"})
+        self.received += 1
+        return web.Response()
+
+    async def start(self) -> None:
+        app = web.Application()
+        app.router.add_post(self.path, self.handle)
+        self._runner = web.AppRunner(app, access_log=None)
+        await self._runner.setup()
+        site = web.TCPSite(self._runner, self.host, self.port)
+        await site.start()
+        self.port = self._runner.addresses[0][1]
+        self.accepting = True
+        logger.info("Webhook ouvindo em http://%s:%s%s", self.host, self.port, self.path)
+
+    async def stop(self) -> None:
+        """Para de aceitar updates e espera os POSTs em andamento terminarem"""
+        self.accepting = False
+        if self._runner is not None:
+            await self._runner.cleanup()
+            self._runner = None
+
+    def stats(self) -> Dict[str, int]:
+        return {
+            "received": self.received,
+            "rejected": self.rejected,
+            "unauthorized": self.unauthorized,
+            "queue_size": self.application.update_queue.qsize(),
+        }
+
+async def serve_webhook(application: Application, url: str, secret: Optional[str] = None,
+                        stop_event: Optional[asyncio.Event] = None, **server_options) -> None:
+    """
+    Ciclo de vida completo em modo webhook, na mesma ordem do run_polling:
+    initialize -> post_init -> setWebhook -> start ... stop -> post_stop -> shutdown -> post_shutdown
+    """
+    # Sem segredo configurado, gera um por execução (o setWebhook abaixo o registra no Telegram)
+    secret = secret or WEBHOOK_SECRET or secrets.token_urlsafe(32)
+    server = WebhookServer(application, secret, **server_options)
+    stop_event = stop_event or asyncio.Event()
+
+    loop = asyncio.get_running_loop()
+    for sig in (signal.SIGINT, signal.SIGTERM):
+        try:
+            loop.add_signal_handler(sig, stop_event.set)
+        except (NotImplementedError, RuntimeError):
+            pass
+
+    await application.initialize()
+    try:
+        if application.post_init:
+            await application.post_init(application)
+        await server.start()
+        await application.bot.set_webhook(
+            url=url.rstrip("/") + server.path,
+            secret_token=secret,
+            max_connections=WEBHOOK_MAX_CONNECTIONS,
+            drop_pending_updates=True,
+        )
+        await application.start()
+        logger.info("Bot rodando em modo webhook")
+
+        await stop_event.wait()
+
+        # Encerramento: recusa novos updates, termina os POSTs em andamento e processa a fila
+        logger.info("Encerrando: %s updates na fila", application.update_queue.qsize())
+        await server.stop()
+        await application.stop()
+        if application.post_stop:
+            await application.post_stop(application)
+    finally:
+        await server.stop()
+        if application.running:
+            await application.stop()
+        await application.shutdown()
+        if application.post_shutdown:
+            await application.post_shutdown(application)
+
+def run_webhook(application: Application, url: str = WEBHOOK_URL, **options) -> None:
+    """Equivalente ao application.run_polling() para o modo webhook"""
+    asyncio.run(serve_webhook(application, url, **options))
@@ -0,0 +1,11 @@
+"""Variáveis de ambiente do .env, lidas uma única vez por processo"""
+from dotenv import load_dotenv
+
+_loaded = False
+
+def load_env() -> None:
+    """Carrega o .env na primeira chamada; as seguintes não leem o arquivo de novo"""
+    global _loaded
+    if not _loaded:
+        load_dotenv()
+        _loaded = True
@@ -0,0 +1,80 @@
+"""
+Reconhecimento de links da Shopee em textos e extração dos IDs do produto
+
+Todas as expressões são compiladas uma única vez na importação. Antes de qualquer
+regex, um teste de substring descarta os textos sem links (a maioria das mensagens dos grupos).
+"""
+import re
+from typing import List, Optional, Tuple
+from urllib.parse import urlparse, parse_qs, unquote
+
+# Todo link aceito contém "shope" (shopee.com.br, shope.ee, s.shopee)
+LINK_HINT = 'shope'
+
+# Um único padrão para os três formatos de link aceitos:
+# qualquer URL com shopee.com.br, links curtos shope.ee e s.shopee
+SHOPEE_URL_RE = re.compile(
+    r'https?://(?:[^\s<>"]*?shopee\.com\.br|shope\.ee|s\.shopee)[^\s<>"]+'
+)
+
+# Padrões de extração de IDs, em ordem de prioridade
+PRODUCT_ID_PATTERNS = [
+    re.compile(r"i\.(\d+)\.(\d+)"),  # Formato curto (i.SHOP_ID.ITEM_ID), cobre também -i. e /i.
+    re.compile(r"product/(\d+)/(\d+)"),  # Formato completo (/product/SHOP_ID/ITEM_ID)
+    re.compile(r"\.(\d+)\.(\d+)$"),  # Formato no final da URL (.SHOP_ID.ITEM_ID)
+    re.compile(r"(?:/|-)(\d+)\.(\d+)(?:/|$)"),  # Formato numérico simples
+]
+
+def has_shopee_link(text: str) -> bool:
+    """Verifica se o texto contém algum link da Shopee"""
+    if not text or LINK_HINT not in text:
+        return False
+    return SHOPEE_URL_RE.search(text) is not None
+
+def extract_shopee_urls(text: str, limit: int = 10) -> List[str]:
+    """Extrai as URLs da Shopee do texto, na ordem em que aparecem, sem repetição e sem parâmetros"""
+    if not text or LINK_HINT not in text:
+        return []
+
+    urls = []
+    for match in SHOPEE_URL_RE.finditer(text):
+        # Remove parâmetros desnecessários da URL
+        clean_url = match.group(0).split('?', 1)[0]
+        if clean_url not in urls:
+            urls.append(clean_url)
+            if len(urls) >= limit:
+                break
+    return urls
+
+def extract_shopee_url(text: str) -> Optional[str]:
+    """Extrai a primeira URL da Shopee do texto"""
+    if not text or LINK_HINT not in text:
+        return None
+    match = SHOPEE_URL_RE.search(text)
+    if match:
+        return match.group(0).split('?', 1)[0]
+    return None
+
+def is_short_url(url: str) -> bool:
+    """Indica se é um link curto da Shopee (shope.ee / s.shopee)"""
+    return 's.shopee' in url or 'shope.ee' in url
+
+def extract_product_ids(url: str) -> Optional[Tuple[int, int]]:
+    """Extrai (shop_id, item_id) de uma URL de produto da Shopee"""
+    path = url.split('?', 1)[0]
+    if '%' in path:
+        path = unquote(path)
+
+    for pattern in PRODUCT_ID_PATTERNS:
+        match = pattern.search(path)
+        if match:
+            return int(match.group(1)), int(match.group(2))
+
+    # Se não encontrou com os padrões, tenta extrair da query string
+    if 'shop_id' in url and 'item_id' in url:
+        query_params = parse_qs(urlparse(url).query)
+        try:
+            return int(query_params['shop_id'][0]), int(query_params['item_id'][0])
+        except (KeyError, ValueError):
+            return None
+    return None
@@ -0,0 +1,99 @@
+"""
+Configuração de logging do bot
+
+Os handlers do loop de eventos só enfileiram o registro (QueueHandler); a formatação,
+a remoção de credenciais e a escrita no stdout acontecem na thread do QueueListener.
+"""
+import atexit
+import logging
+import logging.handlers
+import os
+import queue
+import random
+import re
+import sys
+from typing import Iterable, Optional
+
+LOG_FORMAT = '%(asctime)s - %(name)s - %(levelname)s - %(message)s'
+
+# Padrões de credenciais que nunca devem aparecer nos logs
+SECRET_PATTERNS = [
+    re.compile(r"(Signature['\"]?\s*[:=]\s*['\"]?)[^'\",\s}]+", re.IGNORECASE),
+    re.compile(r"(bot)\d{6,12}:[A-Za-z0-9_-]{30,}"),  # Token do Telegram em URLs da API
+    re.compile(r"(secret[_-]?token['\"]?\s*[:=]\s*['\"]?)[^'\",\s}]+", re.IGNORECASE),
+]
+REDACTED = "***"
+
+class RedactingFormatter(logging.Formatter):
+    """Formata o registro e mascara tokens, chaves e assinaturas"""
+
+    def __init__(self, fmt: str = LOG_FORMAT, secrets: Iterable[str] = ()):
+        super().__init__(fmt)
+        # Valores exatos (ex: SHOPEE_API_KEY) também são mascarados
+        self.secrets = [secret for secret in secrets if secret and len(secret) >= 6]
+
+    def format(self, record: logging.LogRecord) -> str:
+        message = super().format(record)
+        for secret in self.secrets:
+            message = message.replace(secret, REDACTED)
+        for pattern in SECRET_PATTERNS:
+            message = pattern.sub(lambda match: match.group(1) + REDACTED, message)
+        return message
+
+class SamplingFilter(logging.Filter):
+    """Deixa passar só uma fração dos registros (para dumps volumosos)"""
+
+    def __init__(self, rate: float):
+        super().__init__()
+        self.rate = rate
+
+    def filter(self, record: logging.LogRecord) -> bool:
+        return self.rate >= 1 or random.random() < self.rate
+
+class LoopSafeQueueHandler(logging.handlers.QueueHandler):
+    """
+    QueueHandler que não formata o registro na thread que loga
+    (o padrão do QueueHandler monta a mensagem antes de enfileirar)
+    """
+
+    def prepare(self, record: logging.LogRecord) -> logging.LogRecord:
+        return record
+
+def setup_logging(level: Optional[str] = None, payload_sample_rate: Optional[float] = None,
+                  stream=sys.stdout) -> logging.handlers.QueueListener:
+    """
+    Configura o logging raiz com fila + listener em segunda plano
+    Níveis e amostragem vêm de LOG_LEVEL e LOG_PAYLOAD_SAMPLE_RATE
+    """
+    level = (level or os.getenv('LOG_LEVEL', 'INFO')).upper()
+    if payload_sample_rate is None:
+        payload_sample_rate = float(os.getenv('LOG_PAYLOAD_SAMPLE_RATE', '0.05'))
+
+    output = logging.StreamHandler(stream)
+    output.setFormatter(RedactingFormatter(secrets=[
+        os.getenv('TELEGRAM_TOKEN'),
+        os.getenv('SHOPEE_API_KEY'),
+        os.getenv('WEBHOOK_SECRET'),
+    ]))
+
+    log_queue = queue.SimpleQueue()
+    listener = logging.handlers.QueueListener(log_queue, output, respect_handler_level=True)
+
+    root = logging.getLogger()
+    for handler in list(root.handlers):
+        root.removeHandler(handler)
+    root.addHandler(LoopSafeQueueHandler(log_queue))
+    root.setLevel(level)
+
+    # Dumps de payloads da API: amostrados para não inundar o log em DEBUG
+    payload_logger = logging.getLogger('services.shopee_api.payloads')
+    for old_filter in list(payload_logger.filters):
+        payload_logger.removeFilter(old_filter)
+    payload_logger.addFilter(SamplingFilter(payload_sample_rate))
+
+    # O httpx loga cada chamada à API do Telegram (inclusive o long polling) em INFO
+    logging.getLogger('httpx').setLevel(logging.WARNING)
+
+    listener.start()
+    atexit.register(listener.stop)
+    return listener
@@ -0,0 +1,184 @@
+"""
+Métricas do bot no formato texto do Prometheus
+
+Latência por handler e por fase (resolução de link curto, extração de IDs, chamada GraphQL,
+parse do JSON, edição da mensagem no Telegram), contagem de erros e gauges de cache/fila.
+Desativado por padrão: sem METRICS_ENABLED, os handlers não são embrulhados e phase()
+devolve um contexto vazio compartilhado.
+"""
+import functools
+import logging
+import time
+from bisect import bisect_left
+from contextlib import nullcontext
+from typing import Callable, Dict, List, Tuple
+
+logger = logging.getLogger(__name__)
+
+PREFIX = "telebot"
+DEFAULT_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+
+_NULL_CONTEXT = nullcontext()
+
+class Histogram:
+    """Histograma com buckets fixos (contagens não acumuladas; acumula na exportação)"""
+
+    __slots__ = ("buckets", "counts", "sum", "count")
+
+    def __init__(self, buckets: Tuple[float, ...] = DEFAULT_BUCKETS):
+        self.buckets = buckets
+        self.counts = [0] * (len(buckets) + 1)
+        self.sum = 0.0
+        self.count = 0
+
+    def observe(self, value: float) -> None:
+        self.counts[bisect_left(self.buckets, value)] += 1
+        self.sum += value
+        self.count += 1
+
+    def render(self, name: str, labels: str) -> List[str]:
+        lines = []
+        cumulative = 0
+        for bound, count in zip(self.buckets, self.counts):
+            cumulative += count
+            lines.append(f'{name}_bucket{{{labels},le="{bound}"}} {cumulative}')
+        lines.append(f'{name}_bucket{{{labels},le="+Inf"}} {self.count}')
+        lines.append(f"{name}_sum{{{labels}}} {self.sum}")
+        lines.append(f"{name}_count{{{labels}}} {self.count}")
+        return lines
+
+class _PhaseTimer:
+    __slots__ = ("metrics", "name", "start")
+
+    def __init__(self, metrics: "Metrics", name: str):
+        self.metrics = metrics
+        self.name = name
+
+    def __enter__(self):
+        self.start = time.perf_counter()
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        self.metrics.observe_phase(self.name, time.perf_counter() - self.start, error=exc_type is not None)
+        return False
+
+class Metrics:
+    """Registro de métricas do processo"""
+
+    def __init__(self):
+        self.enabled = False
+        self.handler_latency: Dict[str, Histogram] = {}
+        self.handler_errors: Dict[str, int] = {}
+        self.phase_latency: Dict[str, Histogram] = {}
+        self.phase_errors: Dict[str, int] = {}
+        self._gauges: List[Tuple[str, Callable[[], Dict[str, float]]]] = []
+        self._runner = None
+
+    def phase(self, name: str):
+        """Contexto que mede uma fase; exceções contam como erro da fase"""
+        if not self.enabled:
+            return _NULL_CONTEXT
+        return _PhaseTimer(self, name)
+
+    def observe_phase(self, name: str, seconds: float, error: bool = False) -> None:
+        histogram = self.phase_latency.get(name)
+        if histogram is None:
+            histogram = self.phase_latency[name] = Histogram()
+        histogram.observe(seconds)
+        if error:
+            self.record_error(name)
+
+    def record_error(self, phase: str) -> None:
+        """Conta um erro de fase que não virou exceção (ex: status HTTP 5xx)"""
+        if self.enabled:
+            self.phase_errors[phase] = self.phase_errors.get(phase, 0) + 1
+
+    def instrument_handler(self, name: str, func: Callable) -> Callable:
+        """Embrulha um handler do PTB medindo latência e erros (sem efeito se desativado)"""
+        if not self.enabled:
+            return func
+
+        histogram = self.handler_latency.setdefault(name, Histogram())
+        self.handler_errors.setdefault(name, 0)
+
+        @functools.wraps(func)
+        async def wrapper(update, context):
+            start = time.perf_counter()
+            try:
+                return await func(update, context)
+            except BaseException:
+                self.handler_errors[name] += 1
+                raise
+            finally:
+                histogram.observe(time.perf_counter() - start)
+
+        return wrapper
+
+    def register_gauges(self, group: str, collect: Callable[[], Dict[str, float]]) -> None:
+        """Registra uma função que devolve valores numéricos lidos a cada coleta"""
+        self._gauges.append((group, collect))
+
+    def render(self) -> str:
+        """Exporta tudo no formato texto do Prometheus"""
+        lines = []
+
+        name = f"{PREFIX}_handler_duration_seconds"
+        lines += [f"# HELP {name} Tempo de execução dos handlers", f"# TYPE {name} histogram"]
+        for handler, histogram in sorted(self.handler_latency.items()):
+            lines += histogram.render(name, f'handler="{handler}"')
+
+        name = f"{PREFIX}_handler_errors_total"
+        lines += [f"# HELP {name} Exceções levantadas pelos handlers", f"# TYPE {name} counter"]
+        for handler, count in sorted(self.handler_errors.items()):
+            lines.append(f'{name}{{handler="{handler}"}} {count}')
+
+        name = f"{PREFIX}_phase_duration_seconds"
+        lines += [f"# HELP {name} Tempo de cada fase do processamento", f"# TYPE {name} histogram"]
+        for phase, histogram in sorted(self.phase_latency.items()):
+            lines += histogram.render(name, f'phase="{phase}"')
+
+        name = f"{PREFIX}_phase_errors_total"
+        lines += [f"# HELP {name} Erros por fase do processamento", f"# TYPE {name} counter"]
+        for phase, count in sorted(self.phase_errors.items()):
+            lines.append(f'{name}{{phase="{phase}"}} {count}')
+
+        for group, collect in self._gauges:
+            try:
+                values = collect()
+            except Exception as e:
+                logger.warning("Erro ao coletar métricas de %s: %s", group, e)
+                continue
+            for key, value in sorted(values.items()):
+                if isinstance(value, bool):
+                    value = int(value)
+                if not isinstance(value, (int, float)):
+                    continue
+                name = f"{PREFIX}_{group}_{key}"
+                lines += [f"# TYPE {name} gauge", f"{name} {value}"]
+
+        return "\n".join(lines) + "\n"
+
+    async def start_server(self, host: str = "127.0.0.1", port: int = 9100) -> None:
+        """Sobe o endpoint /metrics num servidor HTTP local"""
+        from aiohttp import web
+
+        async def handle(request):
+            return web.Response(
+                body=self.render().encode(),
+                headers={"Content-Type": "text/plain; version=0.0.4; charset=utf-8"}
+            )
+
+        app = web.Application()
+        app.router.add_get("/metrics", handle)
+        self._runner = web.AppRunner(app, access_log=None)
+        await self._runner.setup()
+        await web.TCPSite(self._runner, host, port).start()
+        logger.info("Métricas disponíveis em http://%s:%s/metrics", host, port)
+
+    async def stop_server(self) -> None:
+        if self._runner is not None:
+            await self._runner.cleanup()
+            self._runner = None
+
+# Registro global usado por handlers e serviços
+metrics = Metrics()
@@ -0,0 +1,31 @@
+"""
+Permissões dos comandos que publicam em nome do bot (/divulgar, /agendar)
+
+Só os usuários listados em ADMIN_IDS podem usá-los; sem ADMIN_IDS, ninguém pode.
+"""
+import logging
+import os
+from telegram import ChatMember
+from telegram.error import TelegramError
+from utils.env import load_env
+
+# Carrega variáveis de ambiente
+load_env()
+
+logger = logging.getLogger(__name__)
+
+# IDs do Telegram dos administradores do bot, separados por vírgula ou espaço
+ADMIN_IDS = {int(user_id) for user_id in os.getenv('ADMIN_IDS', '').replace(',', ' ').split()}
+
+def is_bot_admin(user_id: int) -> bool:
+    """Verifica se o usuário é administrador do bot (nega tudo sem ADMIN_IDS)"""
+    return user_id in ADMIN_IDS
+
+async def is_chat_admin(bot, chat_id: int, user_id: int) -> bool:
+    """Verifica se o usuário administra o chat (falso se o bot não consegue consultar o chat)"""
+    try:
+        member = await bot.get_chat_member(chat_id, user_id)
+    except TelegramError as e:
+        logger.info("Não foi possível consultar o usuário %s no chat %s: %s", user_id, chat_id, e)
+        return False
+    return member.status in (ChatMember.ADMINISTRATOR, ChatMember.OWNER)
@@ -0,0 +1,210 @@
+"""
+Medição da inicialização e handlers com importação adiada
+
+startup marca as fases da inicialização (importações, montagem do Application, initialize,
+aquecimento) até o primeiro update atendido e registra um resumo no log. Com STARTUP_PROFILE=1
+também mede cada módulo importado (tempo próprio e acumulado, como o python -X importtime) e
+lista os mais caros.
+
+deferred() devolve um callback de handler cujo módulo só é importado no primeiro uso; com o
+aquecimento do main.py em andamento (importações e serviços), o callback espera por ele.
+"""
+import asyncio
+import importlib
+import logging
+import os
+import threading
+import time
+from contextlib import contextmanager
+from typing import Callable, Dict, List, Optional, Set, Tuple
+from utils.env import load_env
+
+# Carrega variáveis de ambiente
+load_env()
+
+logger = logging.getLogger(__name__)
+
+STARTUP_PROFILE = os.getenv('STARTUP_PROFILE', '').lower() in ('1', 'true', 'yes')
+# Importações listadas no relatório
+STARTUP_PROFILE_TOP = int(os.getenv('STARTUP_PROFILE_TOP', '12'))
+
+def process_age() -> Optional[float]:
+    """Segundos desde a criação do processo (Linux; None em outros sistemas)"""
+    try:
+        with open("/proc/self/stat") as stat:
+            # Campos depois do nome do executável; starttime é o 22º campo da linha
+            fields = stat.read().rpartition(")")[2].split()
+        with open("/proc/uptime") as uptime:
+            now = float(uptime.read().split()[0])
+        return max(0.0, now - int(fields[19]) / os.sysconf("SC_CLK_TCK"))
+    except (OSError, ValueError, IndexError):
+        return None
+
+class ImportProfiler:
+    """Tempo de cada módulo carregado (acumulado e próprio), como o python -X importtime"""
+
+    def __init__(self):
+        # módulo -> (acumulado, próprio, profundidade)
+        self.modules: Dict[str, Tuple[float, float, int]] = {}
+        # Tempo dos submódulos de cada importação em andamento (por thread: o aquecimento
+        # importa numa thread à parte)
+        self._local = threading.local()
+        self._original = None
+
+    def start(self) -> None:
+        # Só os módulos ainda não carregados passam por _find_and_load (no CPython)
+        bootstrap = getattr(importlib, "_bootstrap", None)
+        original = getattr(bootstrap, "_find_and_load", None)
+        if original is None or self._original is not None:
+            return
+        self._original = original
+
+        def find_and_load(name, import_):
+            stack = self._local.__dict__.setdefault("stack", [])
+            depth = len(stack)
+            stack.append(0.0)
+            started = time.perf_counter()
+            try:
+                return original(name, import_)
+            finally:
+                elapsed = time.perf_counter() - started
+                children = stack.pop()
+                if stack:
+                    stack[-1] += elapsed
+                self.modules[name] = (elapsed, elapsed - children, depth)
+
+        bootstrap._find_and_load = find_and_load
+
+    def stop(self) -> None:
+        if self._original is not None:
+            importlib._bootstrap._find_and_load = self._original
+            self._original = None
+
+    def top(self, count: int) -> List[Tuple[str, float, float]]:
+        """Importações feitas diretamente pelo bot (não por outra biblioteca), das mais caras"""
+        roots = [(name, total, own) for name, (total, own, depth) in self.modules.items() if depth == 0]
+        return sorted(roots, key=lambda root: root[1], reverse=True)[:count]
+
+class StartupProfile:
+    """Fases da inicialização, em segundos desde a importação deste módulo"""
+
+    def __init__(self):
+        self.started = time.perf_counter()
+        # Interpretador e importações feitas antes deste módulo
+        self.before = process_age()
+        # (fase, início, fim)
+        self.phases: List[Tuple[str, float, float]] = []
+        self._last = 0.0
+        self.first_update: Optional[float] = None
+        self._warm_up: Optional[asyncio.Task] = None
+        # Erro que interrompeu o aquecimento (o bot é encerrado)
+        self.error: Optional[BaseException] = None
+        # Tarefas que ninguém espera (ex: abrir conexões)
+        self._background: Set[asyncio.Task] = set()
+        self.imports: Optional[ImportProfiler] = None
+        if STARTUP_PROFILE:
+            self.imports = ImportProfiler()
+            self.imports.start()
+
+    def now(self) -> float:
+        return time.perf_counter() - self.started
+
+    def mark(self, name: str) -> None:
+        """Fecha a fase que vai da marca anterior até agora"""
+        now = self.now()
+        self.phases.append((name, self._last, now))
+        self._last = now
+
+    @contextmanager
+    def phase(self, name: str):
+        """Fase com início e fim próprios (pode correr em paralelo com as marcas)"""
+        started = self.now()
+        try:
+            yield
+        finally:
+            self.phases.append((name, started, self.now()))
+
+    def start_warm_up(self, coro) -> asyncio.Task:
+        """
+        Roda o aquecimento em segundo plano (os handlers adiados esperam por ele)
+        Uma falha encerra o bot, como uma falha no post_init: SystemExit sai do loop e o
+        run_polling o trata como sinal de parada (stop, shutdown, post_shutdown)
+        """
+        self._warm_up = asyncio.create_task(coro)
+
+        def done(task: asyncio.Task):
+            if task.cancelled() or task.exception() is None:
+                return
+            self.error = task.exception()
+            logger.error("Erro fatal no aquecimento: %r", self.error)
+            raise SystemExit(1)
+
+        self._warm_up.add_done_callback(done)
+        return self._warm_up
+
+    def start_background(self, coro) -> asyncio.Task:
+        """Tarefa do aquecimento que os handlers não esperam (falhas só vão para o log)"""
+        task = asyncio.create_task(coro)
+        self._background.add(task)
+
+        def done(task: asyncio.Task):
+            self._background.discard(task)
+            if not task.cancelled() and task.exception() is not None:
+                logger.warning("Erro no aquecimento em segundo plano: %r", task.exception())
+
+        task.add_done_callback(done)
+        return task
+
+    async def wait_warm_up(self) -> None:
+        if self._warm_up is not None and not self._warm_up.done():
+            await asyncio.wait([self._warm_up])
+
+    async def stop_warm_up(self) -> None:
+        """Cancela o aquecimento, se o bot for encerrado antes do fim dele"""
+        tasks = [task for task in [self._warm_up, *self._background] if task is not None and not task.done()]
+        for task in tasks:
+            task.cancel()
+        if tasks:
+            await asyncio.wait(tasks)
+
+    def update_handled(self) -> None:
+        if self.first_update is not None:
+            return
+        self.first_update = self.now()
+        if self.imports is not None:
+            self.imports.stop()
+        logger.info("%s", self.report())
+
+    def report(self) -> str:
+        lines = [f"Inicialização: primeiro update atendido em {self.first_update * 1000:.0f}ms"
+                 if self.first_update is not None else "Inicialização:"]
+        if self.before is not None:
+            lines[0] += f" (+{self.before * 1000:.0f}ms de interpretador antes do main)"
+        for name, started, finished in sorted(self.phases, key=lambda phase: phase[1]):
+            lines.append(f"  {started * 1000:7.0f}ms +{(finished - started) * 1000:6.0f}ms  {name}")
+        if self.imports is not None:
+            lines.append("  importações mais caras (acumulado / próprio):")
+            for name, total, own in self.imports.top(STARTUP_PROFILE_TOP):
+                lines.append(f"  {total * 1000:9.1f}ms {own * 1000:7.1f}ms  {name}")
+        return "\n".join(lines)
+
+# Medição da inicialização do bot (começa na importação deste módulo, a primeira do main.py)
+startup = StartupProfile()
+
+def deferred(module: str, name: str) -> Callable:
+    """Callback de handler que importa module.name no primeiro update"""
+    callback = None
+
+    async def handler(update, context):
+        nonlocal callback
+        if callback is None:
+            await startup.wait_warm_up()
+            callback = getattr(importlib.import_module(module), name)
+        try:
+            return await callback(update, context)
+        finally:
+            if startup.first_update is None:
+                startup.update_handled()
+
+    handler.__name__ = name
+    return handler